@@ -2,6 +2,7 @@
 import sqlite3
 from tabulate import tabulate  # 建议 pip install tabulate 以获得漂亮的表格输出，没有安装的话下面会用简单print
 import config  # 导入配置
+from .money import format_cents
 
 
 class LedgerAnalytics:
@@ -29,13 +30,12 @@ class LedgerAnalytics:
 
     def total_expense(self):
         """总支出"""
-        res = self._query("SELECT SUM(amount) FROM bills")
-        total = res[0][0] if res[0][0] else 0.0
-        print(f"\n💰 历史总支出: ¥ {total:.2f}")
+        res = self._query("SELECT SUM(amount_cents) FROM bills")
+        print(f"\n💰 历史总支出: ¥ {format_cents(res[0][0])}")
 
     def expense_by_category(self):
         """按类别统计"""
-        sql = "SELECT category, SUM(amount) FROM bills GROUP BY category ORDER BY SUM(amount) DESC"
+        sql = "SELECT category, SUM(amount_cents) FROM bills GROUP BY category ORDER BY SUM(amount_cents) DESC"
         results = self._query(sql)
         print("\n📂 各分类支出排行:")
         self._print_table(["分类", "金额"], results)
@@ -44,7 +44,7 @@ class LedgerAnalytics:
         """按日统计 (最近 7 条有记录的天数)"""
         # SQLite 使用 substr 截取 YYYY-MM-DD
         sql = """
-            SELECT substr(record_time, 1, 10) as day, SUM(amount) 
+            SELECT substr(record_time, 1, 10) as day, SUM(amount_cents) 
             FROM bills 
             GROUP BY day 
             ORDER BY day DESC 
@@ -57,7 +57,7 @@ class LedgerAnalytics:
     def expense_by_year(self):
         """按年统计"""
         sql = """
-            SELECT substr(record_time, 1, 4) as year, SUM(amount) 
+            SELECT substr(record_time, 1, 4) as year, SUM(amount_cents) 
             FROM bills 
             GROUP BY year 
             ORDER BY year DESC
@@ -73,5 +73,4 @@ class LedgerAnalytics:
         print("-" * 30)
         for row in data:
             name = row[0]
-            amount = row[1] if row[1] else 0.0
-            print(f"{name:<15} | ¥ {amount:>8.2f}")
\ No newline at end of file
+            print(f"{name:<15} | ¥ {format_cents(row[1]):>8}")
\ No newline at end of file
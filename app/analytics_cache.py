@@ -0,0 +1,375 @@
+# analytics_cache.py
+# 统计接口的列式内存缓存：
+# - 每个活跃账本的账单按日期排序存成几列 NumPy 数组：日期序数、分类 id、金额（分，int64）、是否计入预算、
+#   分类显示名编号；第一次查询该账本时整体加载
+# - 存储层每次写入账单后回调 on_bills_changed，只记下变动的账单 id，下次查询时按 id 补读这些行打补丁
+#   （分类改名 / 账本恢复这类大范围变动则整本丢弃，下次重新加载）
+# - 别的进程（run.py --watch、导入脚本、recurring_tick.py）的写入不会触发回调：每次取账本前比对
+#   db.external_write_version()，变了就整本重新加载
+# - 汇总 / 每日 / 每周 / 每年 / 分类统计用 searchsorted 截日期区间，再用 bincount / reduceat 分组求和
+# - 按占用字节数和账本数做 LRU 淘汰，冷账本下次用到再加载
+# - 锁分两层：_lock 只护账本表（查找 / 插入 / 淘汰，很短）；每个账本自带一把锁，加载 / 补读在这把锁里做，
+#   所以一个账本冷加载时别的账本照常查询
+# - 带关键词的查询、日期格式不规范的账本等缓存答不了的情况返回 None，由调用方走 SQL
+
+import datetime
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+import config
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:  # 可选依赖
+    np = None
+    NUMPY_AVAILABLE = False
+
+_ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+_UNDATED = 0                # bill_date 为空的账单的日期序数（真实日期的序数从 1 开始）
+
+
+def _date_ordinal(value: Optional[str]) -> Optional[int]:
+    """'YYYY-MM-DD' -> 日期序数；空值为 _UNDATED；其他格式返回 None（和 SQL 的字符串比较对不上）"""
+    if value is None:
+        return _UNDATED
+    if not isinstance(value, str) or not _ISO_DATE.match(value):
+        return None
+    try:
+        return datetime.date.fromisoformat(value).toordinal()
+    except ValueError:
+        return None
+
+
+class _LedgerColumns:
+    """一个账本的账单列，所有数组按 day 升序排列、等长；读写列要持有 lock"""
+
+    def __init__(self, ledger_id: int):
+        self.ledger_id = ledger_id
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.ids = np.empty(0, dtype=np.int64)
+        self.day = np.empty(0, dtype=np.int32)
+        self.cents = np.empty(0, dtype=np.int64)
+        self.budget = np.empty(0, dtype=bool)          # include_in_budget，NULL 视为计入
+        self.category_id = np.empty(0, dtype=np.int32)  # NULL 为 -1
+        self.category = np.empty(0, dtype=np.int32)     # 分类显示名编号 -> category_names
+        self.category_names: List[Optional[str]] = []
+        self._category_codes: Dict[Optional[str], int] = {}
+        self.pending: set = set()       # 待补读的账单 id（由 AnalyticsCache._lock 保护）
+        self.external_version = 0       # 加载时的 db.external_write_version()
+        self.irregular_dates = 0        # 日期不是 YYYY-MM-DD 的行数；>0 时整本走 SQL
+
+    _COLUMNS = ('ids', 'day', 'cents', 'budget', 'category_id', 'category')
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self._COLUMNS)
+
+    def _intern(self, codes: Dict[Optional[str], int], names: List[Optional[str]], value: Optional[str]) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(names)
+            names.append(value)
+        return code
+
+    def build(self, rows: Iterable[tuple]) -> Dict[str, Any]:
+        """数据库行 -> 按日期排序的列（不含日期格式不规范的行）"""
+        ids, days, cents, budget, category_ids, categories = [], [], [], [], [], []
+        irregular = 0
+        ordinals: Dict[Optional[str], Optional[int]] = {}
+        for bill_id, bill_date, amount, include, category_id, category in rows:
+            if bill_date in ordinals:
+                ordinal = ordinals[bill_date]
+            else:
+                ordinal = ordinals[bill_date] = _date_ordinal(bill_date)
+            if ordinal is None:
+                irregular += 1
+                continue
+            ids.append(bill_id)
+            days.append(ordinal)
+            cents.append(amount or 0)
+            budget.append(include is None or include != 0)
+            category_ids.append(-1 if category_id is None else category_id)
+            categories.append(self._intern(self._category_codes, self.category_names, category))
+
+        columns = {
+            'ids': np.array(ids, dtype=np.int64),
+            'day': np.array(days, dtype=np.int32),
+            'cents': np.array(cents, dtype=np.int64),
+            'budget': np.array(budget, dtype=bool),
+            'category_id': np.array(category_ids, dtype=np.int32),
+            'category': np.array(categories, dtype=np.int32),
+        }
+        order = np.argsort(columns['day'], kind='stable')
+        return {'columns': {name: col[order] for name, col in columns.items()}, 'irregular': irregular}
+
+    def load(self, rows: Iterable[tuple]):
+        built = self.build(rows)
+        for name, col in built['columns'].items():
+            setattr(self, name, col)
+        self.irregular_dates = built['irregular']
+        self.loaded = True
+
+    def patch(self, changed_ids: List[int], rows: Iterable[tuple]):
+        """去掉 changed_ids 的旧行，把 rows（这些 id 当前仍在本账本的行）按日期插回去"""
+        keep = ~np.isin(self.ids, np.asarray(changed_ids, dtype=np.int64))
+        for name in self._COLUMNS:
+            setattr(self, name, getattr(self, name)[keep])
+        built = self.build(rows)
+        new = built['columns']
+        if len(new['ids']):
+            positions = np.searchsorted(self.day, new['day'], side='right')
+            for name in self._COLUMNS:
+                setattr(self, name, np.insert(getattr(self, name), positions, new[name]))
+        self.irregular_dates = built['irregular']
+
+
+class AnalyticsCache:
+    """按账本缓存账单列并在内存里做统计；db 为 EnhancedDatabaseManager"""
+
+    def __init__(
+        self,
+        db,
+        max_bytes: int = config.ANALYTICS_CACHE_MAX_MB * 1024 * 1024,
+        max_ledgers: int = config.ANALYTICS_CACHE_MAX_LEDGERS,
+    ):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy 未安装，无法启用统计缓存")
+        self.db = db
+        self.max_bytes = max(0, max_bytes)
+        self.max_ledgers = max(1, max_ledgers)
+        self._ledgers: "OrderedDict[int, _LedgerColumns]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.patches = 0
+        self.evictions = 0
+        db.add_bills_listener(self.on_bills_changed)
+
+    # ---------------- 失效 / 增量 ----------------
+    def on_bills_changed(self, bill_ids: Optional[List[int]], ledger_id: Optional[int]):
+        """存储层写入提交后的回调：记下变动的 id；没有 id 时丢弃对应账本（None 为全部）"""
+        with self._lock:
+            if bill_ids is None:
+                if ledger_id is None:
+                    self._ledgers.clear()
+                else:
+                    self._ledgers.pop(ledger_id, None)
+                return
+            # 账单可能换了账本，每个已加载的账本都要看一眼
+            for entry in self._ledgers.values():
+                entry.pending.update(bill_ids)
+
+    def invalidate(self, ledger_id: Optional[int] = None):
+        self.on_bills_changed(None, ledger_id)
+
+    def _entry(self, ledger_id: int) -> _LedgerColumns:
+        """在账本表里取（没有就登记一个未加载的）账本，只持有 _lock 一小会儿"""
+        with self._lock:
+            entry = self._ledgers.get(ledger_id)
+            if entry is None:
+                entry = self._ledgers[ledger_id] = _LedgerColumns(ledger_id)
+            self._ledgers.move_to_end(ledger_id)
+            return entry
+
+    def _refresh(self, entry: _LedgerColumns):
+        """让账本的列跟上数据库（调用方持有 entry.lock）：没加载就加载，有待补读的 id 就打补丁"""
+        external_version = self.db.external_write_version()
+        # 先取走待补读的 id 再读库：读库期间新来的变动留在 pending 里，下次再补
+        with self._lock:
+            changed = sorted(entry.pending)
+            entry.pending.clear()
+        # 别的进程写过库时回调没收到，不知道动了哪些行；不规范的行不在数组里，数不清被改掉了几行：都整本重载
+        if not entry.loaded or entry.external_version != external_version or (changed and entry.irregular_dates):
+            entry.load(self.db.get_bill_facts(entry.ledger_id))
+            entry.external_version = external_version
+            counter = 'loads'
+        elif changed:
+            entry.patch(changed, self.db.get_bill_facts(entry.ledger_id, changed))
+            counter = 'patches'
+        else:
+            return
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+            self._evict()
+
+    def _evict(self):
+        """LRU（调用方持有 _lock）：超出账本数或字节上限时淘汰最久没用的账本（最近用的一本始终保留）"""
+        total = sum(entry.nbytes for entry in self._ledgers.values())
+        while len(self._ledgers) > 1 and (len(self._ledgers) > self.max_ledgers or total > self.max_bytes):
+            _, entry = self._ledgers.popitem(last=False)
+            total -= entry.nbytes
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'ledgers': list(self._ledgers.keys()),
+                'bytes': sum(entry.nbytes for entry in self._ledgers.values()),
+                'loads': self.loads,
+                'patches': self.patches,
+                'evictions': self.evictions,
+            }
+
+    # ---------------- 选择 ----------------
+    def _select(self, ledger_id: Optional[int], start_date: Optional[str], end_date: Optional[str],
+                keyword: Optional[str], major: Optional[str], minor: Optional[str],
+                include_in_budget: Optional[bool] = None):
+        """按条件选出行，返回 (金额, 日期序数, 分类编号, 分类名表)；缓存答不了时返回 None
+
+        读库（分类过滤、加载 / 补读）都不持有 _lock；取列时持有账本自己的锁，拿到的数组之后不会再被改
+        """
+        if ledger_id is None or (keyword and keyword.strip()):
+            return None
+        start = _date_ordinal(start_date) if start_date else None
+        end = _date_ordinal(end_date) if end_date else None
+        if (start_date and not start) or (end_date and not end):
+            return None
+
+        category_ids = None
+        if major or minor:
+            category_ids = self.db.get_category_filter_ids(major, minor, ledger_id)
+
+        entry = self._entry(ledger_id)
+        with entry.lock:
+            self._refresh(entry)
+            if entry.irregular_dates:
+                return None
+            index = self._rows(entry, start, end, category_ids, include_in_budget)
+            # patch / load 只整体替换数组、从不原地改，取出的切片在锁外也一直有效
+            return entry.cents[index], entry.day[index], entry.category[index], list(entry.category_names)
+
+    @staticmethod
+    def _rows(entry: _LedgerColumns, start: Optional[int], end: Optional[int],
+              category_ids: Optional[List[int]], include_in_budget: Optional[bool]):
+        """日期区间 + 分类 / 预算过滤后的行下标（切片或下标数组）"""
+        # 和 SQL 一样：有日期条件时没有日期的账单不参与
+        lo = int(np.searchsorted(entry.day, start, side='left')) if start else 0
+        if start is None and end is not None:
+            lo = int(np.searchsorted(entry.day, _UNDATED, side='right'))
+        hi = max(lo, int(np.searchsorted(entry.day, end, side='right')) if end else len(entry.day))
+        # 只有日期条件时用切片（视图，不复制）
+        index = slice(lo, hi)
+
+        mask = None
+        if category_ids is not None:
+            mask = np.isin(entry.category_id[lo:hi], np.asarray(category_ids, dtype=np.int32))
+        if include_in_budget is not None:
+            flag = entry.budget[lo:hi] if include_in_budget else ~entry.budget[lo:hi]
+            mask = flag if mask is None else mask & flag
+        if mask is not None:
+            index = lo + np.flatnonzero(mask)
+        return index
+
+    @staticmethod
+    def _day_groups(days):
+        """已排序的日期序数 -> (每组起始下标, 每组日期)"""
+        if not len(days):
+            return np.empty(0, dtype=np.int64), days
+        starts = np.flatnonzero(np.concatenate(([True], days[1:] != days[:-1])))
+        return starts, days[starts]
+
+    @staticmethod
+    def _group_sums(values, starts, total: int):
+        sums = np.add.reduceat(values, starts) if len(starts) else np.empty(0, dtype=np.int64)
+        counts = np.diff(np.append(starts, total))
+        return sums, counts
+
+    # ---------------- 统计 ----------------
+    def get_spending_summary(self, start_date: str = None, end_date: str = None,
+                             keyword: str = None, major: str = None,
+                             minor: str = None, ledger_id: Optional[int] = None,
+                             include_in_budget: Optional[bool] = None) -> Optional[Dict[str, Any]]:
+        """同 EnhancedDatabaseManager.get_spending_summary；缓存答不了时返回 None"""
+        selected = self._select(ledger_id, start_date, end_date, keyword, major, minor, include_in_budget)
+        if selected is None:
+            return None
+        cents, days, categories, names = selected
+
+        total_cents = int(cents.sum())
+        _, unique_days = self._day_groups(days)
+        day_count = int(np.count_nonzero(unique_days != _UNDATED))
+
+        # 金额按分类编号累加；float64 权重在 2**53 分以内是精确整数
+        size = len(names)
+        amounts = np.rint(np.bincount(categories, weights=cents, minlength=size)).astype(np.int64)
+        counts = np.bincount(categories, minlength=size)
+        present = np.flatnonzero(counts)
+        order = present[np.argsort(-amounts[present], kind='stable')]
+        category_summary = {
+            names[code]: {'amount_cents': int(amounts[code]), 'count': int(counts[code])}
+            for code in order
+        }
+
+        return {
+            'total_amount_cents': total_cents,
+            'bill_count': int(len(cents)),
+            'categories': category_summary,
+            'period_start': start_date,
+            'period_end': end_date,
+            'day_count': day_count,
+            'daily_avg_cents': round(total_cents / day_count) if day_count else 0,
+        }
+
+    def get_daily_spending(self, start_date: str = None, end_date: str = None,
+                           keyword: str = None, major: str = None,
+                           minor: str = None, ledger_id: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """同 EnhancedDatabaseManager.get_daily_spending（新的在前，无日期的一组排最后）"""
+        selected = self._select(ledger_id, start_date, end_date, keyword, major, minor)
+        if selected is None:
+            return None
+        cents, days, _, _ = selected
+
+        starts, group_days = self._day_groups(days)
+        sums, counts = self._group_sums(cents, starts, len(days))
+        return [
+            {
+                'date': datetime.date.fromordinal(day).isoformat() if day != _UNDATED else None,
+                'amount_cents': amount,
+                'count': count,
+            }
+            for day, amount, count in zip(group_days[::-1].tolist(), sums[::-1].tolist(), counts[::-1].tolist())
+        ]
+
+    def _period_spending(self, key_name: str, period_of, format_key, *args, **kwargs):
+        selected = self._select(*args, **kwargs)
+        if selected is None:
+            return None
+        cents, days, _, _ = selected
+
+        # 没有日期的账单不归入任何周 / 年
+        dated = days != _UNDATED
+        cents, days = cents[dated], days[dated]
+        periods = period_of(days)
+        starts, keys = self._day_groups(periods)
+        sums, counts = self._group_sums(cents, starts, len(periods))
+        return [
+            {key_name: format_key(key), 'amount_cents': amount, 'count': count}
+            for key, amount, count in zip(keys[::-1].tolist(), sums[::-1].tolist(), counts[::-1].tolist())
+        ]
+
+    def get_weekly_spending(self, start_date: str = None, end_date: str = None,
+                            keyword: str = None, major: str = None,
+                            minor: str = None, ledger_id: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """按周（周一开始）汇总：[{'week_start', 'amount_cents', 'count'}]，新的在前"""
+        return self._period_spending(
+            'week_start',
+            # 序数 1（0001-01-01）是周一
+            lambda days: days - (days - 1) % 7,
+            lambda ordinal: datetime.date.fromordinal(ordinal).isoformat(),
+            ledger_id, start_date, end_date, keyword, major, minor,
+        )
+
+    def get_yearly_spending(self, start_date: str = None, end_date: str = None,
+                            keyword: str = None, major: str = None,
+                            minor: str = None, ledger_id: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """按年汇总：[{'year', 'amount_cents', 'count'}]，新的在前"""
+        epoch = datetime.date(1970, 1, 1).toordinal()
+        return self._period_spending(
+            'year',
+            lambda days: (days.astype(np.int64) - epoch).astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970,
+            lambda year: f"{year:04d}",
+            ledger_id, start_date, end_date, keyword, major, minor,
+        )
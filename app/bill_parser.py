@@ -49,6 +49,25 @@ def _norm(s: str) -> str:
     )
 
 
+def _ocr_line_records(ocr_lines) -> List[Dict[str, Any]]:
+    """OCR 行的文本 + 置信度 + 四点框（JSON 可序列化），随账单存进 bill_raw_text"""
+    out = []
+    for x in ocr_lines or []:
+        text = _norm(x.text)
+        if not text:
+            continue
+        rec: Dict[str, Any] = {"text": text}
+        if x.conf is not None:
+            rec["conf"] = round(float(x.conf), 4)
+        if x.box is not None:
+            try:
+                rec["box"] = [[round(float(v), 1) for v in pt] for pt in x.box]
+            except (TypeError, ValueError):
+                pass
+        out.append(rec)
+    return out
+
+
 def _compact(s: str) -> str:
     return (s or "").replace(" ", "").replace("\u3000", "").strip()
 
@@ -141,6 +160,70 @@ def _load_templates_from_file(path: str) -> List[Dict[str, Any]]:
     raise ValueError("templates_path must be .json/.yml/.yaml")
 
 
+# --------------------------- 分类规则 ---------------------------
+
+def _normalize_category_rules(raw_rules: List[Any]) -> List[Dict[str, Any]]:
+    """
+    统一分类规则格式（DB 对象 / dict），为空时回退 config，并按优先级排序
+    """
+    rules: List[Dict[str, Any]] = []
+    try:
+        for r in raw_rules or []:
+            if isinstance(r, dict):
+                kw = r.get("keyword")
+                cat = r.get("category")
+                pr = r.get("priority", 0)
+                is_weak = bool(r.get("is_weak"))
+            else:
+                kw = getattr(r, "keyword", None)
+                cat = getattr(r, "category", None)
+                pr = getattr(r, "priority", 0)
+                is_weak = bool(getattr(r, "is_weak", False))
+            if kw and cat:
+                rules.append({
+                    "keyword": str(kw),
+                    "category": str(cat),
+                    "priority": int(pr or 0),
+                    "is_weak": is_weak,
+                })
+    except Exception:
+        rules = []
+
+    if not rules:
+        weak_keys = set(getattr(config, "WEAK_KEYWORDS", set()) or [])
+        for key, cat in getattr(config, "CATEGORY_RULES", {}).items():
+            if not key or cat is None:
+                continue
+            rules.append({
+                "keyword": str(key),
+                "category": str(cat),
+                "priority": 1,
+                "is_weak": key in weak_keys,
+            })
+
+    rules.sort(key=lambda r: (int(r.get("priority") or 0) * 2 + (0 if r.get("is_weak") else 1)), reverse=True)
+    return rules
+
+
+def _match_category(rules: List[Dict[str, Any]], haystacks: List[str]) -> str:
+    """在文本里找得分最高的关键词规则（priority*2 + 强关键词加 1）"""
+    best_category = None
+    best_score = -1
+
+    for text in haystacks:
+        if not text:
+            continue
+        for rule in rules:
+            kw = rule.get("keyword")
+            if kw and kw in text:
+                score = int(rule.get("priority") or 0) * 2 + (0 if rule.get("is_weak") else 1)
+                if score > best_score:
+                    best_score = score
+                    best_category = rule.get("category")
+
+    return best_category or "未分类"
+
+
 # --------------------------- 模板结构 ---------------------------
 
 @dataclass
@@ -513,7 +596,38 @@ class BillParser:
             self._executor.shutdown(wait=False)
 
     # ----------------------- 预处理 -----------------------
-    def _preprocess_image(self, image_path: str) -> tuple[str, bool]:
+    @staticmethod
+    def _save_preview(img, preview_path: str, max_side: int = 900, quality: int = 75) -> None:
+        """
+        用已解码的图片生成缩略预览（按 preview_path 扩展名决定 JPEG / WebP）
+        - 先写临时文件再 rename，避免并发请求读到半截文件
+        """
+        if not preview_path or os.path.exists(preview_path):
+            return
+        w, h = img.size
+        m = max(w, h)
+        thumb = img
+        if m > max_side:
+            scale = max_side / m
+            thumb = img.resize((max(1, int(w * scale)), max(1, int(h * scale))), Image.BILINEAR)
+
+        fmt = "WEBP" if preview_path.lower().endswith(".webp") else "JPEG"
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(preview_path) or None)
+        os.close(fd)
+        try:
+            thumb.convert("RGB").save(tmp_path, format=fmt, quality=quality)
+            os.replace(tmp_path, preview_path)
+        finally:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def _preprocess_image(self, image_path: str, preview_path: Optional[str] = None) -> tuple[str, bool]:
+        """
+        缩放到 max_side 供 OCR 使用；传入 preview_path 时顺便用同一次解码结果生成预览图
+        """
         if Image is None:
             return image_path, False
 
@@ -525,12 +639,24 @@ class BillParser:
                 w, h = img.size
                 m = max(w, h)
                 if m <= self.max_side:
+                    if preview_path:
+                        try:
+                            self._save_preview(img, preview_path)
+                        except Exception:
+                            pass
                     return image_path, False
 
                 scale = self.max_side / m
                 new_size = (max(1, int(w * scale)), max(1, int(h * scale)))
                 resized = img.resize(new_size, Image.BILINEAR)
 
+                if preview_path:
+                    try:
+                        # 从已缩小的图再缩，避免再对原图做一次重采样
+                        self._save_preview(resized, preview_path)
+                    except Exception:
+                        pass
+
                 fd, temp_path = tempfile.mkstemp(suffix=".jpg", prefix="bill_opt_")
                 os.close(fd)
                 resized.convert("RGB").save(
@@ -544,12 +670,15 @@ class BillParser:
             return image_path, False
 
     # ----------------------- 单张 -----------------------
-    def parse(self, image_path: str) -> dict:
+    def parse(self, image_path: str, category_rules_loader: Optional[Callable[[], List[Any]]] = None) -> dict:
         processed_path, is_temp = self._preprocess_image(image_path)
         try:
             ocr_lines = self.ocr_engine.run(processed_path, timeout=self.ocr_timeout)
             text_lines = [_norm(x.text) for x in ocr_lines if _norm(x.text)]
-            return self._parse_text_lines(text_lines, image_path=processed_path)
+            rules = self._load_category_rules(category_rules_loader)
+            data = self._parse_text_lines(text_lines, image_path=processed_path, category_rules=rules)
+            data["ocr_lines"] = _ocr_line_records(ocr_lines)
+            return data
 
         except Exception as exc:
             return {
@@ -568,10 +697,20 @@ class BillParser:
                     pass
 
     # ----------------------- 批量（流水线） -----------------------
-    def parse_batch(self, image_paths) -> list[dict]:
+    def parse_batch(
+        self,
+        image_paths,
+        preview_paths: Optional[List[Optional[str]]] = None,
+        category_rules_loader: Optional[Callable[[], List[Any]]] = None,
+    ) -> list[dict]:
+        """
+        批量解析；preview_paths 与 image_paths 一一对应，非空时在预处理阶段顺带写出预览图
+        category_rules_loader 只对本次调用生效（不传则用实例上的），分类规则每批只加载一次
+        """
         paths = list(image_paths)
         if not paths:
             return []
+        previews = list(preview_paths) if preview_paths is not None else [None] * len(paths)
 
         if self._executor is None:
             self._executor = ThreadPoolExecutor(
@@ -580,7 +719,9 @@ class BillParser:
             )
 
         # 1) 并行预处理
-        pre_fut_to_idx = {self._executor.submit(self._preprocess_image, p): i for i, p in enumerate(paths)}
+        pre_fut_to_idx = {
+            self._executor.submit(self._preprocess_image, p, previews[i]): i for i, p in enumerate(paths)
+        }
         processed: list[tuple[str, bool]] = [("", False)] * len(paths)
         for fut in as_completed(pre_fut_to_idx):
             i = pre_fut_to_idx[fut]
@@ -591,13 +732,16 @@ class BillParser:
 
         # 2) submit OCR（不占用 CPU 线程池）
         ocr_futs = [self.ocr_engine.submit(pp) for (pp, _) in processed]
+        rules = self._load_category_rules(category_rules_loader)
 
         # 3) 并行后处理
         def _post(i: int) -> dict:
             ocr_lines = ocr_futs[i].result(timeout=self.ocr_timeout)
             text_lines = [_norm(x.text) for x in ocr_lines if _norm(x.text)]
             pp, _ = processed[i]
-            return self._parse_text_lines(text_lines, image_path=pp)
+            data = self._parse_text_lines(text_lines, image_path=pp, category_rules=rules)
+            data["ocr_lines"] = _ocr_line_records(ocr_lines)
+            return data
 
 
         post_fut_to_idx = {self._executor.submit(_post, i): i for i in range(len(paths))}
@@ -792,70 +936,26 @@ class BillParser:
         return out
 
 
-    def _load_category_rules(self) -> List[Dict[str, Any]]:
+    def _load_category_rules(self, loader: Optional[Callable[[], List[Any]]] = None) -> List[Dict[str, Any]]:
         """
-        Load category rules from provided loader (DB) or fallback to config.
+        Load category rules from the given loader, else the instance loader (DB).
         """
-        rules: List[Dict[str, Any]] = []
-        loader = getattr(self, "category_rules_loader", None)
+        raw_rules: List[Any] = []
+        loader = loader or getattr(self, "category_rules_loader", None)
 
         if loader:
             try:
                 raw_rules = loader() or []
-                for r in raw_rules:
-                    if isinstance(r, dict):
-                        kw = r.get("keyword")
-                        cat = r.get("category")
-                        pr = r.get("priority", 0)
-                        is_weak = bool(r.get("is_weak"))
-                    else:
-                        kw = getattr(r, "keyword", None)
-                        cat = getattr(r, "category", None)
-                        pr = getattr(r, "priority", 0)
-                        is_weak = bool(getattr(r, "is_weak", False))
-                    if kw and cat:
-                        rules.append({
-                            "keyword": str(kw),
-                            "category": str(cat),
-                            "priority": int(pr or 0),
-                            "is_weak": is_weak,
-                        })
             except Exception:
-                rules = []
-
-        if not rules:
-            weak_keys = set(getattr(config, "WEAK_KEYWORDS", set()) or [])
-            for key, cat in getattr(config, "CATEGORY_RULES", {}).items():
-                if not key or cat is None:
-                    continue
-                rules.append({
-                    "keyword": str(key),
-                    "category": str(cat),
-                    "priority": 1,
-                    "is_weak": key in weak_keys,
-                })
+                raw_rules = []
 
-        rules.sort(key=lambda r: (int(r.get("priority") or 0) * 2 + (0 if r.get("is_weak") else 1)), reverse=True)
-        return rules
-
-    def _resolve_category(self, merchant: str, payee: str, text_lines: List[str]) -> str:
-        rules = self._load_category_rules()
-        best_category = None
-        best_score = -1
-        haystacks = [merchant, payee] + (text_lines or [])
-
-        for text in haystacks:
-            if not text:
-                continue
-            for rule in rules:
-                kw = rule.get("keyword")
-                if kw and kw in text:
-                    score = int(rule.get("priority") or 0) * 2 + (0 if rule.get("is_weak") else 1)
-                    if score > best_score:
-                        best_score = score
-                        best_category = rule.get("category")
+        return _normalize_category_rules(raw_rules)
 
-        return best_category or "未分类"
+    def _resolve_category(self, merchant: str, payee: str, text_lines: List[str],
+                          rules: Optional[List[Dict[str, Any]]] = None) -> str:
+        if rules is None:
+            rules = self._load_category_rules()
+        return _match_category(rules, [merchant, payee] + (text_lines or []))
 
 
     # ----------------------- 行抽取 -----------------------
@@ -1003,7 +1103,8 @@ class BillParser:
         return float(round(v, t.amount_rule.round_ndigits)), {"line": idx}
 
     # ----------------------- 解析入口 -----------------------
-    def _parse_text_lines(self, text_lines: List[str], image_path: Optional[str] = None) -> dict:
+    def _parse_text_lines(self, text_lines: List[str], image_path: Optional[str] = None,
+                          category_rules: Optional[List[Dict[str, Any]]] = None) -> dict:
         # 1) 匹配模板（用全量行，避免 scope 切掉关键特征）
         t, mdbg = self._match_template(text_lines)
 
@@ -1033,7 +1134,7 @@ class BillParser:
                 return scoped_map[idx]
             return None
 
-        category = self._resolve_category(item, payee, text_lines)
+        category = self._resolve_category(item, payee, text_lines, rules=category_rules)
         data = {
             "merchant": item,               # ✅ 商品名
             "payee": payee,                 # 可选
@@ -0,0 +1,201 @@
+# db_connection.py
+# SQLite 连接管理：
+# - 每个线程复用一条长连接（sqlite3 连接不能跨线程共享），不再每次调用都 connect/close
+# - WAL 日志模式：读不阻塞写、写不阻塞读
+# - 统一设置 synchronous / cache_size / mmap_size / busy_timeout，以及 sqlite3 自带的预编译语句缓存
+# - transaction() / read() 上下文管理器划定事务范围；同一线程内嵌套调用会并入最外层事务
+# - 每请求一个线程的服务器（Flask threaded）在请求结束时 release()，连接回到有上限的空闲池给下个线程复用；
+#   线程退出前没有归还的连接，在下次开新连接时回收，不会随请求数无限增长
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import config
+
+
+class _ThreadState(threading.local):
+    conn: Optional[sqlite3.Connection] = None
+    depth: int = 0          # 当前线程 transaction()/read(snapshot) 的嵌套层数
+
+
+class ConnectionManager:
+    """按线程复用的 SQLite 连接（autocommit 模式，事务由 transaction()/read() 显式开启）"""
+
+    def __init__(
+        self,
+        db_path: str,
+        busy_timeout_ms: int = config.DB_BUSY_TIMEOUT_MS,
+        synchronous: str = config.DB_SYNCHRONOUS,
+        cache_size_kib: int = config.DB_CACHE_SIZE_KIB,
+        mmap_size: int = config.DB_MMAP_SIZE,
+        cached_statements: int = config.DB_STATEMENT_CACHE,
+        max_idle: int = config.DB_MAX_IDLE_CONNECTIONS,
+    ):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
+        self.max_idle = max(0, max_idle)
+        self._local = _ThreadState()
+        # 所有打开的连接 -> 正在使用它的线程（空闲池里的为 None）
+        self._all: Dict[sqlite3.Connection, Optional[threading.Thread]] = {}
+        self._idle: List[sqlite3.Connection] = []
+        self._all_lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000.0,
+            isolation_level=None,            # 不让 sqlite3 模块隐式 BEGIN
+            check_same_thread=False,         # 仅为了 close_all() 能在别的线程关闭
+            cached_statements=self.cached_statements,
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        conn.execute(f'PRAGMA cache_size={-abs(int(self.cache_size_kib))}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout_ms)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """当前线程的连接（首次使用时优先从空闲池取，没有再新建）"""
+        conn = self._local.conn
+        if conn is None:
+            with self._all_lock:
+                self._reclaim_dead_locked()
+                conn = self._idle.pop() if self._idle else None
+                if conn is not None:
+                    self._all[conn] = threading.current_thread()
+            if conn is None:
+                conn = self._open()
+                with self._all_lock:
+                    self._all[conn] = threading.current_thread()
+            self._local.conn = conn
+        return conn
+
+    def _reclaim_dead_locked(self):
+        """已退出线程的连接：放回空闲池，池满则关闭（调用方持有 _all_lock）"""
+        for conn, owner in list(self._all.items()):
+            if owner is not None and not owner.is_alive():
+                self._retire_locked(conn)
+
+    def _retire_locked(self, conn: sqlite3.Connection):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            pass
+        if len(self._idle) < self.max_idle:
+            self._all[conn] = None
+            self._idle.append(conn)
+            return
+        self._all.pop(conn, None)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def release(self):
+        """
+        当前线程用完连接（如一个 HTTP 请求结束）：归还空闲池，池满则关闭
+        事务进行中时不归还
+        """
+        state = self._local
+        conn = state.conn
+        if conn is None or state.depth:
+            return
+        state.conn = None
+        with self._all_lock:
+            self._retire_locked(conn)
+
+    def in_transaction(self) -> bool:
+        """当前线程是否处在 transaction()/read(snapshot=True) 范围内"""
+        return self._local.depth > 0
+
+    @contextmanager
+    def transaction(self, immediate: bool = True) -> Iterator[sqlite3.Cursor]:
+        """
+        写事务：正常退出 COMMIT，异常 ROLLBACK 并继续抛出
+        immediate=True 时一开始就拿写锁（BEGIN IMMEDIATE），避免读升级写时的 SQLITE_BUSY
+        """
+        state = self._local
+        conn = self.connection()
+        cursor = conn.cursor()
+        if state.depth:
+            # 嵌套：并入外层事务
+            state.depth += 1
+            try:
+                yield cursor
+            finally:
+                state.depth -= 1
+                cursor.close()
+            return
+
+        conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+        state.depth = 1
+        try:
+            yield cursor
+        except BaseException:
+            state.depth = 0
+            cursor.close()
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        state.depth = 0
+        cursor.close()
+        if conn.in_transaction:
+            conn.commit()
+
+    @contextmanager
+    def read(self, snapshot: bool = False) -> Iterator[sqlite3.Cursor]:
+        """
+        读：默认每条语句各自读取最新提交的数据
+        snapshot=True 时多条查询共享同一个 WAL 快照（BEGIN ... COMMIT，不拿写锁）
+        """
+        state = self._local
+        conn = self.connection()
+        cursor = conn.cursor()
+        if not snapshot or state.depth:
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+            return
+
+        conn.execute('BEGIN')
+        state.depth = 1
+        try:
+            yield cursor
+        finally:
+            state.depth = 0
+            cursor.close()
+            if conn.in_transaction:
+                conn.commit()
+
+    def close(self):
+        """关闭当前线程的连接"""
+        conn = self._local.conn
+        if conn is None:
+            return
+        self._local.conn = None
+        self._local.depth = 0
+        with self._all_lock:
+            self._all.pop(conn, None)
+        conn.close()
+
+    def close_all(self):
+        """关闭所有线程的连接（进程退出 / 恢复快照前调用）"""
+        with self._all_lock:
+            conns, self._all, self._idle = list(self._all), {}, []
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local.conn = None
+        self._local.depth = 0
@@ -0,0 +1,177 @@
+# db_snapshot.py
+# 整库在线快照（运行中直接复制 ledger.db 不安全：WAL 里还有未 checkpoint 的页）：
+# - 用 SQLite 在线备份 API 按页分步复制，每步之间 sleep，控制 I/O 占用
+# - 源连接先开一个读事务：整个备份读同一个 WAL 快照，写入方照常提交，备份也不会因源库变化而重启
+# - 快照转成 DELETE 日志模式的单文件，PRAGMA integrity_check 校验通过后才可选 gzip 压缩并改成正式文件名
+# - 按数量保留最近 N 份，多出的旧快照自动删除
+
+import os
+import gzip
+import time
+import shutil
+import sqlite3
+import hashlib
+import datetime
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import config
+
+SNAPSHOT_PREFIX = "ledger-"
+SNAPSHOT_SUFFIXES = (".db", ".db.gz")
+
+
+def _sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _integrity_check(path: str, quick: bool = False) -> str:
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("PRAGMA quick_check" if quick else "PRAGMA integrity_check").fetchall()
+    finally:
+        conn.close()
+    return "\n".join(str(r[0]) for r in rows)
+
+
+def verify_snapshot(path: str, quick: bool = False) -> Dict[str, Any]:
+    """校验一份快照（.db 或 .db.gz；压缩的先解压到临时文件）"""
+    tmp_path = None
+    try:
+        target = path
+        if path.endswith(".gz"):
+            fd, tmp_path = tempfile.mkstemp(suffix=".db", dir=os.path.dirname(os.path.abspath(path)))
+            with os.fdopen(fd, "wb") as out, gzip.open(path, "rb") as src:
+                shutil.copyfileobj(src, out, config.UPLOAD_CHUNK_SIZE)
+            target = tmp_path
+        result = _integrity_check(target, quick=quick)
+        return {"path": path, "ok": result == "ok", "result": result}
+    except (OSError, sqlite3.DatabaseError) as e:
+        return {"path": path, "ok": False, "result": str(e)}
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def list_snapshots(dest_dir: str = config.SNAPSHOT_DIR) -> List[Dict[str, Any]]:
+    """按时间倒序列出快照文件（文件名里带时间戳）"""
+    if not os.path.isdir(dest_dir):
+        return []
+    items = []
+    for entry in os.scandir(dest_dir):
+        if entry.is_file() and entry.name.startswith(SNAPSHOT_PREFIX) and entry.name.endswith(SNAPSHOT_SUFFIXES):
+            st = entry.stat()
+            items.append({
+                "name": entry.name,
+                "path": entry.path,
+                "size_bytes": st.st_size,
+                "compressed": entry.name.endswith(".gz"),
+                "created_at": datetime.datetime.fromtimestamp(st.st_mtime).strftime("%Y-%m-%d %H:%M:%S"),
+            })
+    items.sort(key=lambda item: item["name"], reverse=True)
+    return items
+
+
+def prune_snapshots(dest_dir: str = config.SNAPSHOT_DIR, keep: int = config.SNAPSHOT_KEEP) -> List[str]:
+    """只保留最近 keep 份，返回被删除的文件名（keep <= 0 表示不清理）"""
+    if keep <= 0:
+        return []
+    removed = []
+    for item in list_snapshots(dest_dir)[keep:]:
+        try:
+            os.remove(item["path"])
+            removed.append(item["name"])
+        except OSError:
+            pass
+    return removed
+
+
+def create_snapshot(
+    db_path: str = config.DB_PATH,
+    dest_dir: str = config.SNAPSHOT_DIR,
+    compress: bool = config.SNAPSHOT_COMPRESS,
+    keep: int = config.SNAPSHOT_KEEP,
+    pages_per_step: int = config.SNAPSHOT_PAGES_PER_STEP,
+    step_sleep_ms: float = config.SNAPSHOT_STEP_SLEEP_MS,
+    quick_check: bool = False,
+    progress=None,
+) -> Dict[str, Any]:
+    """
+    在线快照 db_path -> dest_dir/ledger-YYYYmmdd-HHMMSS.db[.gz]
+    progress(remaining, total) 每步回调一次；校验失败抛 RuntimeError，不留下半成品
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    final_path = os.path.join(dest_dir, f"{SNAPSHOT_PREFIX}{stamp}.db" + (".gz" if compress else ""))
+    tmp_path = os.path.join(dest_dir, f".{SNAPSHOT_PREFIX}{stamp}.db.tmp")
+    start = time.perf_counter()
+
+    pause = max(0.0, step_sleep_ms) / 1000.0
+
+    def on_step(status, remaining, total):
+        if progress:
+            progress(remaining, total)
+        # backup() 自己只在 SQLITE_BUSY 时 sleep；这里每步都让一下
+        if remaining and pause:
+            time.sleep(pause)
+
+    src = sqlite3.connect(db_path, timeout=config.DB_BUSY_TIMEOUT_MS / 1000.0, isolation_level=None)
+    dst = sqlite3.connect(tmp_path, isolation_level=None)
+    try:
+        # 固定读快照：之后提交的写入不会进入本次备份，也不会让 backup 从头再来
+        src.execute("BEGIN")
+        src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        src.backup(
+            dst,
+            pages=max(1, int(pages_per_step)),
+            progress=on_step,
+            sleep=pause,
+        )
+        src.execute("COMMIT")
+        # 快照本身不需要 WAL：转成单文件
+        dst.execute("PRAGMA journal_mode=DELETE")
+        page_count = dst.execute("PRAGMA page_count").fetchone()[0]
+    except BaseException:
+        dst.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        src.close()
+    dst.close()
+
+    try:
+        check = _integrity_check(tmp_path, quick=quick_check)
+        if check != "ok":
+            raise RuntimeError(f"快照校验失败: {check}")
+        db_size = os.path.getsize(tmp_path)
+        if compress:
+            with open(tmp_path, "rb") as f_in, gzip.open(final_path + ".tmp", "wb", compresslevel=config.SNAPSHOT_GZIP_LEVEL) as f_out:
+                shutil.copyfileobj(f_in, f_out, config.UPLOAD_CHUNK_SIZE)
+            os.replace(final_path + ".tmp", final_path)
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, final_path)
+    except BaseException:
+        for path in (tmp_path, final_path + ".tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+    removed = prune_snapshots(dest_dir, keep)
+    return {
+        "name": os.path.basename(final_path),
+        "path": final_path,
+        "page_count": page_count,
+        "db_size_bytes": db_size,
+        "size_bytes": os.path.getsize(final_path),
+        "compressed": compress,
+        "sha256": _sha256(final_path),
+        "integrity": "ok",
+        "elapsed_seconds": round(time.perf_counter() - start, 3),
+        "pruned": removed,
+    }
@@ -0,0 +1,118 @@
+# db_writer.py
+# 单写线程 + 组提交：
+# - 所有写操作排进同一个队列，由一个专用线程执行（SQLite 同一时刻只允许一个写者）
+# - 拿到第一个操作后最多再等 max_delay，把这段时间内到达的操作合并成一个事务，一次 fsync
+# - 每个操作包在 SAVEPOINT 里：单个失败只回滚自己，不影响同批其它操作
+# - 调用方拿到 Future，事务提交后才返回 id / rowcount
+
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+import config
+from .db_connection import ConnectionManager
+
+_STOP = object()
+
+
+class WriteQueue:
+    """单写线程；submit(fn) 中的 fn(cursor) 在写线程的事务内执行"""
+
+    def __init__(
+        self,
+        manager: ConnectionManager,
+        max_delay_ms: float = config.DB_WRITE_BATCH_DELAY_MS,
+        max_batch: int = config.DB_WRITE_MAX_BATCH,
+    ):
+        self.manager = manager
+        self.max_delay = max(0.0, max_delay_ms) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="db_writer", daemon=True)
+                self._thread.start()
+
+    def in_writer_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, fn: Callable[[Any], Any]) -> Future:
+        if self._closed:
+            raise RuntimeError("写队列已关闭")
+        self._ensure_started()
+        fut: Future = Future()
+        self._queue.put((fn, fut))
+        return fut
+
+    def run(self, fn: Callable[[Any], Any]) -> Any:
+        """提交并等待结果（fn 抛出的异常会在调用方重新抛出）"""
+        return self.submit(fn).result()
+
+    # ---------------- 写线程 ----------------
+    def _loop(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch: List[Tuple[Callable, Future]] = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    nxt = self._queue.get_nowait() if timeout <= 0 else self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if nxt is _STOP:
+                    stopping = True
+                    break
+                batch.append(nxt)
+            self._commit_batch(batch)
+        self.manager.close()
+
+    def _commit_batch(self, batch: List[Tuple[Callable, Future]]):
+        ops = [(fn, fut) for fn, fut in batch if fut.set_running_or_notify_cancel()]
+        if not ops:
+            return
+        outcomes: List[Tuple[Future, bool, Any]] = []
+        try:
+            with self.manager.transaction() as cursor:
+                for fn, fut in ops:
+                    cursor.execute('SAVEPOINT write_op')
+                    try:
+                        result = fn(cursor)
+                    except BaseException as e:
+                        cursor.execute('ROLLBACK TO write_op')
+                        cursor.execute('RELEASE write_op')
+                        outcomes.append((fut, False, e))
+                    else:
+                        cursor.execute('RELEASE write_op')
+                        outcomes.append((fut, True, result))
+        except BaseException as e:
+            # 提交失败：整批都没有落盘
+            for _, fut in ops:
+                fut.set_exception(e)
+            return
+        for fut, ok, value in outcomes:
+            if ok:
+                fut.set_result(value)
+            else:
+                fut.set_exception(value)
+
+    def close(self, timeout: Optional[float] = None):
+        """处理完已排队的操作后停止写线程"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
@@ -1,13 +1,22 @@
 # enhanced_storage.py - Enhanced storage system with new features
 import os
+import base64
+import binascii
+import calendar
 import datetime
 import sqlite3
 import json
-from typing import List, Dict, Optional, Any
+import threading
+import time
+import zlib
+from typing import List, Dict, Optional, Any, Iterable
 from dataclasses import dataclass
 
 from openpyxl import Workbook, load_workbook
 import config
+from .db_connection import ConnectionManager
+from .db_writer import WriteQueue
+from .money import to_cents, from_cents
 
 
 @dataclass
@@ -17,7 +26,7 @@ class EnhancedBill:
     ledger_id: Optional[int] = None
     filename: str = ""
     merchant: str = ""
-    amount: float = 0.0
+    amount_cents: int = 0  # integer minor units (fen); yuan only at the API boundary
     category_id: Optional[int] = None
     category: str = ""
     bill_date: str = ""  # YYYY-MM-DD format
@@ -26,7 +35,10 @@ class EnhancedBill:
     raw_text: List[str] = None
     is_manual: bool = False
     include_in_budget: bool = True
-    
+    external_id: Optional[str] = None  # e.g. "alipay:<交易号>" for statement imports
+    needs_review: bool = False  # auto-ingested (folder watcher) and not yet confirmed by the user
+    ocr_lines: Optional[List[Dict[str, Any]]] = None  # per-line {"text", "conf", "box"} when OCR provides them
+
     def __post_init__(self):
         if self.raw_text is None:
             self.raw_text = []
@@ -40,6 +52,24 @@ class EnhancedBill:
             self.include_in_budget = True
 
 
+@dataclass
+class BillListItem:
+    """Bill row for list views: no raw_text, no defaults computed on construction"""
+    id: int
+    ledger_id: Optional[int]
+    filename: str
+    merchant: str
+    amount_cents: int
+    category_id: Optional[int]
+    category: str
+    bill_date: str
+    created_at: str
+    updated_at: str
+    is_manual: bool
+    include_in_budget: bool
+    needs_review: bool
+
+
 @dataclass
 class CategoryRule:
     """Category rule data model"""
@@ -82,7 +112,7 @@ class RecurringRule:
     """Recurring bill rule data model"""
     id: Optional[int] = None
     ledger_id: Optional[int] = None
-    amount: float = 0.0
+    amount_cents: int = 0
     keyword: str = ""
     category_id: Optional[int] = None
     category: str = ""
@@ -95,6 +125,7 @@ class RecurringRule:
     include_in_budget: bool = True
     created_at: str = ""
     updated_at: str = ""
+    generated_through: Optional[str] = None  # last date (YYYY-MM-DD) bills were generated up to
 
     def __post_init__(self):
         today = datetime.date.today().strftime("%Y-%m-%d")
@@ -111,16 +142,242 @@ class RecurringRule:
 
 class EnhancedDatabaseManager:
     """Enhanced database manager with new schema and features"""
-    
+
+    # Column order expected by _row_to_bill (physical column order differs
+    # between freshly created and migrated databases). raw_text is not a bills
+    # column: it lives compressed in bill_raw_text and is loaded on demand.
+    _BILL_COLUMNS = (
+        "b.id, b.record_time, b.image_name, b.merchant, b.category, b.amount_cents, "
+        "b.bill_date, b.created_at, b.updated_at, b.is_manual, b.ledger_id, b.category_id, "
+        "b.include_in_budget, b.needs_review"
+    )
+
     def __init__(self, db_name=config.DB_PATH):
         self.db_name = db_name
+        self._db = ConnectionManager(db_name)
+        self._writer = WriteQueue(self._db)
+        self._fts_enabled: Optional[bool] = None
+        self._bill_listeners: List[Any] = []
+        # data versions: one counter for the whole database, plus the counter
+        # value of each ledger's last write (see data_version)
+        self._version_lock = threading.Lock()
+        self._version = 0
+        self._all_ledgers_version = 0
+        self._ledger_versions: Dict[int, int] = {}
+        # write_counter values produced by this process and not folded in yet, the
+        # last value folded in, how many times another process was seen writing,
+        # and when write_counter may be read again (see _check_external_writes)
+        self._own_writes: set = set()
+        self._seen_write_counter = 0
+        self._external_writes = 0
+        self._next_external_check = 0.0
         self.init_db()
+        self._seen_write_counter = self._read_write_counter()
+
+    def _write(self, op):
+        """Run op(cursor) through the single writer thread (group commit).
+
+        Calls made while this thread already holds a transaction (the writer
+        thread itself, or init_db) run inline so nested writes stay atomic.
+        Each top-level write also advances write_counter in its own transaction,
+        which is how other processes notice it (see external_write_version).
+        """
+        if self._writer.in_writer_thread() or self._db.in_transaction():
+            with self._db.transaction() as cursor:
+                return op(cursor)
+
+        def counted(cursor):
+            result = op(cursor)
+            cursor.execute('UPDATE write_counter SET version = version + 1 WHERE id = 1')
+            cursor.execute('SELECT version FROM write_counter WHERE id = 1')
+            return result, cursor.fetchone()[0]
+
+        result, counter = self._writer.run(counted)
+        # recorded after the commit: a reader that gets here first counts the write as
+        # external, which only costs an unneeded invalidation
+        with self._version_lock:
+            if counter > self._seen_write_counter:
+                self._own_writes.add(counter)
+            # fold in the run of our own writes right away, so processes that only
+            # write (run.py --watch, importers) don't accumulate them
+            while self._seen_write_counter + 1 in self._own_writes:
+                self._seen_write_counter += 1
+                self._own_writes.discard(self._seen_write_counter)
+            if len(self._own_writes) > self._OWN_WRITES_LIMIT:
+                # another process wrote in between and nobody checked since
+                self._fold_write_counter(max(self._own_writes))
+        return result
+
+    # own write_counter values kept past a gap before the gap is taken as an external write
+    _OWN_WRITES_LIMIT = 1024
+
+    def _read_write_counter(self) -> int:
+        with self._db.read() as cursor:
+            cursor.execute('SELECT version FROM write_counter WHERE id = 1')
+            row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def _check_external_writes(self) -> bool:
+        """Fold in write_counter; True when a write not made by this process showed up.
+
+        Other processes (run.py --watch, import_statements.py, recurring_tick.py)
+        write the same file, and nothing in this process is told about it.
+        write_counter is read at most once per config.DB_EXTERNAL_WRITE_CHECK_MS;
+        calls in between answer from memory.
+        """
+        now = time.monotonic()
+        with self._version_lock:
+            if now < self._next_external_check:
+                return False
+            self._next_external_check = now + config.DB_EXTERNAL_WRITE_CHECK_MS / 1000
+        stored = self._read_write_counter()
+        with self._version_lock:
+            if stored == self._seen_write_counter:
+                return False
+            return self._fold_write_counter(stored)
+
+    def _fold_write_counter(self, stored: int) -> bool:
+        """Advance _seen_write_counter to stored (caller holds _version_lock).
+
+        Returns True, and advances every ledger's version, when a value in between
+        was not written by this process.
+        """
+        seen = self._seen_write_counter
+        # a smaller counter means the file was replaced (restore)
+        external = stored < seen or any(v not in self._own_writes for v in range(seen + 1, stored + 1))
+        self._own_writes = {v for v in self._own_writes if v > stored}
+        self._seen_write_counter = stored
+        if external:
+            self._external_writes += 1
+            # no way to tell which ledgers were touched
+            self._version += 1
+            self._all_ledgers_version = self._version
+        return external
+
+    def external_write_version(self) -> int:
+        """Counter that changes whenever another process has written the database.
+
+        Caches that are kept current through add_bills_listener compare it before
+        serving and reload when it moved, since those writes never reach the listeners.
+        """
+        self._check_external_writes()
+        return self._external_writes
+
+    def add_bills_listener(self, callback):
+        """Call callback(bill_ids, ledger_id) after every committed write that changes bills.
+
+        bill_ids lists the rows inserted, updated or deleted (their ledger may have
+        changed too). bill_ids None means any bill of ledger_id may have changed,
+        and ledger_id None as well means any ledger.
+        """
+        self._bill_listeners.append(callback)
+
+    def _bills_changed(self, bill_ids: Optional[List[int]] = None, ledger_id: Optional[int] = None):
+        if bill_ids is not None and not bill_ids:
+            return
+        for callback in list(self._bill_listeners):
+            try:
+                callback(bill_ids, ledger_id)
+            except Exception as e:
+                print(f"⚠️ [DB] 账单变更通知失败: {e}")
+
+    def data_version(self, ledger_id: Optional[int] = None) -> int:
+        """Monotonic version of what reads of ledger_id can see (None: the whole database).
+
+        It changes after every committed write that may affect those reads, so it
+        can key result caches and ETags. It lives in memory and restarts start
+        over; writes made by other processes are picked up from write_counter
+        and advance every ledger's version.
+        """
+        self._check_external_writes()
+        if ledger_id is None:
+            return self._version
+        return max(self._ledger_versions.get(ledger_id, 0), self._all_ledgers_version)
+
+    def _bump_version(self, ledger_ids: Optional[Iterable[Optional[int]]] = None):
+        """Advance data versions after a commit; None (or a None in ledger_ids) means every ledger.
+
+        Call after _bills_changed, so a reader that sees the new version also sees
+        the listeners' invalidation. Nested writes (inside another transaction)
+        are skipped: the enclosing call bumps once it has committed.
+        """
+        if self._writer.in_writer_thread() or self._db.in_transaction():
+            return
+        ledger_ids = None if ledger_ids is None else set(ledger_ids)
+        with self._version_lock:
+            self._version += 1
+            if ledger_ids is None or None in ledger_ids:
+                self._all_ledgers_version = self._version
+                return
+            for ledger_id in ledger_ids:
+                self._ledger_versions[ledger_id] = self._version
+
+    def release_connection(self):
+        """Hand this thread's read connection back to the idle pool (end of a web request)"""
+        self._db.release()
+
+    def close(self):
+        """Flush queued writes and close connections"""
+        self._writer.close()
+        self._db.close_all()
     
+    # Ordered schema migrations: (user_version once applied, description, method).
+    # Append new steps at the end; never renumber or change an applied one.
+    _MIGRATIONS = (
+        (1, 'base schema, ledger-scoped categories/rules/bills', '_migration_base'),
+        (2, 'category ids on bills and rules', '_migrate_categories_with_ids'),
+        (3, 'canonical category paths on bills', '_migrate_bills_category_paths'),
+        (4, 'drop superseded single-column indexes', '_migration_drop_single_column_indexes'),
+        (5, 'indexes, full-text search, daily rollup, category sync and cleanup', '_migration_indexes_and_derived_tables'),
+        (6, 'generated_through watermark on recurring rules', '_migration_recurring_watermark'),
+        (7, 'compressed chunked ledger backups', '_migration_backup_chunks'),
+        (8, 'raw OCR text moved to compressed bill_raw_text', '_migration_raw_text_side_table'),
+        (9, 'money stored as integer cents', '_migration_integer_cents'),
+        (10, 'bill list keyset index ending in id', '_migration_bill_list_keyset_index'),
+        (11, 'write counter for other processes to notice commits', '_migration_write_counter'),
+    )
+    SCHEMA_VERSION = _MIGRATIONS[-1][0]
+
     def init_db(self):
-        """Initialize enhanced database schema"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
+        """Bring the schema up to SCHEMA_VERSION.
+
+        An up-to-date database costs a single PRAGMA read; otherwise the pending
+        migrations run in one write transaction and are logged in schema_migrations.
+        """
+        with self._db.read() as cursor:
+            cursor.execute('PRAGMA user_version')
+            if (cursor.fetchone()[0] or 0) >= self.SCHEMA_VERSION:
+                return
+
+        with self._db.transaction() as cursor:
+            # re-read under the write lock: another process may have migrated meanwhile
+            cursor.execute('PRAGMA user_version')
+            current = cursor.fetchone()[0] or 0
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT,
+                    applied_at TEXT
+                )
+            ''')
+            # steps applied before the log existed
+            cursor.executemany(
+                'INSERT OR IGNORE INTO schema_migrations (version, description, applied_at) VALUES (?, ?, NULL)',
+                [(version, description) for version, description, _ in self._MIGRATIONS if version <= current],
+            )
+            for version, description, method in self._MIGRATIONS:
+                if version <= current:
+                    continue
+                print(f"🔄 [DB Migration] v{version}: {description}")
+                getattr(self, method)(cursor)
+                cursor.execute(
+                    'INSERT OR REPLACE INTO schema_migrations (version, description, applied_at) VALUES (?, ?, ?)',
+                    (version, description, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+                )
+                cursor.execute(f'PRAGMA user_version = {int(version)}')
+
+    def _ensure_base_schema(self, cursor):
+        """Create missing tables and columns (idempotent)"""
         # Ledgers table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS ledgers (
@@ -131,7 +388,7 @@ class EnhancedDatabaseManager:
                 updated_at TEXT
             )
         ''')
-        
+
         # Ledger backup snapshots (created on ledger delete)
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS ledger_backups (
@@ -147,11 +404,11 @@ class EnhancedDatabaseManager:
         # Check if we need to migrate existing bills table
         cursor.execute("PRAGMA table_info(bills)")
         columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'bill_date' not in columns:
+
+        if columns and 'bill_date' not in columns:
             # Migrate existing table
             self._migrate_bills_table(cursor)
-        
+
         # Create enhanced bills table if it doesn't exist
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS bills (
@@ -170,7 +427,7 @@ class EnhancedDatabaseManager:
                 include_in_budget INTEGER DEFAULT 1
             )
         ''')
-        
+
         # Create category_rules table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS category_rules (
@@ -266,6 +523,16 @@ class EnhancedDatabaseManager:
                 cursor.execute('ALTER TABLE bills ADD COLUMN include_in_budget INTEGER DEFAULT 1')
             except Exception:
                 pass
+        if 'external_id' not in bill_cols:
+            try:
+                cursor.execute('ALTER TABLE bills ADD COLUMN external_id TEXT')
+            except Exception:
+                pass
+        if 'needs_review' not in bill_cols:
+            try:
+                cursor.execute('ALTER TABLE bills ADD COLUMN needs_review INTEGER DEFAULT 0')
+            except Exception:
+                pass
 
         # Ensure default ledger exists before running migrations that need it
         cursor.execute('SELECT COUNT(*) FROM ledgers')
@@ -273,31 +540,57 @@ class EnhancedDatabaseManager:
             now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             cursor.execute('INSERT INTO ledgers (name, monthly_budget, created_at, updated_at) VALUES (?, ?, ?, ?)',
                            ('默认账本', 0, now, now))
-            conn.commit()
-
-        # Rebuild tables to add unique constraints with ledger_id (if not yet migrated)
-        cursor.execute('PRAGMA user_version')
-        user_version = cursor.fetchone()[0] or 0
-        if user_version < 1:
-            self._migrate_categories_with_ledger(cursor)
-            self._migrate_category_rules_with_ledger(cursor)
-            self._migrate_bills_with_ledger(cursor)
-            cursor.execute('PRAGMA user_version = 1')
-            user_version = 1
-        if user_version < 2:
-            self._migrate_categories_with_ids(cursor)
-            cursor.execute('PRAGMA user_version = 2')
-        
+
+    def _migration_base(self, cursor):
+        self._ensure_base_schema(cursor)
+        # Rebuild tables to add unique constraints with ledger_id
+        self._migrate_categories_with_ledger(cursor)
+        self._migrate_category_rules_with_ledger(cursor)
+        self._migrate_bills_with_ledger(cursor)
+
+    def _migration_drop_single_column_indexes(self, cursor):
+        # superseded by the ledger-leading indexes created in the next step
+        for index in ('idx_bills_bill_date', 'idx_bills_category', 'idx_bills_created_at',
+                      'idx_bill_daily_rollup_key'):
+            cursor.execute(f'DROP INDEX IF EXISTS {index}')
+
+    def _migration_indexes_and_derived_tables(self, cursor):
+        """Everything init_db used to redo on every start, now run once"""
+        # databases migrated by older versions may miss recently added columns
+        self._ensure_base_schema(cursor)
+
         # Create indexes for performance
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_bills_bill_date ON bills(bill_date)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_bills_category ON bills(category)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_bills_created_at ON bills(created_at)')
+        # bills: every list/count/backup query is scoped to one ledger, so indexes lead with
+        # ledger_id; (ledger_id, bill_date, created_at) also serves the default list order
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_bills_ledger_date ON bills(ledger_id, bill_date, created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_bills_ledger_category_date ON bills(ledger_id, category_id, bill_date)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_bills_ledger_category_name ON bills(ledger_id, category)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_bills_category_id ON bills(category_id)')
+        # partial indexes for the small "excluded from budget" and "needs review" subsets
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_bills_ledger_excluded
+            ON bills(ledger_id, bill_date) WHERE include_in_budget = 0
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_bills_ledger_review
+            ON bills(ledger_id, bill_date) WHERE needs_review = 1
+        ''')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_category_rules_keyword ON category_rules(keyword)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_categories_major_minor ON categories(major, minor)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_recurring_rules_ledger ON recurring_rules(ledger_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_recurring_rule_runs_rule_date ON recurring_rule_runs(rule_id, bill_date)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_ledger_backups_ledger ON ledger_backups(ledger_id)')
-        
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_bills_ledger_external_id
+            ON bills(ledger_id, external_id) WHERE external_id IS NOT NULL
+        ''')
+
+        # Full-text index for keyword search
+        self._ensure_bills_fts(cursor)
+
+        # Per-day aggregates for analytics (bills.amount is still REAL here; rebuilt in v9)
+        self._ensure_bill_rollup(cursor, amount_column='amount')
+
         # Do not auto-seed category rules from config on startup
 
         # Initialize categories from existing rules or config if table is empty
@@ -307,11 +600,329 @@ class EnhancedDatabaseManager:
         else:
             self._sync_categories_from_rules(cursor)
 
-        # Cleanup legacy NULL-ledger duplicates once on startup
+        # Cleanup legacy NULL-ledger duplicates
         self._cleanup_categories(cursor)
-        
-        conn.commit()
-        conn.close()
+
+    def _migration_recurring_watermark(self, cursor):
+        # NULL means "never generated": the first run walks from start_date and skips dates
+        # already present in recurring_rule_runs
+        if 'generated_through' not in self._table_columns(cursor, 'recurring_rules'):
+            cursor.execute('ALTER TABLE recurring_rules ADD COLUMN generated_through TEXT')
+
+    def _migration_backup_chunks(self, cursor):
+        # ledger_backups keeps only metadata; the payload is a zlib stream split over chunk rows.
+        # Older backups (format NULL) still carry their JSON in backup_json and restore as before.
+        backup_cols = self._table_columns(cursor, 'ledger_backups')
+        for column, decl in (('format', 'INTEGER'), ('bill_count', 'INTEGER'), ('size_bytes', 'INTEGER')):
+            if column not in backup_cols:
+                cursor.execute(f'ALTER TABLE ledger_backups ADD COLUMN {column} {decl}')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ledger_backup_chunks (
+                backup_id INTEGER NOT NULL,
+                seq INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (backup_id, seq)
+            ) WITHOUT ROWID
+        ''')
+
+    def _migration_raw_text_side_table(self, cursor):
+        """Move bills.raw_text into bill_raw_text and rebuild bills_fts on top of it.
+
+        bills keeps only the small fields every list and aggregate reads; the OCR
+        lines are zlib-compressed JSON keyed by bill id. The external-content FTS
+        table read bills.raw_text, so it becomes a regular FTS table fed by
+        _store_raw_text instead.
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS bill_raw_text (
+                bill_id INTEGER PRIMARY KEY,
+                data BLOB NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS bill_raw_text_ad AFTER DELETE ON bills BEGIN
+                DELETE FROM bill_raw_text WHERE bill_id = old.id;
+            END
+        ''')
+        for trigger in ('bills_fts_ai', 'bills_fts_ad', 'bills_fts_au'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        cursor.execute('DROP TABLE IF EXISTS bills_fts')
+        fts = self._create_bills_fts(cursor)
+        self._fts_enabled = fts
+
+        has_raw_text = 'raw_text' in self._table_columns(cursor, 'bills')
+        if has_raw_text:
+            print("🔄 [DB Migration] 正在迁移账单原始识别文本...")
+        reader = cursor.connection.cursor()
+        try:
+            reader.execute(f"SELECT id, merchant, {'raw_text' if has_raw_text else 'NULL'} FROM bills")
+            while True:
+                rows = reader.fetchmany(500)
+                if not rows:
+                    break
+                items = []
+                fts_rows = []
+                for bill_id, merchant, raw in rows:
+                    lines, ocr = self._raw_text_from_value(raw)
+                    if lines or ocr:
+                        items.append((bill_id, lines, ocr))
+                    fts_rows.append((bill_id, merchant, self._raw_text_for_index(lines)))
+                if fts:
+                    cursor.executemany(
+                        'INSERT INTO bills_fts(rowid, merchant, raw_text) VALUES (?, ?, ?)', fts_rows
+                    )
+                self._store_raw_text(cursor, items, index=False)
+        finally:
+            reader.close()
+
+        if has_raw_text:
+            try:
+                cursor.execute('ALTER TABLE bills DROP COLUMN raw_text')
+            except sqlite3.OperationalError:
+                # SQLite < 3.35 cannot drop columns; empty it so pages shrink after VACUUM
+                cursor.execute('UPDATE bills SET raw_text = NULL')
+            print("✅ [DB Migration] 原始识别文本迁移完成")
+
+    # (table, legacy REAL yuan column, INTEGER cents column)
+    _MONEY_COLUMNS = (
+        ('bills', 'amount', 'amount_cents'),
+        ('recurring_rules', 'amount', 'amount_cents'),
+        ('ledgers', 'monthly_budget', 'monthly_budget_cents'),
+        ('ledger_backups', 'monthly_budget', 'monthly_budget_cents'),
+    )
+
+    def _migration_integer_cents(self, cursor):
+        """Replace the REAL yuan amounts with INTEGER cents and rebuild the rollup.
+
+        The app always wrote two-decimal amounts, so ROUND(x * 100) recovers the
+        intended value exactly; from here on sums are integer arithmetic in SQL.
+        """
+        # the rollup triggers reference bills.amount, which blocks dropping the column
+        for trigger in ('bill_rollup_ai', 'bill_rollup_ad', 'bill_rollup_au'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        cursor.execute('DROP TABLE IF EXISTS bill_daily_rollup')
+
+        for table, legacy, column in self._MONEY_COLUMNS:
+            columns = self._table_columns(cursor, table)
+            if column not in columns:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0')
+            if legacy not in columns:
+                continue
+            cursor.execute(f'UPDATE {table} SET {column} = CAST(ROUND(COALESCE({legacy}, 0) * 100) AS INTEGER)')
+            try:
+                cursor.execute(f'ALTER TABLE {table} DROP COLUMN {legacy}')
+            except sqlite3.OperationalError:
+                # SQLite < 3.35 cannot drop columns
+                if table == 'recurring_rules':
+                    # amount is NOT NULL there, so new rules could not be inserted around it
+                    self._rebuild_recurring_rules(cursor)
+                else:
+                    cursor.execute(f'UPDATE {table} SET {legacy} = NULL')
+
+        self._ensure_bill_rollup(cursor)
+
+    def _migration_bill_list_keyset_index(self, cursor):
+        """Let list_bills order and seek on (bill_date, created_at, id) straight from an index.
+
+        Keyset pages compare raw columns, so created_at must not be NULL; the old
+        list order already treated a missing created_at as ''.
+        """
+        cursor.execute("UPDATE bills SET created_at = '' WHERE created_at IS NULL")
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_bills_ledger_date_id
+            ON bills(ledger_id, bill_date, created_at, id)
+        ''')
+        cursor.execute('DROP INDEX IF EXISTS idx_bills_ledger_date')
+
+    def _migration_write_counter(self, cursor):
+        """One row bumped by every _write, so caches can tell another process wrote."""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS write_counter (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute('INSERT OR IGNORE INTO write_counter (id, version) VALUES (1, 0)')
+
+    def _rebuild_recurring_rules(self, cursor):
+        """Recreate recurring_rules without the legacy amount column (pre-DROP COLUMN SQLite)"""
+        keep = [c for c in self._table_columns(cursor, 'recurring_rules') if c != 'amount']
+        cursor.execute('ALTER TABLE recurring_rules RENAME TO recurring_rules_old')
+        cursor.execute('''
+            CREATE TABLE recurring_rules (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ledger_id INTEGER,
+                amount_cents INTEGER NOT NULL DEFAULT 0,
+                keyword TEXT,
+                category_id INTEGER,
+                category TEXT,
+                note TEXT,
+                schedule_type TEXT NOT NULL,
+                schedule_value INTEGER NOT NULL,
+                start_date TEXT NOT NULL,
+                end_date TEXT,
+                enabled INTEGER DEFAULT 1,
+                include_in_budget INTEGER DEFAULT 1,
+                created_at TEXT,
+                updated_at TEXT,
+                generated_through TEXT
+            )
+        ''')
+        columns = ', '.join(keep)
+        cursor.execute(f'INSERT INTO recurring_rules ({columns}) SELECT {columns} FROM recurring_rules_old')
+        cursor.execute('DROP TABLE recurring_rules_old')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_recurring_rules_ledger ON recurring_rules(ledger_id)')
+
+    def _create_bills_fts(self, cursor) -> bool:
+        """Create bills_fts (merchant + OCR text, trigram) and its bills triggers.
+
+        merchant follows bills through triggers; the OCR text is written by
+        _store_raw_text. Returns False when this SQLite lacks FTS5/trigram.
+        """
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS bills_fts USING fts5(
+                    merchant, raw_text,
+                    tokenize = 'trigram'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ [DB Init] 全文索引不可用，关键词搜索使用 LIKE: {e}")
+            return False
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS bills_fts_ai AFTER INSERT ON bills BEGIN
+                INSERT INTO bills_fts(rowid, merchant, raw_text) VALUES (new.id, new.merchant, '');
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS bills_fts_ad AFTER DELETE ON bills BEGIN
+                DELETE FROM bills_fts WHERE rowid = old.id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS bills_fts_au AFTER UPDATE OF merchant ON bills BEGIN
+                UPDATE bills_fts SET merchant = new.merchant WHERE rowid = new.id;
+            END
+        ''')
+        return True
+
+    def _ensure_bills_fts(self, cursor) -> bool:
+        """Create the bills_fts trigram index and its sync triggers; backfill on first creation.
+
+        bills_fts is an external-content FTS5 table over bills(merchant, raw_text),
+        so it stores only the index. Returns False when this SQLite build has no
+        FTS5/trigram support, in which case keyword search falls back to LIKE.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='bills_fts'")
+        exists = cursor.fetchone() is not None
+        if not exists:
+            try:
+                cursor.execute('''
+                    CREATE VIRTUAL TABLE bills_fts USING fts5(
+                        merchant, raw_text,
+                        content='bills', content_rowid='id',
+                        tokenize='trigram'
+                    )
+                ''')
+            except sqlite3.OperationalError as e:
+                print(f"⚠️ [DB Init] 当前 SQLite 不支持 FTS5 trigram，关键词搜索使用 LIKE: {e}")
+                return False
+
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS bills_fts_ai AFTER INSERT ON bills BEGIN
+                INSERT INTO bills_fts(rowid, merchant, raw_text) VALUES (new.id, new.merchant, new.raw_text);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS bills_fts_ad AFTER DELETE ON bills BEGIN
+                INSERT INTO bills_fts(bills_fts, rowid, merchant, raw_text)
+                VALUES ('delete', old.id, old.merchant, old.raw_text);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS bills_fts_au AFTER UPDATE OF merchant, raw_text ON bills BEGIN
+                INSERT INTO bills_fts(bills_fts, rowid, merchant, raw_text)
+                VALUES ('delete', old.id, old.merchant, old.raw_text);
+                INSERT INTO bills_fts(rowid, merchant, raw_text) VALUES (new.id, new.merchant, new.raw_text);
+            END
+        ''')
+
+        if not exists:
+            print("🔄 [DB Init] 正在为账单建立全文索引...")
+            cursor.execute("INSERT INTO bills_fts(bills_fts) VALUES ('rebuild')")
+            print("✅ [DB Init] 全文索引建立完成")
+        return True
+
+    _ROLLUP_KEY_COLUMNS = ('ledger_id', 'bill_date', 'category_id', 'category', 'include_in_budget')
+
+    def _ensure_bill_rollup(self, cursor, amount_column: str = 'amount_cents'):
+        """Create bill_daily_rollup and the triggers keeping it in step with bills.
+
+        One row per (ledger, day, category, budget flag) with the amount sum (in
+        cents) and bill count; rows whose count drops to zero are removed. Key
+        columns keep the bills values as-is (NULLs included, matched with IS) so
+        filters and grouping behave exactly as on bills. Backfilled on first
+        creation. amount_column is the bills column summed; only migration 5,
+        which predates cents, passes the old 'amount'.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='bill_daily_rollup'")
+        exists = cursor.fetchone() is not None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS bill_daily_rollup (
+                id INTEGER PRIMARY KEY,
+                ledger_id INTEGER,
+                bill_date TEXT,
+                category_id INTEGER,
+                category TEXT,
+                include_in_budget INTEGER,
+                amount_cents INTEGER NOT NULL DEFAULT 0,
+                bill_count INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        # key columns first (trigger lookups, ledger + date range), then the measures:
+        # covers every aggregate query so they never touch the table
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_bill_daily_rollup_cover
+            ON bill_daily_rollup(ledger_id, bill_date, category_id, category, include_in_budget,
+                                 amount_cents, bill_count)
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_bill_daily_rollup_date ON bill_daily_rollup(bill_date)')
+
+        columns = ', '.join(self._ROLLUP_KEY_COLUMNS)
+
+        def match(row):
+            return ' AND '.join(f'{col} IS {row}.{col}' for col in self._ROLLUP_KEY_COLUMNS)
+
+        values = ', '.join(f'new.{col}' for col in self._ROLLUP_KEY_COLUMNS)
+        add_new = f'''
+            INSERT INTO bill_daily_rollup ({columns}, amount_cents, bill_count)
+            SELECT {values}, 0, 0
+            WHERE NOT EXISTS (SELECT 1 FROM bill_daily_rollup WHERE {match('new')});
+            UPDATE bill_daily_rollup
+            SET amount_cents = amount_cents + COALESCE(new.{amount_column}, 0), bill_count = bill_count + 1
+            WHERE {match('new')};
+        '''
+        remove_old = f'''
+            UPDATE bill_daily_rollup
+            SET amount_cents = amount_cents - COALESCE(old.{amount_column}, 0), bill_count = bill_count - 1
+            WHERE {match('old')};
+            DELETE FROM bill_daily_rollup WHERE {match('old')} AND bill_count <= 0;
+        '''
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS bill_rollup_ai AFTER INSERT ON bills BEGIN {add_new} END')
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS bill_rollup_ad AFTER DELETE ON bills BEGIN {remove_old} END')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS bill_rollup_au
+            AFTER UPDATE OF {columns}, {amount_column} ON bills
+            BEGIN {remove_old} {add_new} END
+        ''')
+
+        if not exists:
+            cursor.execute(f'''
+                INSERT INTO bill_daily_rollup ({columns}, amount_cents, bill_count)
+                SELECT {columns}, SUM(COALESCE({amount_column}, 0)), COUNT(*)
+                FROM bills
+                GROUP BY {columns}
+            ''')
 
     def _migrate_categories_with_ledger(self, cursor):
         cursor.execute("PRAGMA table_info(categories)")
@@ -456,274 +1067,451 @@ class EnhancedDatabaseManager:
                 cursor.execute("UPDATE category_rules SET category_id=? WHERE id=?", (cid, rid))
 
 
+    def _migrate_bills_category_paths(self, cursor):
+        """Link bills without a (valid) category_id by name, clear ids of deleted
+        categories, and store the canonical "major/minor" path in bills.category
+        for linked bills so it can be indexed.
+        """
+        unlinked = '(category_id IS NULL OR category_id NOT IN (SELECT id FROM categories))'
+        cursor.execute(f'''
+            SELECT DISTINCT ledger_id, category FROM bills
+            WHERE {unlinked} AND COALESCE(category, '') != ''
+        ''')
+        pending = cursor.fetchall()
+        name_maps: Dict[Optional[int], Dict[str, int]] = {}
+        links = []
+        for lid, name in pending:
+            if lid not in name_maps:
+                name_maps[lid] = self._load_category_id_map(cursor, lid)
+            group = self._split_category_name(name)
+            cid = name_maps[lid].get(self._format_category_name(group.major, group.minor))
+            if cid:
+                links.append((cid, lid, name))
+        cursor.executemany(f'''
+            UPDATE bills SET category_id = ?
+            WHERE ledger_id IS ? AND category = ? AND {unlinked}
+        ''', links)
+        # ids of deleted categories: the name in bills.category is all that is left
+        cursor.execute('''
+            UPDATE bills SET category_id = NULL
+            WHERE category_id IS NOT NULL AND category_id NOT IN (SELECT id FROM categories)
+        ''')
+
+        cursor.execute('SELECT id, major, minor FROM categories')
+        cursor.executemany(
+            'UPDATE bills SET category = ? WHERE category_id = ? AND category IS NOT ?',
+            [(self._format_category_name(major, minor), cid, self._format_category_name(major, minor))
+             for cid, major, minor in cursor.fetchall()],
+        )
+
     def get_default_ledger_id(self) -> int:
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('SELECT id FROM ledgers ORDER BY id LIMIT 1')
-        row = cursor.fetchone()
-        conn.close()
-        return row[0] if row else 0
+        with self._db.read() as cursor:
+            cursor.execute('SELECT id FROM ledgers ORDER BY id LIMIT 1')
+            row = cursor.fetchone()
+            return row[0] if row else 0
 
     def get_ledger_count(self) -> int:
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM ledgers')
-        count = cursor.fetchone()[0] or 0
-        conn.close()
-        return count
+        with self._db.read() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM ledgers')
+            count = cursor.fetchone()[0] or 0
+            return count
 
     def _table_columns(self, cursor, table: str) -> List[str]:
         cursor.execute(f"PRAGMA table_info({table})")
         return [row[1] for row in cursor.fetchall()]
 
-    def _fetch_rows(self, cursor, table: str, where_clause: str = "", params: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
-        query = f"SELECT * FROM {table}"
-        if where_clause:
-            query += f" WHERE {where_clause}"
-        cursor.execute(query, params or [])
-        cols = [desc[0] for desc in cursor.description]
-        return [dict(zip(cols, row)) for row in cursor.fetchall()]
+    # Tables captured in a ledger backup, in restore order
+    _BACKUP_TABLES = ("categories", "category_rules", "bills", "recurring_rules", "recurring_rule_runs")
+    _BACKUP_FORMAT = 2
+
+    def _write_backup_stream(self, cursor, backup_id: int, ledger: Dict[str, Any]) -> Dict[str, int]:
+        """Stream a ledger into ledger_backup_chunks as zlib-compressed JSON lines.
+
+        Line 1 is {"version", "ledger"}; each table follows as a {"table", "columns"} header
+        line and one JSON array per row. Rows are read in batches, so memory stays bounded
+        by one batch plus one chunk regardless of ledger size.
+        """
+        compressor = zlib.compressobj(config.BACKUP_COMPRESS_LEVEL)
+        pending: List[bytes] = []
+        pending_size = 0
+        seq = 0
+        size_bytes = 0
+        bill_count = 0
+
+        def flush_chunk(force: bool = False):
+            nonlocal pending, pending_size, seq, size_bytes
+            if not pending or (pending_size < config.BACKUP_CHUNK_BYTES and not force):
+                return
+            data = b"".join(pending)
+            cursor.execute(
+                'INSERT INTO ledger_backup_chunks (backup_id, seq, data) VALUES (?, ?, ?)',
+                (backup_id, seq, data),
+            )
+            seq += 1
+            size_bytes += len(data)
+            pending, pending_size = [], 0
+
+        def write_line(value: Any):
+            nonlocal pending_size
+            out = compressor.compress(json.dumps(value, ensure_ascii=False).encode("utf-8") + b"\n")
+            if out:
+                pending.append(out)
+                pending_size += len(out)
+                flush_chunk()
+
+        write_line({"version": self._BACKUP_FORMAT, "ledger": ledger})
+        # a second cursor on the same connection reads while the first one inserts chunks
+        reader = cursor.connection.cursor()
+        try:
+            for table in self._BACKUP_TABLES:
+                if table == "bills":
+                    # OCR text travels with its bill as a trailing raw_text column ({"lines", "ocr"})
+                    reader.execute(
+                        'SELECT b.*, r.data AS raw_text FROM bills b '
+                        'LEFT JOIN bill_raw_text r ON r.bill_id = b.id WHERE b.ledger_id = ?',
+                        (ledger["id"],),
+                    )
+                else:
+                    reader.execute(f"SELECT * FROM {table} WHERE ledger_id = ?", (ledger["id"],))
+                write_line({"table": table, "columns": [desc[0] for desc in reader.description]})
+                while True:
+                    rows = reader.fetchmany(config.BACKUP_BATCH_ROWS)
+                    if not rows:
+                        break
+                    if table == "bills":
+                        bill_count += len(rows)
+                    for row in rows:
+                        row = list(row)
+                        if table == "bills":
+                            lines, ocr = self._raw_text_from_value(row[-1])
+                            row[-1] = {"lines": lines, "ocr": ocr} if (lines or ocr) else None
+                        write_line(row)
+        finally:
+            reader.close()
+
+        tail = compressor.flush()
+        if tail:
+            pending.append(tail)
+            pending_size += len(tail)
+        flush_chunk(force=True)
+        return {"bill_count": bill_count, "size_bytes": size_bytes}
+
+    def _read_backup_stream(self, cursor, backup_id: int):
+        """Yield the decoded JSON lines of a chunked backup, one chunk in memory at a time"""
+        decompressor = zlib.decompressobj()
+        reader = cursor.connection.cursor()
+        buffer = b""
+        try:
+            reader.execute(
+                'SELECT data FROM ledger_backup_chunks WHERE backup_id = ? ORDER BY seq',
+                (backup_id,),
+            )
+            for (data,) in reader:
+                buffer += decompressor.decompress(data)
+                lines = buffer.split(b"\n")
+                buffer = lines.pop()
+                for line in lines:
+                    if line:
+                        yield json.loads(line)
+            buffer += decompressor.flush()
+            if buffer.strip():
+                yield json.loads(buffer)
+        finally:
+            reader.close()
+
+    def _restore_table_rows(self, cursor, table: str, columns: List[str], rows, ledger_id: int) -> int:
+        """executemany the rows (lists aligned with columns) in batches; unknown columns are dropped.
+
+        A bills raw_text column (inline JSON in older backups) goes to bill_raw_text, and
+        a REAL yuan amount column from backups older than cents is converted.
+        """
+        raw_pos = columns.index("raw_text") if table == "bills" and "raw_text" in columns else None
+        id_pos = columns.index("id") if "id" in columns else None
+        available = set(self._table_columns(cursor, table))
+        legacy_amount_pos = None
+        if "amount" in columns and "amount_cents" not in columns and "amount_cents" in available:
+            legacy_amount_pos = columns.index("amount")
+            columns = list(columns)
+            columns[legacy_amount_pos] = "amount_cents"
+        keep = [i for i, col in enumerate(columns) if col in available]
+        if not keep:
+            return 0
+        use_cols = [columns[i] for i in keep]
+        ledger_pos = use_cols.index("ledger_id") if "ledger_id" in use_cols else None
+        sql = f"INSERT INTO {table} ({', '.join(use_cols)}) VALUES ({','.join(['?'] * len(use_cols))})"
+
+        def project(row):
+            if legacy_amount_pos is not None and legacy_amount_pos < len(row):
+                row = list(row)
+                row[legacy_amount_pos] = to_cents(row[legacy_amount_pos])
+            values = [row[i] if i < len(row) else None for i in keep]
+            if ledger_pos is not None:
+                values[ledger_pos] = ledger_id
+            return values
+
+        inserted = 0
+        batch = []
+        raw_items = []
+
+        def flush():
+            nonlocal inserted, batch, raw_items
+            cursor.executemany(sql, batch)
+            self._store_raw_text(cursor, raw_items)
+            inserted += len(batch)
+            batch, raw_items = [], []
 
-    def _insert_rows(self, cursor, table: str, rows: List[Dict[str, Any]]):
-        if not rows:
-            return
-        available_cols = self._table_columns(cursor, table)
-        row_keys = set()
         for row in rows:
-            row_keys.update(row.keys())
-        use_cols = [col for col in available_cols if col in row_keys]
-        if not use_cols:
+            batch.append(project(row))
+            if raw_pos is not None and id_pos is not None and raw_pos < len(row):
+                lines, ocr = self._raw_text_from_value(row[raw_pos])
+                if lines or ocr:
+                    raw_items.append((row[id_pos], lines, ocr))
+            if len(batch) >= config.BACKUP_BATCH_ROWS:
+                flush()
+        if batch:
+            flush()
+        return inserted
+
+    def _restore_backup_tables(self, cursor, backup_id: int, legacy_json: Optional[str], ledger_id: int):
+        if legacy_json is not None:
+            # format 1: a single JSON document of {table: [row dicts]}
+            backup = json.loads(legacy_json or "{}")
+            for table in self._BACKUP_TABLES:
+                rows = backup.get(table) or []
+                columns: List[str] = []
+                for r in rows:
+                    columns.extend(k for k in r if k not in columns)
+                self._restore_table_rows(cursor, table, columns, ([r.get(c) for c in columns] for r in rows), ledger_id)
             return
-        placeholders = ",".join(["?"] * len(use_cols))
-        sql = f"INSERT INTO {table} ({', '.join(use_cols)}) VALUES ({placeholders})"
-        for row in rows:
-            cursor.execute(sql, [row.get(col) for col in use_cols])
 
-    def _build_ledger_backup(self, cursor, ledger_id: int) -> Optional[Dict[str, Any]]:
-        cursor.execute('SELECT id, name, monthly_budget, created_at, updated_at FROM ledgers WHERE id=?', (ledger_id,))
-        ledger_row = cursor.fetchone()
-        if not ledger_row:
-            return None
-        ledger = {
-            "id": ledger_row[0],
-            "name": ledger_row[1],
-            "monthly_budget": ledger_row[2] or 0,
-            "created_at": ledger_row[3],
-            "updated_at": ledger_row[4],
-        }
-        return {
-            "version": 1,
-            "ledger": ledger,
-            "categories": self._fetch_rows(cursor, "categories", "ledger_id = ?", [ledger_id]),
-            "category_rules": self._fetch_rows(cursor, "category_rules", "ledger_id = ?", [ledger_id]),
-            "bills": self._fetch_rows(cursor, "bills", "ledger_id = ?", [ledger_id]),
-            "recurring_rules": self._fetch_rows(cursor, "recurring_rules", "ledger_id = ?", [ledger_id]),
-            "recurring_rule_runs": self._fetch_rows(cursor, "recurring_rule_runs", "ledger_id = ?", [ledger_id]),
-        }
+        lines = self._read_backup_stream(cursor, backup_id)
+        header = next(lines, None)
+        if not isinstance(header, dict) or header.get("version") != self._BACKUP_FORMAT:
+            raise ValueError("backup_invalid")
 
-    def create_ledger_backup(self, ledger_id: int, cursor: Optional[sqlite3.Cursor] = None) -> Optional[int]:
-        owns_conn = cursor is None
-        conn = None
-        if owns_conn:
-            conn = sqlite3.connect(self.db_name)
-            cursor = conn.cursor()
-        backup = self._build_ledger_backup(cursor, ledger_id)
-        if not backup:
-            if owns_conn and conn is not None:
-                conn.close()
-            return None
-        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        backup_json = json.dumps(backup, ensure_ascii=False)
-        cursor.execute(
-            '''
-            INSERT INTO ledger_backups (ledger_id, ledger_name, monthly_budget, created_at, backup_json)
-            VALUES (?, ?, ?, ?, ?)
-            ''',
-            (backup["ledger"]["id"], backup["ledger"]["name"], backup["ledger"]["monthly_budget"], now, backup_json),
-        )
-        backup_id = cursor.lastrowid
-        if owns_conn and conn is not None:
-            conn.commit()
-            conn.close()
+        table = None
+        columns: List[str] = []
+        batch: List[List[Any]] = []
+
+        def flush():
+            if table in self._BACKUP_TABLES and batch:
+                self._restore_table_rows(cursor, table, columns, batch, ledger_id)
+            batch.clear()
+
+        for line in lines:
+            if isinstance(line, dict):
+                flush()
+                table, columns = line.get("table"), line.get("columns") or []
+            else:
+                batch.append(line)
+                if len(batch) >= config.BACKUP_BATCH_ROWS:
+                    flush()
+        flush()
+
+    def create_ledger_backup(self, ledger_id: int) -> Optional[int]:
+        # joins the caller's transaction when invoked from delete_ledger
+        def op(cursor):
+            cursor.execute('SELECT id, name, monthly_budget_cents, created_at, updated_at FROM ledgers WHERE id=?', (ledger_id,))
+            ledger_row = cursor.fetchone()
+            if not ledger_row:
+                return None
+            ledger = {
+                "id": ledger_row[0],
+                "name": ledger_row[1],
+                "monthly_budget_cents": ledger_row[2] or 0,
+                "created_at": ledger_row[3],
+                "updated_at": ledger_row[4],
+            }
+            now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            cursor.execute(
+                '''
+                INSERT INTO ledger_backups (ledger_id, ledger_name, monthly_budget_cents, created_at, format)
+                VALUES (?, ?, ?, ?, ?)
+                ''',
+                (ledger["id"], ledger["name"], ledger["monthly_budget_cents"], now, self._BACKUP_FORMAT),
+            )
+            backup_id = cursor.lastrowid
+            stats = self._write_backup_stream(cursor, backup_id, ledger)
+            cursor.execute(
+                'UPDATE ledger_backups SET bill_count = ?, size_bytes = ? WHERE id = ?',
+                (stats["bill_count"], stats["size_bytes"], backup_id),
+            )
+            return backup_id
+        backup_id = self._write(op)
+        self._bump_version([])
         return backup_id
 
     def list_ledger_backups(self) -> List[Dict[str, Any]]:
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute(
-            '''
-            SELECT id, ledger_id, ledger_name, monthly_budget, created_at
-            FROM ledger_backups
-            ORDER BY id DESC
-            '''
-        )
-        rows = cursor.fetchall()
-        conn.close()
-        return [
-            {
-                "id": row[0],
-                "ledger_id": row[1],
-                "ledger_name": row[2],
-                "monthly_budget": row[3] or 0,
-                "created_at": row[4],
-            }
-            for row in rows
-        ]
+        with self._db.read() as cursor:
+            cursor.execute(
+                '''
+                SELECT id, ledger_id, ledger_name, monthly_budget_cents, created_at, bill_count, size_bytes
+                FROM ledger_backups
+                ORDER BY id DESC
+                '''
+            )
+            rows = cursor.fetchall()
+            return [
+                {
+                    "id": row[0],
+                    "ledger_id": row[1],
+                    "ledger_name": row[2],
+                    "monthly_budget_cents": row[3] or 0,
+                    "created_at": row[4],
+                    "bill_count": row[5],
+                    "size_bytes": row[6],
+                }
+                for row in rows
+            ]
 
     def delete_ledger_backup(self, backup_id: int) -> bool:
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM ledger_backups WHERE id=?', (backup_id,))
-        deleted = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+        def op(cursor):
+            cursor.execute('DELETE FROM ledger_backups WHERE id=?', (backup_id,))
+            deleted = cursor.rowcount > 0
+            cursor.execute('DELETE FROM ledger_backup_chunks WHERE backup_id=?', (backup_id,))
+            return deleted
+        deleted = self._write(op)
+        if deleted:
+            self._bump_version([])
         return deleted
 
     def restore_ledger_backup(self, backup_id: int) -> Dict[str, Any]:
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute(
-            '''
-            SELECT id, ledger_id, ledger_name, monthly_budget, created_at, backup_json
-            FROM ledger_backups
-            WHERE id = ?
-            ''',
-            (backup_id,),
-        )
-        row = cursor.fetchone()
-        if not row:
-            conn.close()
-            return {"success": False, "error": "backup_not_found"}
+        def op(cursor):
+            # only format-1 rows carry an inline payload; chunked ones are streamed below
+            cursor.execute(
+                '''
+                SELECT id, ledger_id, ledger_name, monthly_budget_cents, created_at, format,
+                       CASE WHEN format IS NULL THEN backup_json END
+                FROM ledger_backups
+                WHERE id = ?
+                ''',
+                (backup_id,),
+            )
+            row = cursor.fetchone()
+            if not row:
+                return {"success": False, "error": "backup_not_found"}
 
-        try:
-            backup = json.loads(row[5] or "{}")
-        except json.JSONDecodeError:
-            conn.close()
-            return {"success": False, "error": "backup_invalid"}
-
-        ledger = backup.get("ledger") or {}
-        ledger_id = ledger.get("id") or row[1]
-        ledger_name = ledger.get("name") or row[2] or f"Ledger {ledger_id}"
-        monthly_budget = ledger.get("monthly_budget") or row[3] or 0
-        created_at = ledger.get("created_at") or row[4] or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        updated_at = ledger.get("updated_at") or created_at
-
-        cursor.execute('SELECT COUNT(*) FROM ledgers WHERE id=?', (ledger_id,))
-        if cursor.fetchone()[0] > 0:
-            conn.close()
-            return {"success": False, "error": "ledger_exists"}
-
-        cursor.execute('SELECT COUNT(*) FROM ledgers WHERE name=?', (ledger_name,))
-        if cursor.fetchone()[0] > 0:
-            suffix = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-            ledger_name = f"{ledger_name} (恢复{suffix})"
+            legacy_json = None
+            ledger: Dict[str, Any] = {}
+            if row[5] is None:
+                legacy_json = row[6] or "{}"
+                try:
+                    ledger = json.loads(legacy_json).get("ledger") or {}
+                except (json.JSONDecodeError, AttributeError):
+                    return {"success": False, "error": "backup_invalid"}
+            else:
+                stream = self._read_backup_stream(cursor, backup_id)
+                try:
+                    header = next(stream, None)
+                except (zlib.error, json.JSONDecodeError):
+                    header = None
+                finally:
+                    stream.close()
+                if not isinstance(header, dict):
+                    return {"success": False, "error": "backup_invalid"}
+                ledger = header.get("ledger") or {}
+
+            ledger_id = ledger.get("id") or row[1]
+            name = ledger.get("name") or row[2] or f"Ledger {ledger_id}"
+            if "monthly_budget_cents" in ledger:
+                monthly_budget_cents = ledger["monthly_budget_cents"] or 0
+            elif ledger.get("monthly_budget"):
+                # backups written before amounts were stored in cents
+                monthly_budget_cents = to_cents(ledger["monthly_budget"])
+            else:
+                monthly_budget_cents = row[3] or 0
+            created_at = ledger.get("created_at") or row[4] or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            updated_at = ledger.get("updated_at") or created_at
+
+            cursor.execute('SELECT COUNT(*) FROM ledgers WHERE id=?', (ledger_id,))
+            if cursor.fetchone()[0] > 0:
+                return {"success": False, "error": "ledger_exists"}
+
+            cursor.execute('SELECT COUNT(*) FROM ledgers WHERE name=?', (name,))
+            if cursor.fetchone()[0] > 0:
+                suffix = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+                name = f"{name} (恢复{suffix})"
 
-        try:
-            conn.execute("BEGIN")
             # Clean any stale rows for this ledger id (defensive)
-            for table in ("bills", "category_rules", "categories", "recurring_rules", "recurring_rule_runs"):
+            for table in self._BACKUP_TABLES:
                 cursor.execute(f"DELETE FROM {table} WHERE ledger_id = ?", (ledger_id,))
 
             cursor.execute(
                 '''
-                INSERT INTO ledgers (id, name, monthly_budget, created_at, updated_at)
+                INSERT INTO ledgers (id, name, monthly_budget_cents, created_at, updated_at)
                 VALUES (?, ?, ?, ?, ?)
                 ''',
-                (ledger_id, ledger_name, monthly_budget, created_at, updated_at),
+                (ledger_id, name, monthly_budget_cents, created_at, updated_at),
             )
+            self._restore_backup_tables(cursor, backup_id, legacy_json, ledger_id)
+            return {"success": True, "ledger_id": ledger_id, "ledger_name": name}
 
-            def apply_ledger_id(rows: List[Dict[str, Any]]):
-                for r in rows:
-                    if "ledger_id" in r:
-                        r["ledger_id"] = ledger_id
-
-            categories = backup.get("categories", [])
-            rules = backup.get("category_rules", [])
-            bills = backup.get("bills", [])
-            recurring_rules = backup.get("recurring_rules", [])
-            recurring_runs = backup.get("recurring_rule_runs", [])
-
-            apply_ledger_id(categories)
-            apply_ledger_id(rules)
-            apply_ledger_id(bills)
-            apply_ledger_id(recurring_rules)
-            apply_ledger_id(recurring_runs)
-
-            self._insert_rows(cursor, "categories", categories)
-            self._insert_rows(cursor, "category_rules", rules)
-            self._insert_rows(cursor, "bills", bills)
-            self._insert_rows(cursor, "recurring_rules", recurring_rules)
-            self._insert_rows(cursor, "recurring_rule_runs", recurring_runs)
-
-            conn.commit()
+        try:
+            result = self._write(op)
         except Exception:
-            conn.rollback()
-            conn.close()
             return {"success": False, "error": "restore_failed"}
-
-        conn.close()
-        return {"success": True, "ledger_id": ledger_id, "ledger_name": ledger_name}
+        if result.get("success"):
+            self._bills_changed(ledger_id=result["ledger_id"])
+            self._bump_version([result["ledger_id"]])
+        return result
 
     def list_ledgers(self) -> List[Dict[str, Any]]:
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, name, monthly_budget, created_at, updated_at FROM ledgers ORDER BY id')
-        rows = cursor.fetchall()
-        conn.close()
-        return [
-            {
-                "id": row[0],
-                "name": row[1],
-                "monthly_budget": row[2] or 0,
-                "created_at": row[3],
-                "updated_at": row[4]
-            }
-            for row in rows
-        ]
+        with self._db.read() as cursor:
+            cursor.execute('SELECT id, name, monthly_budget_cents, created_at, updated_at FROM ledgers ORDER BY id')
+            rows = cursor.fetchall()
+            return [
+                {
+                    "id": row[0],
+                    "name": row[1],
+                    "monthly_budget_cents": row[2] or 0,
+                    "created_at": row[3],
+                    "updated_at": row[4]
+                }
+                for row in rows
+            ]
 
     def save_ledger(self, ledger: Dict[str, Any]) -> int:
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        ledger_id = ledger.get("id")
-        name = ledger.get("name")
-        budget = ledger.get("monthly_budget") or 0
-        if ledger_id:
-            cursor.execute('UPDATE ledgers SET name=?, monthly_budget=?, updated_at=? WHERE id=?',
-                           (name, budget, now, ledger_id))
-        else:
-            cursor.execute('INSERT INTO ledgers (name, monthly_budget, created_at, updated_at) VALUES (?, ?, ?, ?)',
-                           (name, budget, now, now))
-            ledger_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        def op(cursor):
+            now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            ledger_id = ledger.get("id")
+            name = ledger.get("name")
+            budget = int(ledger.get("monthly_budget_cents") or 0)
+            if ledger_id:
+                cursor.execute('UPDATE ledgers SET name=?, monthly_budget_cents=?, updated_at=? WHERE id=?',
+                               (name, budget, now, ledger_id))
+            else:
+                cursor.execute('INSERT INTO ledgers (name, monthly_budget_cents, created_at, updated_at) VALUES (?, ?, ?, ?)',
+                               (name, budget, now, now))
+                ledger_id = cursor.lastrowid
+            return ledger_id
+        ledger_id = self._write(op)
+        self._bump_version([ledger_id])
         return ledger_id
 
     def delete_ledger(self, ledger_id: int) -> bool:
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM ledgers')
-        total = cursor.fetchone()[0] or 0
-        if total <= 1:
-            conn.close()
-            return False
-
-        backup_id = self.create_ledger_backup(ledger_id, cursor=cursor)
-        if backup_id is None:
-            conn.close()
-            return False
-
-        cursor.execute('DELETE FROM recurring_rule_runs WHERE ledger_id=?', (ledger_id,))
-        cursor.execute('DELETE FROM recurring_rules WHERE ledger_id=?', (ledger_id,))
-        cursor.execute('DELETE FROM bills WHERE ledger_id=?', (ledger_id,))
-        cursor.execute('DELETE FROM category_rules WHERE ledger_id=?', (ledger_id,))
-        cursor.execute('DELETE FROM categories WHERE ledger_id=?', (ledger_id,))
-        cursor.execute('DELETE FROM ledgers WHERE id=?', (ledger_id,))
-        deleted = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+        def op(cursor):
+            cursor.execute('SELECT COUNT(*) FROM ledgers')
+            total = cursor.fetchone()[0] or 0
+            if total <= 1:
+                return False
+
+            backup_id = self.create_ledger_backup(ledger_id)
+            if backup_id is None:
+                return False
+
+            cursor.execute('DELETE FROM recurring_rule_runs WHERE ledger_id=?', (ledger_id,))
+            cursor.execute('DELETE FROM recurring_rules WHERE ledger_id=?', (ledger_id,))
+            cursor.execute('DELETE FROM bills WHERE ledger_id=?', (ledger_id,))
+            cursor.execute('DELETE FROM category_rules WHERE ledger_id=?', (ledger_id,))
+            cursor.execute('DELETE FROM categories WHERE ledger_id=?', (ledger_id,))
+            cursor.execute('DELETE FROM ledgers WHERE id=?', (ledger_id,))
+            deleted = cursor.rowcount > 0
+            return deleted
+        deleted = self._write(op)
+        if deleted:
+            self._bills_changed(ledger_id=ledger_id)
+            self._bump_version([ledger_id])
         return deleted
-        print(f"📘 [Enhanced DB] 数据库连接就绪: {self.db_name}")
     
     def _migrate_bills_table(self, cursor):
         """Migrate existing bills table to new schema"""
@@ -957,164 +1745,395 @@ class EnhancedDatabaseManager:
 
     # Bills CRUD operations
     def save_bill(self, bill: EnhancedBill) -> int:
-        """Save a bill to database"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        if bill.ledger_id is None:
-            bill.ledger_id = self.get_default_ledger_id()
-        # resolve category by id or name
-        bill.category_id, bill.category = self._resolve_category(cursor, bill.category, bill.category_id, bill.ledger_id)
-        bill.updated_at = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        raw_text_json = json.dumps(bill.raw_text, ensure_ascii=False)
-        
-        if bill.id:
-            # Update existing bill
-            cursor.execute('''
-                UPDATE bills 
-                SET image_name=?, merchant=?, category=?, category_id=?, amount=?, raw_text=?,
-                    bill_date=?, updated_at=?, is_manual=?, ledger_id=?, include_in_budget=?
-                WHERE id=?
-            ''', (bill.filename, bill.merchant, bill.category, bill.category_id, bill.amount, 
-                  raw_text_json, bill.bill_date, bill.updated_at, 
-                  int(bill.is_manual), bill.ledger_id, int(bool(bill.include_in_budget)), bill.id))
-            bill_id = bill.id
-        else:
-            # Insert new bill
-            cursor.execute('''
-                INSERT INTO bills (record_time, image_name, merchant, category, category_id, amount, 
-                                 raw_text, bill_date, created_at, updated_at, is_manual, ledger_id, include_in_budget)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (bill.created_at, bill.filename, bill.merchant, bill.category, bill.category_id,
-                  bill.amount, raw_text_json, bill.bill_date, bill.created_at, 
-                  bill.updated_at, int(bill.is_manual), bill.ledger_id, int(bool(bill.include_in_budget))))
-            bill_id = cursor.lastrowid
-        
-        conn.commit()
-        conn.close()
+        """Save a bill to database (stored OCR text is kept when bill.raw_text is empty)"""
+        def op(cursor):
+            if bill.ledger_id is None:
+                bill.ledger_id = self.get_default_ledger_id()
+            # resolve category by id or name
+            bill.category_id, bill.category = self._resolve_category(cursor, bill.category, bill.category_id, bill.ledger_id)
+            bill.updated_at = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+            ledger_ids = {bill.ledger_id}
+            if bill.id:
+                # the bill may be moving out of another ledger
+                cursor.execute('SELECT ledger_id FROM bills WHERE id=?', (bill.id,))
+                ledger_ids.update(row[0] for row in cursor.fetchall())
+                # Update existing bill
+                cursor.execute('''
+                    UPDATE bills 
+                    SET image_name=?, merchant=?, category=?, category_id=?, amount_cents=?,
+                        bill_date=?, updated_at=?, is_manual=?, ledger_id=?, include_in_budget=?, needs_review=?
+                    WHERE id=?
+                ''', (bill.filename, bill.merchant, bill.category, bill.category_id, int(bill.amount_cents),
+                      bill.bill_date, bill.updated_at, 
+                      int(bill.is_manual), bill.ledger_id, int(bool(bill.include_in_budget)),
+                      int(bool(bill.needs_review)), bill.id))
+                bill_id = bill.id
+            else:
+                # Insert new bill
+                cursor.execute('''
+                    INSERT INTO bills (record_time, image_name, merchant, category, category_id, amount_cents,
+                                     bill_date, created_at, updated_at, is_manual, ledger_id, include_in_budget,
+                                     needs_review)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (bill.created_at, bill.filename, bill.merchant, bill.category, bill.category_id,
+                      int(bill.amount_cents), bill.bill_date, bill.created_at,
+                      bill.updated_at, int(bill.is_manual), bill.ledger_id, int(bool(bill.include_in_budget)),
+                      int(bool(bill.needs_review))))
+                bill_id = cursor.lastrowid
+
+            # an empty raw_text on update means "not loaded", not "clear it"
+            if bill.raw_text or bill.ocr_lines:
+                self._store_raw_text(cursor, [(bill_id, bill.raw_text, bill.ocr_lines)])
+            return bill_id, ledger_ids
+        bill_id, ledger_ids = self._write(op)
+        self._bills_changed([bill_id])
+        self._bump_version(ledger_ids)
         return bill_id
-    
-    def get_bill(self, bill_id: int) -> Optional[EnhancedBill]:
-        """Get a bill by ID"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM bills WHERE id = ?', (bill_id,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            return self._row_to_bill(row)
-        return None
-    
-    def _append_category_filter(self, query: str, params: List[Any], categories: Optional[List[str]], col_expr: str = "category") -> str:
-        if categories is None:
-            return query
-        if not categories:
-            return f"{query} AND 0"
-        placeholders = ','.join(['?'] * len(categories))
-        query += f' AND {col_expr} IN ({placeholders})'
-        params.extend(categories)
-        return query
 
-    def _fetch_category_names_by_major_minor(self, cursor, major: str = None, minor: str = None, ledger_id: Optional[int] = None) -> Optional[List[str]]:
-        if not major and not minor:
-            return None
-        query = 'SELECT major, minor FROM categories WHERE 1=1'
-        params: List[Any] = []
-        if major:
-            query += ' AND major = ?'
-            params.append(major)
-        if minor:
-            query += ' AND minor = ?'
-            params.append(minor)
-        if ledger_id is not None:
-            query += ' AND (ledger_id IS NULL OR ledger_id = ?)'
-            params.append(ledger_id)
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        return [self._format_category_name(row[0], row[1]) for row in rows]
+    def save_bills(self, bills: List[EnhancedBill]) -> List[Dict[str, Any]]:
+        """Save many bills in a single transaction.
 
-    def get_bills(self, limit: int = 100, offset: int = 0,
-                  start_date: str = None, end_date: str = None,
-                  category: str = None, keyword: str = None,
-                  major: str = None, minor: str = None,
-                  ledger_id: Optional[int] = None,
-                  sort_by: Optional[str] = None,
-                  sort_order: Optional[str] = None) -> List[EnhancedBill]:
-        """Get bills with filtering and pagination"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        query = '''
-            SELECT b.*, c.major, c.minor
-            FROM bills b
-            LEFT JOIN categories c ON b.category_id = c.id
-            WHERE 1=1
-        '''
-        params = []
-        
-        if start_date:
-            query += ' AND b.bill_date >= ?'
-            params.append(start_date)
-        
-        if end_date:
-            query += ' AND b.bill_date <= ?'
-            params.append(end_date)
-        
-        categories_filter = None
-        if category:
-            categories_filter = [category]
-        elif major or minor:
-            categories_filter = self._fetch_category_names_by_major_minor(cursor, major, minor, ledger_id)
-        query = self._append_category_filter(query, params, categories_filter, "COALESCE(c.major || '/' || c.minor, b.category)")
+        Categories are resolved once per ledger, then all updates and all inserts
+        each go through one executemany. Returns one outcome per input bill, in
+        order: {'index', 'success', 'id'} or {'index', 'success': False, 'error'}.
+        """
+        bills = list(bills)
+        if not bills:
+            return []
 
-        if keyword:
-            keyword_like = f'%{keyword}%'
-            query += ' AND (b.merchant LIKE ? OR b.raw_text LIKE ?)'
-            params.extend([keyword_like, keyword_like])
+        ledger_ids = set()
 
+        def op(cursor):
+            now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            default_ledger_id = None
+            if any(b.ledger_id is None for b in bills):
+                default_ledger_id = self.get_default_ledger_id()
+
+            # explicit category ids -> full names
+            id_names: Dict[int, str] = {}
+            for chunk in self._chunked(sorted({b.category_id for b in bills if b.category_id})):
+                placeholders = ','.join(['?'] * len(chunk))
+                cursor.execute(f'SELECT id, major, minor FROM categories WHERE id IN ({placeholders})', chunk)
+                for cid, major, minor in cursor.fetchall():
+                    id_names[cid] = self._format_category_name(major, minor)
+
+            # bills to update must exist; their current ledgers change too
+            existing = set()
+            for chunk in self._chunked(sorted({b.id for b in bills if b.id})):
+                placeholders = ','.join(['?'] * len(chunk))
+                cursor.execute(f'SELECT id, ledger_id FROM bills WHERE id IN ({placeholders})', chunk)
+                for bill_id, ledger_id in cursor.fetchall():
+                    existing.add(bill_id)
+                    ledger_ids.add(ledger_id)
+
+            name_maps: Dict[Optional[int], Dict[str, int]] = {}
+            outcomes: List[Optional[Dict[str, Any]]] = [None] * len(bills)
+            updates, inserts, insert_indexes = [], [], []
+            for index, bill in enumerate(bills):
+                if bill.id and bill.id not in existing:
+                    outcomes[index] = {'index': index, 'success': False, 'error': 'not_found'}
+                    continue
+                if bill.ledger_id is None:
+                    bill.ledger_id = default_ledger_id
+                ledger_ids.add(bill.ledger_id)
+                # same rules as _resolve_category, without a query per bill
+                if bill.category_id and bill.category_id in id_names:
+                    bill.category = id_names[bill.category_id]
+                elif bill.category:
+                    if bill.ledger_id not in name_maps:
+                        name_maps[bill.ledger_id] = self._load_category_id_map(cursor, bill.ledger_id)
+                    group = self._split_category_name(bill.category)
+                    full_name = self._format_category_name(group.major, group.minor)
+                    bill.category_id = name_maps[bill.ledger_id].get(full_name)
+                    if bill.category_id:
+                        bill.category = full_name
+                else:
+                    bill.category_id, bill.category = None, ""
+                bill.updated_at = now
+
+                if bill.id:
+                    updates.append((bill.filename, bill.merchant, bill.category, bill.category_id, int(bill.amount_cents),
+                                    bill.bill_date, bill.updated_at,
+                                    int(bill.is_manual), bill.ledger_id, int(bool(bill.include_in_budget)),
+                                    int(bool(bill.needs_review)), bill.id))
+                    outcomes[index] = {'index': index, 'success': True, 'id': bill.id}
+                else:
+                    inserts.append((bill.created_at, bill.filename, bill.merchant, bill.category, bill.category_id,
+                                    int(bill.amount_cents), bill.bill_date, bill.created_at,
+                                    bill.updated_at, int(bill.is_manual), bill.ledger_id,
+                                    int(bool(bill.include_in_budget)), int(bool(bill.needs_review))))
+                    insert_indexes.append(index)
+
+            if updates:
+                cursor.executemany('''
+                    UPDATE bills
+                    SET image_name=?, merchant=?, category=?, category_id=?, amount_cents=?,
+                        bill_date=?, updated_at=?, is_manual=?, ledger_id=?, include_in_budget=?, needs_review=?
+                    WHERE id=?
+                ''', updates)
+            # one execute per row so each bill gets the id SQLite actually assigned
+            # (the statement is prepared once and reused from the statement cache)
+            for row, index in zip(inserts, insert_indexes):
+                cursor.execute('''
+                    INSERT INTO bills (record_time, image_name, merchant, category, category_id, amount_cents,
+                                     bill_date, created_at, updated_at, is_manual, ledger_id, include_in_budget,
+                                     needs_review)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', row)
+                bills[index].id = cursor.lastrowid
+                outcomes[index] = {'index': index, 'success': True, 'id': cursor.lastrowid}
+            # as in save_bill, an empty raw_text leaves stored OCR text alone
+            self._store_raw_text(cursor, [
+                (bills[o['index']].id, bills[o['index']].raw_text, bills[o['index']].ocr_lines)
+                for o in outcomes
+                if o['success'] and (bills[o['index']].raw_text or bills[o['index']].ocr_lines)
+            ])
+            return outcomes
+        outcomes = self._write(op)
+        self._bills_changed([o['id'] for o in outcomes if o['success']])
+        self._bump_version(ledger_ids)
+        return outcomes
+
+    def _load_category_id_map(self, cursor, ledger_id: Optional[int]) -> Dict[str, int]:
+        """Map full category name -> id for a ledger (ledger-specific rows win over global ones)"""
+        query = 'SELECT id, major, minor, ledger_id FROM categories WHERE ledger_id IS NULL'
+        params: List[Any] = []
         if ledger_id is not None:
-            query += ' AND b.ledger_id = ?'
+            query += ' OR ledger_id = ?'
             params.append(ledger_id)
+        cursor.execute(query + ' ORDER BY ledger_id IS NOT NULL, id', params)
+        return {self._format_category_name(major, minor): cid for cid, major, minor, _ in cursor.fetchall()}
 
-        sort_map = {
-            'bill_date': 'b.bill_date',
-            'merchant': 'b.merchant',
-            'category': "COALESCE(c.major || '/' || c.minor, b.category)",
-            'amount': 'b.amount',
-        }
-        sort_field = sort_map.get((sort_by or '').strip())
-        sort_dir = 'ASC' if (sort_order or '').lower() == 'asc' else 'DESC'
-        if sort_field:
-            query += f' ORDER BY {sort_field} {sort_dir}, b.created_at DESC'
-        else:
-            query += ' ORDER BY b.bill_date DESC, b.created_at DESC'
+    def import_bills(self, bills, ledger_id: Optional[int] = None, chunk_size: int = 1000) -> Dict[str, int]:
+        """Bulk insert bills from an iterable in chunked transactions.
 
-        query += ' LIMIT ? OFFSET ?'
-        params.extend([limit, offset])
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return [self._row_to_bill(row) for row in rows]
+        Bills carrying an external_id that already exists in the ledger are skipped
+        (INSERT OR IGNORE against idx_bills_ledger_external_id), so re-importing the
+        same statement is idempotent.
+        """
+        if ledger_id is None:
+            ledger_id = self.get_default_ledger_id()
+        with self._db.read() as cursor:
+            category_ids = self._load_category_id_map(cursor, ledger_id)
+        sql = '''
+            INSERT OR IGNORE INTO bills (record_time, image_name, merchant, category, category_id, amount_cents,
+                                         bill_date, created_at, updated_at, is_manual, ledger_id,
+                                         include_in_budget, external_id, needs_review)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        '''
+        stats = {'total': 0, 'inserted': 0, 'duplicates': 0}
+
+        def flush(rows):
+            # one write-queue operation (and at most one commit) per chunk
+            def op(cursor):
+                inserted_ids = []
+                raw_items = []
+                for values, lines, ocr in rows:
+                    # row by row: OR IGNORE skips duplicates, so ids can't be inferred from one executemany
+                    cursor.execute(sql, values)
+                    if cursor.rowcount > 0:
+                        inserted_ids.append(cursor.lastrowid)
+                        if lines or ocr:
+                            raw_items.append((cursor.lastrowid, lines, ocr))
+                self._store_raw_text(cursor, raw_items)
+                return inserted_ids
+            inserted_ids = self._write(op)
+            self._bills_changed(inserted_ids)
+            if inserted_ids:
+                self._bump_version([ledger_id])
+            stats['inserted'] += len(inserted_ids)
+            stats['duplicates'] += len(rows) - len(inserted_ids)
+
+        pending = []
+        for bill in bills:
+            category_id = bill.category_id or category_ids.get((bill.category or '').strip())
+            pending.append(((
+                bill.created_at, bill.filename, bill.merchant, bill.category, category_id,
+                int(bill.amount_cents), bill.bill_date,
+                bill.created_at, bill.updated_at, int(bill.is_manual), ledger_id,
+                int(bool(bill.include_in_budget)), bill.external_id, int(bool(bill.needs_review)),
+            ), bill.raw_text, bill.ocr_lines))
+            stats['total'] += 1
+            if len(pending) >= chunk_size:
+                flush(pending)
+                pending = []
+        if pending:
+            flush(pending)
+        return stats
 
-    def get_bills_count(self, start_date: str = None, end_date: str = None,
-                        category: str = None, keyword: str = None,
-                        major: str = None, minor: str = None,
-                        ledger_id: Optional[int] = None) -> int:
-        """Get total bill count with filtering"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+    def get_bill(self, bill_id: int) -> Optional[EnhancedBill]:
+        """Get a bill by ID"""
+        with self._db.read() as cursor:
+            cursor.execute(f'''
+                SELECT {self._BILL_COLUMNS}, c.major, c.minor
+                FROM bills b
+                LEFT JOIN categories c ON b.category_id = c.id
+                WHERE b.id = ?
+            ''', (bill_id,))
+            row = cursor.fetchone()
 
-        query = '''
-            SELECT COUNT(*)
-            FROM bills b
-            LEFT JOIN categories c ON b.category_id = c.id
-            WHERE 1=1
-        '''
-        params = []
+            if row:
+                bill = self._row_to_bill(row)
+                bill.raw_text, bill.ocr_lines = self._load_raw_text(cursor, [bill_id]).get(bill_id, ([], None))
+                return bill
+            return None
+    
+    # Raw OCR text (bill_raw_text): zlib-compressed JSON {"lines": [...], "ocr": [{"text", "conf", "box"}]}
+    @staticmethod
+    def _raw_text_from_value(value: Any):
+        """Normalize a stored/backed-up raw_text value to (lines, ocr_lines)"""
+        if value is None:
+            return [], None
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            value = json.loads(zlib.decompress(bytes(value)).decode("utf-8"))
+        elif isinstance(value, str):
+            try:
+                value = json.loads(value) if value else []
+            except json.JSONDecodeError:
+                return [value], None
+        if isinstance(value, dict):
+            return list(value.get("lines") or []), value.get("ocr") or None
+        if isinstance(value, list):
+            return [str(x) for x in value], None
+        return [str(value)], None
+
+    @staticmethod
+    def _raw_text_for_index(lines: List[str]) -> str:
+        return "\n".join(lines or [])
+
+    def _store_raw_text(self, cursor, items, index: bool = True):
+        """Write (bill_id, lines, ocr_lines) items to bill_raw_text and, if index, to bills_fts"""
+        rows = []
+        fts_rows = []
+        for bill_id, lines, ocr in items:
+            payload: Dict[str, Any] = {"lines": list(lines or [])}
+            if ocr:
+                payload["ocr"] = ocr
+            rows.append((bill_id, zlib.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"))))
+            fts_rows.append((self._raw_text_for_index(payload["lines"]), bill_id))
+        if not rows:
+            return
+        cursor.executemany('INSERT OR REPLACE INTO bill_raw_text (bill_id, data) VALUES (?, ?)', rows)
+        if index and self._fts_available():
+            cursor.executemany('UPDATE bills_fts SET raw_text = ? WHERE rowid = ?', fts_rows)
+
+    def _load_raw_text(self, cursor, bill_ids: List[int]) -> Dict[int, Any]:
+        result: Dict[int, Any] = {}
+        for chunk in self._chunked(sorted(set(bill_ids))):
+            placeholders = ','.join(['?'] * len(chunk))
+            cursor.execute(f'SELECT bill_id, data FROM bill_raw_text WHERE bill_id IN ({placeholders})', chunk)
+            for bill_id, data in cursor.fetchall():
+                result[bill_id] = self._raw_text_from_value(data)
+        return result
+
+    def get_raw_text(self, bill_ids: List[int]) -> Dict[int, List[str]]:
+        """OCR lines for the given bills (bills without stored text are omitted)"""
+        with self._db.read() as cursor:
+            return {bill_id: lines for bill_id, (lines, _) in self._load_raw_text(cursor, bill_ids).items()}
+
+    def _append_category_filter(self, query: str, params: List[Any], category_ids: Optional[List[int]],
+                                alias: str = "b", category_name: Optional[str] = None) -> str:
+        """Filter on category_id (indexed); see _category_filter_ids.
+
+        category_name is only used when a named category is not in the categories
+        table, for legacy bills that carry the name but no id.
+        """
+        if category_ids is None:
+            return query
+        if not category_ids:
+            if category_name:
+                params.append(category_name)
+                return f"{query} AND {alias}.category = ?"
+            return f"{query} AND 0"
+        placeholders = ','.join(['?'] * len(category_ids))
+        query += f' AND {alias}.category_id IN ({placeholders})'
+        params.extend(category_ids)
+        return query
+
+    def _fts_available(self) -> bool:
+        """Whether bills_fts exists (checked once, not on every startup)"""
+        if self._fts_enabled is None:
+            with self._db.read() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='bills_fts'")
+                self._fts_enabled = cursor.fetchone() is not None
+        return self._fts_enabled
+
+    def _append_keyword_filter(self, query: str, params: List[Any], keyword: Optional[str]) -> str:
+        """Filter bills (aliased b) whose merchant or OCR text contains keyword.
+
+        Uses the trigram index in bills_fts; it cannot answer substrings shorter
+        than three characters, so those LIKE-scan bills_fts (which holds the only
+        uncompressed copy of the OCR text). Without FTS5 only merchant is searched.
+        """
+        keyword = (keyword or '').strip()
+        if not keyword:
+            return query
+        keyword_like = f'%{keyword}%'
+        if not self._fts_available():
+            query += ' AND b.merchant LIKE ?'
+            params.append(keyword_like)
+        elif len(keyword) >= 3:
+            query += ' AND b.id IN (SELECT rowid FROM bills_fts WHERE bills_fts MATCH ?)'
+            params.append('"' + keyword.replace('"', '""') + '"')
+        else:
+            # unary + keeps FTS5 from taking the LIKE (its trigram path returns no rows here)
+            query += ' AND (b.merchant LIKE ? OR b.id IN (SELECT rowid FROM bills_fts WHERE +raw_text LIKE ?))'
+            params.extend([keyword_like, keyword_like])
+        return query
+
+    def _category_filter_ids(self, cursor, category: str = None, major: str = None, minor: str = None,
+                             ledger_id: Optional[int] = None) -> Optional[List[int]]:
+        """Resolve a full category name, or major and/or minor, to the matching
+        category ids (global plus the ledger's own). None means no category filter.
+        """
+        if category:
+            group = self._split_category_name(category)
+            major, minor = group.major, group.minor
+            query = 'SELECT id FROM categories WHERE major = ? AND minor = ?'
+            params: List[Any] = [major, minor]
+        elif major or minor:
+            query = 'SELECT id FROM categories WHERE 1=1'
+            params = []
+            if major:
+                query += ' AND major = ?'
+                params.append(major)
+            if minor:
+                query += ' AND minor = ?'
+                params.append(minor)
+        else:
+            return None
+        if ledger_id is not None:
+            query += ' AND (ledger_id IS NULL OR ledger_id = ?)'
+            params.append(ledger_id)
+        cursor.execute(query, params)
+        return [row[0] for row in cursor.fetchall()]
+
+    # Sort keys shared by the offset and keyset list queries. bills.category holds
+    # the canonical "major/minor" path of linked bills (kept in step on rename),
+    # so category sorting can use idx_bills_ledger_category_name.
+    _BILL_SORT_FIELDS = {
+        'bill_date': 'b.bill_date',
+        'merchant': 'b.merchant',
+        'category': 'b.category',
+        'amount': 'b.amount_cents',
+    }
+
+    # List views: everything _row_to_list_item needs, never raw_text
+    _BILL_LIST_COLUMNS = (
+        "b.id, b.ledger_id, b.image_name, b.merchant, b.amount_cents, b.category_id, b.category, "
+        "b.bill_date, COALESCE(b.created_at, b.record_time), COALESCE(b.updated_at, b.record_time), "
+        "b.is_manual, b.include_in_budget, b.needs_review, c.major, c.minor"
+    )
+
+    def _bill_filters(self, cursor, start_date: str = None, end_date: str = None,
+                      category: str = None, keyword: str = None,
+                      major: str = None, minor: str = None,
+                      ledger_id: Optional[int] = None,
+                      needs_review: Optional[bool] = None):
+        """Build the WHERE clause shared by the bill list/count queries; returns (sql, params)"""
+        query = ' WHERE 1=1'
+        params: List[Any] = []
 
         if start_date:
             query += ' AND b.bill_date >= ?'
@@ -1124,270 +2143,565 @@ class EnhancedDatabaseManager:
             query += ' AND b.bill_date <= ?'
             params.append(end_date)
 
-        categories_filter = None
-        if category:
-            categories_filter = [category]
-        elif major or minor:
-            categories_filter = self._fetch_category_names_by_major_minor(cursor, major, minor, ledger_id)
-        query = self._append_category_filter(query, params, categories_filter, "COALESCE(c.major || '/' || c.minor, b.category)")
+        category_ids = self._category_filter_ids(cursor, category, major, minor, ledger_id)
+        query = self._append_category_filter(query, params, category_ids, 'b', category)
 
-        if keyword:
-            keyword_like = f'%{keyword}%'
-            query += ' AND (b.merchant LIKE ? OR b.raw_text LIKE ?)'
-            params.extend([keyword_like, keyword_like])
+        query = self._append_keyword_filter(query, params, keyword)
 
         if ledger_id is not None:
             query += ' AND b.ledger_id = ?'
             params.append(ledger_id)
 
-        cursor.execute(query, params)
-        count = cursor.fetchone()[0] or 0
-        conn.close()
-        return count
+        if needs_review is not None:
+            # "= 1" lets the review queue use idx_bills_ledger_review
+            query += ' AND b.needs_review = 1' if needs_review else ' AND COALESCE(b.needs_review, 0) = 0'
+
+        return query, params
+
+    def get_bills(self, limit: int = 100, offset: int = 0,
+                  start_date: str = None, end_date: str = None,
+                  category: str = None, keyword: str = None,
+                  major: str = None, minor: str = None,
+                  ledger_id: Optional[int] = None,
+                  sort_by: Optional[str] = None,
+                  sort_order: Optional[str] = None,
+                  needs_review: Optional[bool] = None) -> List[EnhancedBill]:
+        """Get bills with filtering and pagination"""
+        with self._db.read() as cursor:
+            where, params = self._bill_filters(cursor, start_date, end_date, category, keyword,
+                                               major, minor, ledger_id, needs_review)
+            query = f'''
+                SELECT {self._BILL_COLUMNS}, c.major, c.minor
+                FROM bills b
+                LEFT JOIN categories c ON b.category_id = c.id
+            ''' + where
+
+            sort_field = self._BILL_SORT_FIELDS.get((sort_by or '').strip())
+            sort_dir = 'ASC' if (sort_order or '').lower() == 'asc' else 'DESC'
+            if sort_field:
+                query += f' ORDER BY {sort_field} {sort_dir}, b.created_at DESC'
+            else:
+                query += ' ORDER BY b.bill_date DESC, b.created_at DESC'
+
+            query += ' LIMIT ? OFFSET ?'
+            params.extend([limit, offset])
+
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+
+            return [self._row_to_bill(row) for row in rows]
+
+    def list_bills(self, limit: int = 100, offset: int = 0, cursor: Optional[str] = None,
+                   start_date: str = None, end_date: str = None,
+                   category: str = None, keyword: str = None,
+                   major: str = None, minor: str = None,
+                   ledger_id: Optional[int] = None,
+                   sort_by: Optional[str] = None,
+                   sort_order: Optional[str] = None,
+                   needs_review: Optional[bool] = None):
+        """List bills for list views; returns (items, next_cursor).
+
+        Rows are BillListItem (no raw_text). Pass the previous page's next_cursor
+        as `cursor` for keyset pagination; without it `offset` is used. Keyset
+        order is (sort key, created_at, id) all in the requested direction on the
+        raw columns, so idx_bills_ledger_date_id serves the default order and seek;
+        NULL sort keys come first ascending and last descending. next_cursor is
+        None on the last page.
+        Raises ValueError for a malformed cursor or one from a different sort.
+        """
+        sort_key = (sort_by or '').strip()
+        if sort_key not in self._BILL_SORT_FIELDS:
+            sort_key = 'bill_date'
+        sort_dir = 'ASC' if (sort_order or '').lower() == 'asc' else 'DESC'
+        sort_col = self._BILL_SORT_FIELDS[sort_key]
+        key_cols = [sort_col, 'b.created_at', 'b.id']
+        order_by = ' ORDER BY ' + ', '.join(f'{col} {sort_dir}' for col in key_cols) + ' LIMIT ?'
+        op = '<' if sort_dir == 'DESC' else '>'
+        want = limit + 1
+
+        # a keyset page can take two queries; read them from one snapshot
+        with self._db.read(snapshot=bool(cursor)) as db_cursor:
+            where, params = self._bill_filters(db_cursor, start_date, end_date, category, keyword,
+                                               major, minor, ledger_id, needs_review)
+            query = f'''
+                SELECT {self._BILL_LIST_COLUMNS}, {', '.join(key_cols)}
+                FROM bills b
+                LEFT JOIN categories c ON b.category_id = c.id
+            ''' + where
+
+            if not cursor:
+                page_params = params + [want]
+                page_query = query + order_by
+                if offset:
+                    page_query += ' OFFSET ?'
+                    page_params.append(offset)
+                db_cursor.execute(page_query, page_params)
+                rows = db_cursor.fetchall()
+            else:
+                after = self._decode_bill_cursor(cursor, sort_key, sort_dir)
+                if after[0] is None:
+                    # a row value compared with NULL is never true: seek inside the NULL
+                    # run on (created_at, id); ascending then continues into the values
+                    db_cursor.execute(
+                        query + f' AND {sort_col} IS NULL AND (b.created_at, b.id) {op} (?, ?)' + order_by,
+                        params + after[1:] + [want],
+                    )
+                    next_run = f' AND {sort_col} IS NOT NULL' if sort_dir == 'ASC' else None
+                else:
+                    # NULL keys drop out of the comparison; descending reaches them last
+                    db_cursor.execute(
+                        query + f" AND ({', '.join(key_cols)}) {op} (?, ?, ?)" + order_by,
+                        params + after + [want],
+                    )
+                    next_run = f' AND {sort_col} IS NULL' if sort_dir == 'DESC' else None
+                rows = db_cursor.fetchall()
+                if next_run and len(rows) < want:
+                    db_cursor.execute(query + next_run + order_by, params + [want - len(rows)])
+                    rows.extend(db_cursor.fetchall())
+
+        today = datetime.date.today().strftime("%Y-%m-%d")
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        items = [self._row_to_list_item(row, today) for row in rows]
+        next_cursor = None
+        if has_more and rows:
+            last = rows[-1]
+            next_cursor = self._encode_bill_cursor(sort_key, sort_dir, list(last[-3:]))
+        return items, next_cursor
+
+    def _encode_bill_cursor(self, sort_key: str, sort_dir: str, values: List[Any]) -> str:
+        payload = json.dumps([sort_key, sort_dir] + values, ensure_ascii=False, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def _decode_bill_cursor(self, token: str, sort_key: str, sort_dir: str) -> List[Any]:
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            if not isinstance(data, list) or len(data) != 5:
+                raise ValueError
+        except (ValueError, UnicodeError, binascii.Error):
+            raise ValueError("无效的分页游标")
+        if data[0] != sort_key or data[1] != sort_dir:
+            raise ValueError("分页游标与当前排序不一致")
+        return data[2:]
+
+    def get_bills_count(self, start_date: str = None, end_date: str = None,
+                        category: str = None, keyword: str = None,
+                        major: str = None, minor: str = None,
+                        ledger_id: Optional[int] = None,
+                        needs_review: Optional[bool] = None) -> int:
+        """Get total bill count with filtering"""
+        with self._db.read() as cursor:
+            where, params = self._bill_filters(cursor, start_date, end_date, category, keyword,
+                                               major, minor, ledger_id, needs_review)
+            query = '''
+                SELECT COUNT(*)
+                FROM bills b
+                LEFT JOIN categories c ON b.category_id = c.id
+            ''' + where
+
+            cursor.execute(query, params)
+            count = cursor.fetchone()[0] or 0
+            return count
     
     def delete_bill(self, bill_id: int) -> bool:
         """Delete a bill by ID"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM bills WHERE id = ?', (bill_id,))
-        deleted = cursor.rowcount > 0
-        
-        conn.commit()
-        conn.close()
+        def op(cursor):
+            cursor.execute('SELECT ledger_id FROM bills WHERE id = ?', (bill_id,))
+            row = cursor.fetchone()
+            cursor.execute('DELETE FROM bills WHERE id = ?', (bill_id,))
+            deleted = cursor.rowcount > 0
+
+            return deleted, row[0] if row else None
+        deleted, ledger_id = self._write(op)
+        if deleted:
+            self._bills_changed([bill_id])
+            self._bump_version([ledger_id])
         return deleted
+
+    def _chunked(self, values: List[Any], size: int = 500):
+        """Split values into slices small enough for one IN (...) list"""
+        for start in range(0, len(values), size):
+            yield values[start:start + size]
+
+    def _bulk_bill_op(self, cursor, ids: List[Any], ledger_id: Optional[int], statement: str, params: List[Any],
+                      ledger_ids: Optional[set] = None):
+        """Run `statement ... WHERE id IN (...)` over the existing ids; return per-id outcomes.
+
+        The ledgers of the affected bills are added to ledger_ids when given.
+        """
+        parsed = []
+        for raw_id in ids:
+            try:
+                parsed.append((raw_id, int(raw_id)))
+            except (TypeError, ValueError):
+                parsed.append((raw_id, None))
+        wanted = list(dict.fromkeys(bill_id for _, bill_id in parsed if bill_id is not None))
+
+        found = set()
+        for chunk in self._chunked(wanted):
+            placeholders = ','.join(['?'] * len(chunk))
+            query = f'SELECT id, ledger_id FROM bills WHERE id IN ({placeholders})'
+            query_params = list(chunk)
+            if ledger_id is not None:
+                query += ' AND ledger_id = ?'
+                query_params.append(ledger_id)
+            cursor.execute(query, query_params)
+            for bill_id, bill_ledger_id in cursor.fetchall():
+                found.add(bill_id)
+                if ledger_ids is not None:
+                    ledger_ids.add(bill_ledger_id)
+
+        targets = [bill_id for bill_id in wanted if bill_id in found]
+        for chunk in self._chunked(targets):
+            placeholders = ','.join(['?'] * len(chunk))
+            cursor.execute(f'{statement} WHERE id IN ({placeholders})', list(params) + list(chunk))
+
+        outcomes = []
+        for raw_id, bill_id in parsed:
+            if bill_id is None:
+                outcomes.append({'id': raw_id, 'success': False, 'error': 'invalid_id'})
+            elif bill_id in found:
+                outcomes.append({'id': bill_id, 'success': True})
+            else:
+                outcomes.append({'id': bill_id, 'success': False, 'error': 'not_found'})
+        return outcomes
+
+    def delete_bills(self, ids: List[int], ledger_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Delete many bills in one transaction.
+
+        When ledger_id is given, ids belonging to other ledgers are reported as
+        not_found and left untouched. Returns [{'id', 'success', 'error'?}].
+        """
+        ledger_ids = set()
+
+        def op(cursor):
+            return self._bulk_bill_op(cursor, list(ids or []), ledger_id, 'DELETE FROM bills', [], ledger_ids)
+        outcomes = self._write(op)
+        self._bills_changed([o['id'] for o in outcomes if o['success']])
+        if ledger_ids:
+            self._bump_version(ledger_ids)
+        return outcomes
     
     def update_bill_budget_status(self, bill_id: int, include_in_budget: bool) -> bool:
         """Update a bill's budget inclusion status"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            'UPDATE bills SET include_in_budget = ? WHERE id = ?', 
-            (include_in_budget, bill_id)
-        )
-        updated = cursor.rowcount > 0
-        
-        conn.commit()
-        conn.close()
+        def op(cursor):
+            cursor.execute('SELECT ledger_id FROM bills WHERE id = ?', (bill_id,))
+            row = cursor.fetchone()
+            cursor.execute(
+                'UPDATE bills SET include_in_budget = ? WHERE id = ?', 
+                (include_in_budget, bill_id)
+            )
+            updated = cursor.rowcount > 0
+
+            return updated, row[0] if row else None
+        updated, ledger_id = self._write(op)
+        if updated:
+            self._bills_changed([bill_id])
+            self._bump_version([ledger_id])
         return updated
+
+    def set_budget_flag(self, ids: List[int], flag: bool, ledger_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Set include_in_budget on many bills in one transaction (same outcomes as delete_bills)"""
+        ledger_ids = set()
+
+        def op(cursor):
+            return self._bulk_bill_op(
+                cursor, list(ids or []), ledger_id,
+                'UPDATE bills SET include_in_budget = ?', [int(bool(flag))], ledger_ids,
+            )
+        outcomes = self._write(op)
+        self._bills_changed([o['id'] for o in outcomes if o['success']])
+        if ledger_ids:
+            self._bump_version(ledger_ids)
+        return outcomes
     
+    def _row_to_list_item(self, row, today: str) -> "BillListItem":
+        """Convert a _BILL_LIST_COLUMNS row to BillListItem"""
+        return BillListItem(
+            id=row[0],
+            ledger_id=row[1],
+            filename=row[2] or "",
+            merchant=row[3] or "",
+            amount_cents=row[4] or 0,
+            category_id=row[5],
+            category=self._format_category_name(row[13], row[14]) if row[13] is not None else (row[6] or ""),
+            bill_date=row[7] or today,
+            created_at=row[8] or "",
+            updated_at=row[9] or "",
+            is_manual=bool(row[10]),
+            include_in_budget=bool(row[11]) if row[11] is not None else True,
+            needs_review=bool(row[12]),
+        )
+
     def _row_to_bill(self, row) -> EnhancedBill:
-        """Convert database row to EnhancedBill object"""
-        raw_text = json.loads(row[6]) if row[6] else []
-        cat_id = row[12] if len(row) > 12 else None
-        include_in_budget = bool(row[13]) if len(row) > 13 and row[13] is not None else True
+        """Convert database row to EnhancedBill object (raw_text is left empty)"""
+        cat_id = row[11] if len(row) > 11 else None
+        include_in_budget = bool(row[12]) if len(row) > 12 and row[12] is not None else True
+        needs_review = bool(row[13]) if len(row) > 13 and row[13] is not None else False
         cat_major = row[14] if len(row) > 14 else None
         cat_minor = row[15] if len(row) > 15 else None
         category_name = self._format_category_name(cat_major, cat_minor) if cat_major is not None else (row[4] or "")
         
         return EnhancedBill(
             id=row[0],
-            ledger_id=row[11] if len(row) > 11 else None,
+            ledger_id=row[10] if len(row) > 10 else None,
             filename=row[2] or "",
             merchant=row[3] or "",
-            amount=row[5] or 0.0,
+            amount_cents=row[5] or 0,
             category_id=cat_id,
             category=category_name,
-            bill_date=row[7] or datetime.date.today().strftime("%Y-%m-%d"),
-            created_at=row[8] or row[1],  # Fallback to record_time
-            updated_at=row[9] or row[1],  # Fallback to record_time
-            raw_text=raw_text,
-            is_manual=bool(row[10]) if len(row) > 10 else False,
-            include_in_budget=include_in_budget
+            bill_date=row[6] or datetime.date.today().strftime("%Y-%m-%d"),
+            created_at=row[7] or row[1],  # Fallback to record_time
+            updated_at=row[8] or row[1],  # Fallback to record_time
+            is_manual=bool(row[9]) if len(row) > 9 else False,
+            include_in_budget=include_in_budget,
+            needs_review=needs_review
         )
     
     # Category Rules CRUD operations
     def get_category_rules(self, ledger_id: Optional[int] = None) -> List[CategoryRule]:
         """Get all category rules (global + specific ledger when provided)"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        with self._db.read() as cursor:
+            query = '''
+                SELECT r.id, r.keyword, r.category, r.category_id, r.priority,
+                       r.created_at, r.updated_at, r.ledger_id, c.major, c.minor
+                FROM category_rules r
+                LEFT JOIN categories c ON r.category_id = c.id
+                WHERE 1=1
+            '''
+            params: List[Any] = []
+            if ledger_id is not None:
+                query += ' AND (r.ledger_id IS NULL OR r.ledger_id = ?)'
+                params.append(ledger_id)
 
-        query = '''
-            SELECT r.id, r.keyword, r.category, r.category_id, r.priority,
-                   r.created_at, r.updated_at, r.ledger_id, c.major, c.minor
-            FROM category_rules r
-            LEFT JOIN categories c ON r.category_id = c.id
-            WHERE 1=1
-        '''
-        params: List[Any] = []
-        if ledger_id is not None:
-            query += ' AND (r.ledger_id IS NULL OR r.ledger_id = ?)'
-            params.append(ledger_id)
+            query += ' ORDER BY r.category, r.priority DESC, r.keyword'
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
 
-        query += ' ORDER BY r.category, r.priority DESC, r.keyword'
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return [self._row_to_category_rule(row) for row in rows]
+            return [self._row_to_category_rule(row) for row in rows]
     
     def save_category_rule(self, rule: CategoryRule) -> int:
         """Save a category rule"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        rule.category_id, rule.category = self._resolve_category(cursor, rule.category, rule.category_id, rule.ledger_id)
-        rule.updated_at = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        if rule.id:
-            # Update existing rule
-            cursor.execute('''
-                UPDATE category_rules 
-                SET keyword=?, category=?, category_id=?, priority=?, updated_at=?, ledger_id=?
-                WHERE id=?
-            ''', (rule.keyword, rule.category, rule.category_id, rule.priority,
-                  rule.updated_at, rule.ledger_id, rule.id))
-            rule_id = rule.id
-        else:
-            # Insert new rule
-            cursor.execute('''
-                INSERT INTO category_rules (keyword, category, category_id, priority, created_at, updated_at, ledger_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (rule.keyword, rule.category, rule.category_id, rule.priority,
-                  rule.created_at, rule.updated_at, rule.ledger_id))
-            rule_id = cursor.lastrowid
-        
-        conn.commit()
-        conn.close()
+        def op(cursor):
+            rule.category_id, rule.category = self._resolve_category(cursor, rule.category, rule.category_id, rule.ledger_id)
+            rule.updated_at = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+            if rule.id:
+                # Update existing rule
+                cursor.execute('''
+                    UPDATE category_rules 
+                    SET keyword=?, category=?, category_id=?, priority=?, updated_at=?, ledger_id=?
+                    WHERE id=?
+                ''', (rule.keyword, rule.category, rule.category_id, rule.priority,
+                      rule.updated_at, rule.ledger_id, rule.id))
+                rule_id = rule.id
+            else:
+                # Insert new rule
+                cursor.execute('''
+                    INSERT INTO category_rules (keyword, category, category_id, priority, created_at, updated_at, ledger_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (rule.keyword, rule.category, rule.category_id, rule.priority,
+                      rule.created_at, rule.updated_at, rule.ledger_id))
+                rule_id = cursor.lastrowid
+
+            return rule_id
+        rule_id = self._write(op)
+        # rules can move between ledgers and global rules apply to all of them
+        self._bump_version()
         return rule_id
     
     def delete_category_rule(self, rule_id: int) -> bool:
         """Delete a category rule"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM category_rules WHERE id = ?', (rule_id,))
-        deleted = cursor.rowcount > 0
-        
-        conn.commit()
-        conn.close()
+        def op(cursor):
+            cursor.execute('DELETE FROM category_rules WHERE id = ?', (rule_id,))
+            deleted = cursor.rowcount > 0
+
+            return deleted
+        deleted = self._write(op)
+        if deleted:
+            self._bump_version()
         return deleted
 
     # Recurring Rules CRUD operations
     def get_recurring_rules(self, ledger_id: Optional[int] = None) -> List[RecurringRule]:
         """Get recurring rules for a ledger"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
-        if ledger_id is None:
-            ledger_id = self.get_default_ledger_id()
-
-        query = '''
-            SELECT r.id, r.ledger_id, r.amount, r.keyword, r.category_id, r.category, r.note,
-                   r.schedule_type, r.schedule_value, r.start_date, r.end_date,
-                   r.enabled, r.include_in_budget, r.created_at, r.updated_at, c.major, c.minor
-            FROM recurring_rules r
-            LEFT JOIN categories c ON r.category_id = c.id
-            WHERE r.ledger_id = ?
-            ORDER BY r.enabled DESC, r.start_date, r.id DESC
-        '''
-        cursor.execute(query, (ledger_id,))
-        rows = cursor.fetchall()
-        conn.close()
-        return [self._row_to_recurring_rule(row) for row in rows]
+        with self._db.read() as cursor:
+            if ledger_id is None:
+                ledger_id = self.get_default_ledger_id()
+
+            query = '''
+                SELECT r.id, r.ledger_id, r.amount_cents, r.keyword, r.category_id, r.category, r.note,
+                       r.schedule_type, r.schedule_value, r.start_date, r.end_date,
+                       r.enabled, r.include_in_budget, r.created_at, r.updated_at, c.major, c.minor,
+                       r.generated_through
+                FROM recurring_rules r
+                LEFT JOIN categories c ON r.category_id = c.id
+                WHERE r.ledger_id = ?
+                ORDER BY r.enabled DESC, r.start_date, r.id DESC
+            '''
+            cursor.execute(query, (ledger_id,))
+            rows = cursor.fetchall()
+            return [self._row_to_recurring_rule(row) for row in rows]
 
     def get_recurring_rule(self, rule_id: int) -> Optional[RecurringRule]:
         """Get a recurring rule by id"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        query = '''
-            SELECT r.id, r.ledger_id, r.amount, r.keyword, r.category_id, r.category, r.note,
-                   r.schedule_type, r.schedule_value, r.start_date, r.end_date,
-                   r.enabled, r.include_in_budget, r.created_at, r.updated_at, c.major, c.minor
-            FROM recurring_rules r
-            LEFT JOIN categories c ON r.category_id = c.id
-            WHERE r.id = ?
-        '''
-        cursor.execute(query, (rule_id,))
-        row = cursor.fetchone()
-        conn.close()
-        return self._row_to_recurring_rule(row) if row else None
+        with self._db.read() as cursor:
+            query = '''
+                SELECT r.id, r.ledger_id, r.amount_cents, r.keyword, r.category_id, r.category, r.note,
+                       r.schedule_type, r.schedule_value, r.start_date, r.end_date,
+                       r.enabled, r.include_in_budget, r.created_at, r.updated_at, c.major, c.minor,
+                       r.generated_through
+                FROM recurring_rules r
+                LEFT JOIN categories c ON r.category_id = c.id
+                WHERE r.id = ?
+            '''
+            cursor.execute(query, (rule_id,))
+            row = cursor.fetchone()
+            return self._row_to_recurring_rule(row) if row else None
 
     def save_recurring_rule(self, rule: RecurringRule) -> int:
         """Save a recurring rule"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
-        if rule.ledger_id is None:
-            rule.ledger_id = self.get_default_ledger_id()
-
-        rule.amount = float(rule.amount or 0)
-        rule.schedule_value = self._normalize_schedule_values(rule.schedule_value)
-        if not rule.schedule_value:
-            rule.schedule_value = [1]
-        rule.enabled = bool(rule.enabled)
-        rule.include_in_budget = rule.include_in_budget if rule.include_in_budget is not None else True
-        rule.category_id, rule.category = self._resolve_category(
-            cursor, rule.category, rule.category_id, rule.ledger_id
-        )
-        rule.updated_at = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        schedule_value_str = ",".join(str(v) for v in rule.schedule_value)
+        def op(cursor):
+            if rule.ledger_id is None:
+                rule.ledger_id = self.get_default_ledger_id()
+
+            rule.amount_cents = int(rule.amount_cents or 0)
+            rule.schedule_value = self._normalize_schedule_values(rule.schedule_value)
+            if not rule.schedule_value:
+                rule.schedule_value = [1]
+            rule.enabled = bool(rule.enabled)
+            rule.include_in_budget = rule.include_in_budget if rule.include_in_budget is not None else True
+            rule.category_id, rule.category = self._resolve_category(
+                cursor, rule.category, rule.category_id, rule.ledger_id
+            )
+            rule.updated_at = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            schedule_value_str = ",".join(str(v) for v in rule.schedule_value)
 
-        if rule.id:
-            cursor.execute('''
-                UPDATE recurring_rules
-                SET amount=?, keyword=?, category_id=?, category=?, note=?, schedule_type=?, schedule_value=?,
-                    start_date=?, end_date=?, enabled=?, include_in_budget=?, updated_at=?, ledger_id=?
-                WHERE id=?
-            ''', (
-                rule.amount,
-                rule.keyword,
-                rule.category_id,
-                rule.category,
-                rule.note,
-                rule.schedule_type,
-                schedule_value_str,
-                rule.start_date,
-                rule.end_date,
-                1 if rule.enabled else 0,
-                1 if rule.include_in_budget else 0,
-                rule.updated_at,
-                rule.ledger_id,
-                rule.id,
-            ))
-            rule_id = rule.id
-        else:
-            cursor.execute('''
-                INSERT INTO recurring_rules (
-                    ledger_id, amount, keyword, category_id, category, note, schedule_type, schedule_value,
-                    start_date, end_date, enabled, include_in_budget, created_at, updated_at
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                rule.ledger_id,
-                rule.amount,
-                rule.keyword,
-                rule.category_id,
-                rule.category,
-                rule.note,
-                rule.schedule_type,
-                schedule_value_str,
-                rule.start_date,
-                rule.end_date,
-                1 if rule.enabled else 0,
-                1 if rule.include_in_budget else 0,
-                rule.created_at,
-                rule.updated_at,
-            ))
-            rule_id = cursor.lastrowid
-
-        conn.commit()
-        conn.close()
+            if rule.id:
+                cursor.execute('''
+                    UPDATE recurring_rules
+                    SET amount_cents=?, keyword=?, category_id=?, category=?, note=?, schedule_type=?, schedule_value=?,
+                        start_date=?, end_date=?, enabled=?, include_in_budget=?, updated_at=?, ledger_id=?,
+                        generated_through=NULL
+                    WHERE id=?
+                ''', (
+                    rule.amount_cents,
+                    rule.keyword,
+                    rule.category_id,
+                    rule.category,
+                    rule.note,
+                    rule.schedule_type,
+                    schedule_value_str,
+                    rule.start_date,
+                    rule.end_date,
+                    1 if rule.enabled else 0,
+                    1 if rule.include_in_budget else 0,
+                    rule.updated_at,
+                    rule.ledger_id,
+                    rule.id,
+                ))
+                rule_id = rule.id
+            else:
+                cursor.execute('''
+                    INSERT INTO recurring_rules (
+                        ledger_id, amount_cents, keyword, category_id, category, note, schedule_type, schedule_value,
+                        start_date, end_date, enabled, include_in_budget, created_at, updated_at
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    rule.ledger_id,
+                    rule.amount_cents,
+                    rule.keyword,
+                    rule.category_id,
+                    rule.category,
+                    rule.note,
+                    rule.schedule_type,
+                    schedule_value_str,
+                    rule.start_date,
+                    rule.end_date,
+                    1 if rule.enabled else 0,
+                    1 if rule.include_in_budget else 0,
+                    rule.created_at,
+                    rule.updated_at,
+                ))
+                rule_id = cursor.lastrowid
+
+            return rule_id
+        rule_id = self._write(op)
+        self._bump_version()
         return rule_id
 
     def delete_recurring_rule(self, rule_id: int) -> bool:
         """Delete a recurring rule"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM recurring_rules WHERE id = ?', (rule_id,))
-        deleted = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+        def op(cursor):
+            cursor.execute('DELETE FROM recurring_rules WHERE id = ?', (rule_id,))
+            deleted = cursor.rowcount > 0
+            return deleted
+        deleted = self._write(op)
+        if deleted:
+            self._bump_version()
         return deleted
 
+    @staticmethod
+    def _recurring_occurrences(schedule_type: str, values: List[int],
+                               first: datetime.date, last: datetime.date) -> List[datetime.date]:
+        """Dates in [first, last] matching a weekly (ISO weekday) or monthly (day of month) schedule"""
+        dates = []
+        if first > last:
+            return dates
+        if schedule_type == "weekly":
+            for weekday in values:
+                current = first + datetime.timedelta(days=(weekday - first.isoweekday()) % 7)
+                while current <= last:
+                    dates.append(current)
+                    current += datetime.timedelta(days=7)
+        elif schedule_type == "monthly":
+            year, month = first.year, first.month
+            while (year, month) <= (last.year, last.month):
+                days_in_month = calendar.monthrange(year, month)[1]
+                for day in values:
+                    # a day missing from this month (e.g. 31) is skipped, not moved
+                    if day <= days_in_month:
+                        current = datetime.date(year, month, day)
+                        if first <= current <= last:
+                            dates.append(current)
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        dates.sort()
+        return dates
+
+    def _due_recurring_dates(self, rule: RecurringRule, end_date: datetime.date) -> List[datetime.date]:
+        """Occurrences of rule after its generated_through watermark, up to end_date"""
+        limit = 7 if rule.schedule_type == "weekly" else 31
+        schedule_values = [v for v in self._normalize_schedule_values(rule.schedule_value) if 1 <= v <= limit]
+        if not schedule_values:
+            return []
+
+        try:
+            first = datetime.datetime.strptime(rule.start_date, "%Y-%m-%d").date()
+        except (TypeError, ValueError):
+            first = end_date
+        if rule.generated_through:
+            try:
+                first = max(first, datetime.datetime.strptime(rule.generated_through, "%Y-%m-%d").date()
+                            + datetime.timedelta(days=1))
+            except ValueError:
+                pass
+
+        last = end_date
+        if rule.end_date:
+            try:
+                last = min(last, datetime.datetime.strptime(rule.end_date, "%Y-%m-%d").date())
+            except ValueError:
+                pass
+        return self._recurring_occurrences(rule.schedule_type, schedule_values, first, last)
+
     def generate_recurring_bills(self, ledger_id: Optional[int] = None, upto_date: Optional[str] = None) -> int:
-        """Generate bills from recurring rules up to a date (inclusive)."""
+        """Generate bills from recurring rules up to a date (inclusive).
+
+        Each rule keeps a generated_through watermark, so only occurrences after it are
+        considered; when none are due this is a single read and no write is queued.
+        """
         if ledger_id is None:
             ledger_id = self.get_default_ledger_id()
 
@@ -1399,100 +2713,75 @@ class EnhancedDatabaseManager:
         else:
             end_date = datetime.date.today()
 
-        rules = [r for r in self.get_recurring_rules(ledger_id) if r.enabled]
-        if not rules:
+        due_rules = [r for r in self.get_recurring_rules(ledger_id)
+                     if r.enabled and self._due_recurring_dates(r, end_date)]
+        if not due_rules:
             return 0
 
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        created = 0
-        now_ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        for rule in rules:
-            schedule_values = self._normalize_schedule_values(rule.schedule_value)
-            limit = 7 if rule.schedule_type == "weekly" else 31
-            schedule_values = [v for v in schedule_values if 1 <= v <= limit]
-            if not schedule_values:
-                continue
-
-            try:
-                start_date = datetime.datetime.strptime(rule.start_date, "%Y-%m-%d").date()
-            except (TypeError, ValueError):
-                start_date = end_date
-
-            rule_end = end_date
-            if rule.end_date:
-                try:
-                    rule_end = datetime.datetime.strptime(rule.end_date, "%Y-%m-%d").date()
-                except ValueError:
-                    rule_end = end_date
-
-            if rule_end > end_date:
-                rule_end = end_date
-            if start_date > rule_end:
-                continue
+        def op(cursor):
+            new_ids = []
+            now_ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            through = end_date.strftime("%Y-%m-%d")
+
+            for rule in due_rules:
+                # another request may have advanced the watermark since the read above
+                cursor.execute('SELECT enabled, generated_through FROM recurring_rules WHERE id = ?', (rule.id,))
+                row = cursor.fetchone()
+                if not row or not row[0]:
+                    continue
+                rule.generated_through = row[1]
+                dates = [d.strftime("%Y-%m-%d") for d in self._due_recurring_dates(rule, end_date)]
+                if not dates:
+                    continue
+
+                # dates whose run already exists were generated before (the bill may since have been deleted)
+                cursor.execute(
+                    'SELECT bill_date FROM recurring_rule_runs WHERE rule_id = ? AND bill_date BETWEEN ? AND ?',
+                    (rule.id, dates[0], dates[-1]),
+                )
+                existing = {r[0] for r in cursor.fetchall()}
+                new_dates = [d for d in dates if d not in existing]
 
-            current = start_date
-            while current <= rule_end:
-                match = False
-                if rule.schedule_type == "weekly":
-                    match = current.isoweekday() in schedule_values
-                elif rule.schedule_type == "monthly":
-                    match = current.day in schedule_values
-                if match:
-                    bill_date = current.strftime("%Y-%m-%d")
-                    cursor.execute(
-                        '''
-                        INSERT OR IGNORE INTO recurring_rule_runs (rule_id, ledger_id, bill_date, created_at)
-                        VALUES (?, ?, ?, ?)
-                        ''',
-                        (rule.id, ledger_id, bill_date, now_ts),
+                if new_dates:
+                    category_id, category_name = self._resolve_category(
+                        cursor, rule.category, rule.category_id, ledger_id
                     )
-                    if cursor.rowcount > 0:
-                        category_id, category_name = self._resolve_category(
-                            cursor, rule.category, rule.category_id, ledger_id
-                        )
-                        merchant = rule.keyword or rule.note or "周期性账单"
-                        raw_text_json = json.dumps([], ensure_ascii=False)
+                    merchant = rule.keyword or rule.note or "周期性账单"
+                    runs = []
+                    for bill_date in new_dates:
                         cursor.execute(
                             '''
-                            INSERT INTO bills (record_time, image_name, merchant, category, category_id, amount,
-                                              raw_text, bill_date, created_at, updated_at, is_manual, ledger_id,
+                            INSERT INTO bills (record_time, image_name, merchant, category, category_id, amount_cents,
+                                              bill_date, created_at, updated_at, is_manual, ledger_id,
                                               include_in_budget)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            ''',
-                            (
-                                now_ts,
-                                "",
-                                merchant,
-                                category_name,
-                                category_id,
-                                float(rule.amount or 0),
-                                raw_text_json,
-                                bill_date,
-                                now_ts,
-                                now_ts,
-                                0,
-                                ledger_id,
-                                1 if rule.include_in_budget else 0,
-                            ),
-                        )
-                        bill_id = cursor.lastrowid
-                        cursor.execute(
-                            '''
-                            UPDATE recurring_rule_runs
-                            SET bill_id=?
-                            WHERE rule_id=? AND bill_date=?
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                             ''',
-                            (bill_id, rule.id, bill_date),
+                            (now_ts, "", merchant, category_name, category_id, int(rule.amount_cents or 0),
+                             bill_date, now_ts, now_ts, 0, ledger_id, 1 if rule.include_in_budget else 0),
                         )
-                        created += 1
-                current += datetime.timedelta(days=1)
+                        # the id SQLite assigned to this row, not one inferred from a range
+                        runs.append((rule.id, ledger_id, bill_date, cursor.lastrowid, now_ts))
+                    cursor.executemany(
+                        '''
+                        INSERT INTO recurring_rule_runs (rule_id, ledger_id, bill_date, bill_id, created_at)
+                        VALUES (?, ?, ?, ?, ?)
+                        ''',
+                        runs,
+                    )
+                    new_ids.extend(run[3] for run in runs)
+
+                cursor.execute(
+                    'UPDATE recurring_rules SET generated_through = ? WHERE id = ?',
+                    (through, rule.id),
+                )
+
+            return new_ids
+        new_ids = self._write(op)
+        self._bills_changed(new_ids)
+        # generated_through moved even when every due date already had a run
+        self._bump_version([ledger_id])
+        return len(new_ids)
 
-        conn.commit()
-        conn.close()
-        return created
-    
     def _row_to_category_rule(self, row) -> CategoryRule:
         """Convert database row to CategoryRule object"""
         cat_name = self._format_category_name(row[8], row[9]) if len(row) > 9 and row[8] is not None else row[2]
@@ -1515,7 +2804,7 @@ class EnhancedDatabaseManager:
         return RecurringRule(
             id=row[0],
             ledger_id=row[1],
-            amount=row[2] or 0.0,
+            amount_cents=row[2] or 0,
             keyword=row[3] or "",
             category_id=row[4],
             category=cat_name,
@@ -1528,53 +2817,48 @@ class EnhancedDatabaseManager:
             include_in_budget=bool(row[12]) if len(row) > 12 and row[12] is not None else True,
             created_at=row[13] if len(row) > 13 else "",
             updated_at=row[14] if len(row) > 14 else "",
+            generated_through=row[17] if len(row) > 17 else None,
         )
 
     # Category Groups CRUD operations (using categories table)
     def get_category_groups(self, ledger_id: Optional[int] = None) -> List[CategoryGroup]:
         """Get all category groups (global + specific ledger)"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        params: List[Any] = []
-        query = 'SELECT * FROM categories WHERE 1=1'
-        if ledger_id is not None:
-            query += ' AND (ledger_id IS NULL OR ledger_id = ?)'
-            params.append(ledger_id)
-        query += ' ORDER BY major, minor'
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
-        return [self._row_to_category_group(row) for row in rows]
+        with self._db.read() as cursor:
+            params: List[Any] = []
+            query = 'SELECT * FROM categories WHERE 1=1'
+            if ledger_id is not None:
+                query += ' AND (ledger_id IS NULL OR ledger_id = ?)'
+                params.append(ledger_id)
+            query += ' ORDER BY major, minor'
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            return [self._row_to_category_group(row) for row in rows]
 
     def get_category_group(self, category_id: int) -> Optional[CategoryGroup]:
         """Get a category group by ID"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM categories WHERE id = ?', (category_id,))
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            return self._row_to_category_group(row)
-        return None
+        with self._db.read() as cursor:
+            cursor.execute('SELECT * FROM categories WHERE id = ?', (category_id,))
+            row = cursor.fetchone()
+            if row:
+                return self._row_to_category_group(row)
+            return None
 
     def get_category_group_by_name(self, category_name: str, ledger_id: Optional[int] = None) -> Optional[CategoryGroup]:
         """Get a category group by full name"""
         group = self._split_category_name(category_name)
         if not group.major:
             return None
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        params: List[Any] = [group.major, group.minor]
-        query = 'SELECT * FROM categories WHERE major = ? AND minor = ?'
-        if ledger_id is not None:
-            query += ' AND (ledger_id IS NULL OR ledger_id = ?)'
-            params.append(ledger_id)
-        cursor.execute(query, params)
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            return self._row_to_category_group(row)
-        return None
+        with self._db.read() as cursor:
+            params: List[Any] = [group.major, group.minor]
+            query = 'SELECT * FROM categories WHERE major = ? AND minor = ?'
+            if ledger_id is not None:
+                query += ' AND (ledger_id IS NULL OR ledger_id = ?)'
+                params.append(ledger_id)
+            cursor.execute(query, params)
+            row = cursor.fetchone()
+            if row:
+                return self._row_to_category_group(row)
+            return None
 
     def category_exists(self, category_name: str, ledger_id: Optional[int] = None) -> bool:
         """Check if a category exists"""
@@ -1582,84 +2866,95 @@ class EnhancedDatabaseManager:
 
     def save_category_group(self, group: CategoryGroup) -> int:
         """Save a category group and propagate renames to rules"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        def op(cursor):
+            now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        if group.id:
-            cursor.execute('SELECT major, minor, ledger_id FROM categories WHERE id = ?', (group.id,))
-            row = cursor.fetchone()
-            if not row:
-                conn.close()
-                raise ValueError("Category not found")
+            if group.id:
+                cursor.execute('SELECT major, minor, ledger_id FROM categories WHERE id = ?', (group.id,))
+                row = cursor.fetchone()
+                if not row:
+                    raise ValueError("Category not found")
 
-            old_name = self._format_category_name(row[0], row[1])
-            new_name = self._format_category_name(group.major, group.minor)
-            group.updated_at = now
+                old_name = self._format_category_name(row[0], row[1])
+                new_name = self._format_category_name(group.major, group.minor)
+                group.updated_at = now
 
-            try:
-                cursor.execute('''
-                    UPDATE categories
-                    SET major = ?, minor = ?, updated_at = ?, ledger_id = ?
-                    WHERE id = ?
-                ''', (group.major, group.minor, group.updated_at, group.ledger_id, group.id))
-            except sqlite3.IntegrityError:
-                conn.close()
-                raise ValueError("Category already exists")
-
-            if old_name != new_name:
-                cursor.execute('''
-                    UPDATE category_rules
-                    SET category = ?
-                    WHERE category = ? AND (ledger_id IS NULL OR ledger_id = ?)
-                ''', (new_name, old_name, group.ledger_id))
-                cursor.execute('''
-                    UPDATE bills
-                    SET category = ?
-                    WHERE category = ? AND ledger_id = ?
-                ''', (new_name, old_name, group.ledger_id))
-            group_id = group.id
-        else:
-            group.created_at = now
-            group.updated_at = now
-            try:
-                cursor.execute('''
-                    INSERT INTO categories (major, minor, created_at, updated_at, ledger_id)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (group.major, group.minor, group.created_at, group.updated_at, group.ledger_id))
-            except sqlite3.IntegrityError:
-                conn.close()
-                raise ValueError("Category already exists")
-            group_id = cursor.lastrowid
-
-        conn.commit()
-        conn.close()
+                try:
+                    cursor.execute('''
+                        UPDATE categories
+                        SET major = ?, minor = ?, updated_at = ?, ledger_id = ?
+                        WHERE id = ?
+                    ''', (group.major, group.minor, group.updated_at, group.ledger_id, group.id))
+                except sqlite3.IntegrityError:
+                    raise ValueError("Category already exists")
+
+                if old_name != new_name:
+                    cursor.execute('''
+                        UPDATE category_rules
+                        SET category = ?
+                        WHERE category = ? AND (ledger_id IS NULL OR ledger_id = ?)
+                    ''', (new_name, old_name, group.ledger_id))
+                    cursor.execute('''
+                        UPDATE bills
+                        SET category = ?
+                        WHERE category_id = ? OR (category = ? AND ledger_id = ?)
+                    ''', (new_name, group.id, old_name, group.ledger_id))
+                group_id = group.id
+            else:
+                group.created_at = now
+                group.updated_at = now
+                try:
+                    cursor.execute('''
+                        INSERT INTO categories (major, minor, created_at, updated_at, ledger_id)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', (group.major, group.minor, group.created_at, group.updated_at, group.ledger_id))
+                except sqlite3.IntegrityError:
+                    raise ValueError("Category already exists")
+                group_id = cursor.lastrowid
+                # bills that already carry this name get linked to the new category
+                query = '''
+                    UPDATE bills SET category_id = ?
+                    WHERE category = ? AND category_id IS NULL
+                '''
+                params = [group_id, self._format_category_name(group.major, group.minor)]
+                if group.ledger_id is not None:
+                    query += ' AND ledger_id = ?'
+                    params.append(group.ledger_id)
+                cursor.execute(query, params)
+
+            return group_id
+        group_id = self._write(op)
+        # category names feed every ledger's summaries
+        self._bills_changed()
+        self._bump_version()
         return group_id
 
     def delete_category_group(self, category_id: int) -> Dict[str, Any]:
         """Delete a category group if not used by rules"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
-        cursor.execute('SELECT major, minor FROM categories WHERE id = ?', (category_id,))
-        row = cursor.fetchone()
-        if not row:
-            conn.close()
-            return {'deleted': False, 'in_use': 0}
-
-        category_name = self._format_category_name(row[0], row[1])
-        cursor.execute('SELECT COUNT(*) FROM category_rules WHERE category = ?', (category_name,))
-        in_use = cursor.fetchone()[0]
-
-        if in_use > 0:
-            conn.close()
-            return {'deleted': False, 'in_use': in_use}
-
-        cursor.execute('DELETE FROM categories WHERE id = ?', (category_id,))
-        deleted = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
-        return {'deleted': deleted, 'in_use': 0}
+        def op(cursor):
+            cursor.execute('SELECT major, minor FROM categories WHERE id = ?', (category_id,))
+            row = cursor.fetchone()
+            if not row:
+                return {'deleted': False, 'in_use': 0}
+
+            category_name = self._format_category_name(row[0], row[1])
+            cursor.execute('SELECT COUNT(*) FROM category_rules WHERE category = ?', (category_name,))
+            in_use = cursor.fetchone()[0]
+
+            if in_use > 0:
+                return {'deleted': False, 'in_use': in_use}
+
+            cursor.execute('DELETE FROM categories WHERE id = ?', (category_id,))
+            deleted = cursor.rowcount > 0
+            if deleted:
+                # bills keep the name in bills.category
+                cursor.execute('UPDATE bills SET category_id = NULL WHERE category_id = ?', (category_id,))
+            return {'deleted': deleted, 'in_use': 0}
+        result = self._write(op)
+        if result['deleted']:
+            self._bills_changed()
+            self._bump_version()
+        return result
 
     def list_category_names(self, ledger_id: Optional[int] = None) -> List[str]:
         """Get full category names for dropdowns"""
@@ -1672,20 +2967,18 @@ class EnhancedDatabaseManager:
         minor = (minor or "").strip()
         if not major:
             return False
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        query = "SELECT id FROM categories WHERE LOWER(major) = LOWER(?) AND LOWER(minor) = LOWER(?)"
-        params: List[Any] = [major, minor]
-        if ledger_id is not None:
-            query += " AND (ledger_id IS NULL OR ledger_id = ?)"
-            params.append(ledger_id)
-        if exclude_id:
-            query += " AND id != ?"
-            params.append(exclude_id)
-        cursor.execute(query, params)
-        exists = cursor.fetchone() is not None
-        conn.close()
-        return exists
+        with self._db.read() as cursor:
+            query = "SELECT id FROM categories WHERE LOWER(major) = LOWER(?) AND LOWER(minor) = LOWER(?)"
+            params: List[Any] = [major, minor]
+            if ledger_id is not None:
+                query += " AND (ledger_id IS NULL OR ledger_id = ?)"
+                params.append(ledger_id)
+            if exclude_id:
+                query += " AND id != ?"
+                params.append(exclude_id)
+            cursor.execute(query, params)
+            exists = cursor.fetchone() is not None
+            return exists
 
     def category_rule_combo_conflict(
         self,
@@ -1698,20 +2991,18 @@ class EnhancedDatabaseManager:
         category_name = (category_name or "").strip()
         if not keyword or not category_name:
             return False
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        query = "SELECT id FROM category_rules WHERE LOWER(keyword) = LOWER(?) AND LOWER(category) = LOWER(?)"
-        params: List[Any] = [keyword, category_name]
-        if ledger_id is not None:
-            query += " AND (ledger_id IS NULL OR ledger_id = ?)"
-            params.append(ledger_id)
-        if exclude_id:
-            query += " AND id != ?"
-            params.append(exclude_id)
-        cursor.execute(query, params)
-        exists = cursor.fetchone() is not None
-        conn.close()
-        return exists
+        with self._db.read() as cursor:
+            query = "SELECT id FROM category_rules WHERE LOWER(keyword) = LOWER(?) AND LOWER(category) = LOWER(?)"
+            params: List[Any] = [keyword, category_name]
+            if ledger_id is not None:
+                query += " AND (ledger_id IS NULL OR ledger_id = ?)"
+                params.append(ledger_id)
+            if exclude_id:
+                query += " AND id != ?"
+                params.append(exclude_id)
+            cursor.execute(query, params)
+            exists = cursor.fetchone() is not None
+            return exists
 
     def _row_to_category_group(self, row) -> CategoryGroup:
         """Convert database row to CategoryGroup object"""
@@ -1725,130 +3016,217 @@ class EnhancedDatabaseManager:
         )
     
     # Analytics methods
-    def get_spending_summary(self, start_date: str = None, end_date: str = None,
-                             keyword: str = None, major: str = None,
-                             minor: str = None, ledger_id: Optional[int] = None,
-                             include_in_budget: Optional[bool] = None) -> Dict[str, Any]:
-        """Get spending summary for a date range"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+    def _analytics_source(self, keyword: Optional[str]) -> Dict[str, str]:
+        """Pick the row source for aggregate queries.
+
+        Without a keyword every filter (date, category, ledger, budget flag) is a
+        column of bill_daily_rollup, so aggregates are read from the rollup; keyword
+        searches have to look at individual bills.
+        """
+        if keyword and keyword.strip():
+            return {
+                'alias': 'b',
+                'from': 'FROM bills b LEFT JOIN categories c ON b.category_id = c.id',
+                'amount': 'SUM(b.amount_cents)',
+                'count': 'COUNT(*)',
+                'category': "COALESCE(c.major || '/' || c.minor, b.category)",
+            }
+        return {
+            'alias': 'r',
+            'from': 'FROM bill_daily_rollup r LEFT JOIN categories c ON r.category_id = c.id',
+            'amount': 'SUM(r.amount_cents)',
+            'count': 'SUM(r.bill_count)',
+            'category': "COALESCE(c.major || '/' || c.minor, r.category)",
+        }
+
+    def get_bill_facts(self, ledger_id: int, bill_ids: Optional[List[int]] = None) -> List[tuple]:
+        """Rows (id, bill_date, amount_cents, include_in_budget, category_id, category)
+        of a ledger's bills, or only of those bill_ids that are still in the ledger.
 
-        base_query = '''
+        category is the display name the analytics queries group by. This is the
+        row source of in-memory analytics caches.
+        """
+        query = '''
+            SELECT b.id, b.bill_date, b.amount_cents, b.include_in_budget, b.category_id,
+                   COALESCE(c.major || '/' || c.minor, b.category)
             FROM bills b
             LEFT JOIN categories c ON b.category_id = c.id
-            WHERE 1=1
+            WHERE b.ledger_id = ?
         '''
-        params = []
-
-        if start_date:
-            base_query += ' AND b.bill_date >= ?'
-            params.append(start_date)
-
-        if end_date:
-            base_query += ' AND b.bill_date <= ?'
-            params.append(end_date)
-
-        categories_filter = self._fetch_category_names_by_major_minor(cursor, major, minor, ledger_id)
-        base_query = self._append_category_filter(base_query, params, categories_filter, "COALESCE(c.major || '/' || c.minor, b.category)")
-
-        if ledger_id is not None:
-            base_query += ' AND b.ledger_id = ?'
-            params.append(ledger_id)
-
-        if include_in_budget is True:
-            base_query += ' AND (b.include_in_budget = 1 OR b.include_in_budget IS NULL)'
-        elif include_in_budget is False:
-            base_query += ' AND b.include_in_budget = 0'
-
-        if keyword:
-            keyword_like = f'%{keyword}%'
-            base_query += ' AND (b.merchant LIKE ? OR b.raw_text LIKE ?)'
-            params.extend([keyword_like, keyword_like])
-
-        cursor.execute(f'SELECT SUM(b.amount), COUNT(*) {base_query}', params)
-        total_amount, bill_count = cursor.fetchone()
-
-        cursor.execute(f'SELECT COUNT(DISTINCT b.bill_date) {base_query}', params)
-        day_count = cursor.fetchone()[0] or 0
-
-        # Get category breakdown
-        category_query = f'''
-            SELECT COALESCE(c.major || '/' || c.minor, b.category) AS cat_name,
-                   SUM(b.amount), COUNT(*)
-            {base_query}
-            GROUP BY cat_name
-            ORDER BY SUM(b.amount) DESC
-        '''
-
-        cursor.execute(category_query, params)
-        categories = {}
-        for row in cursor.fetchall():
-            categories[row[0]] = {'amount': row[1], 'count': row[2]}
+        with self._db.read(snapshot=True) as cursor:
+            if bill_ids is None:
+                cursor.execute(query, [ledger_id])
+                return cursor.fetchall()
+            rows = []
+            for chunk in self._chunked(list(bill_ids)):
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f'{query} AND b.id IN ({placeholders})', [ledger_id] + chunk)
+                rows.extend(cursor.fetchall())
+            return rows
+
+    def get_category_filter_ids(self, major: str = None, minor: str = None,
+                                ledger_id: Optional[int] = None) -> Optional[List[int]]:
+        """Category ids an analytics major/minor filter matches; None means no filter."""
+        with self._db.read() as cursor:
+            return self._category_filter_ids(cursor, None, major, minor, ledger_id)
 
-        conn.close()
+    def get_spending_summary(self, start_date: str = None, end_date: str = None,
+                             keyword: str = None, major: str = None,
+                             minor: str = None, ledger_id: Optional[int] = None,
+                             include_in_budget: Optional[bool] = None) -> Dict[str, Any]:
+        """Get spending summary for a date range (all money fields are integer cents)"""
+        src = self._analytics_source(keyword)
+        a = src['alias']
+        with self._db.read(snapshot=True) as cursor:
+            base_query = f'''
+                {src['from']}
+                WHERE 1=1
+            '''
+            params = []
+
+            if start_date:
+                base_query += f' AND {a}.bill_date >= ?'
+                params.append(start_date)
+
+            if end_date:
+                base_query += f' AND {a}.bill_date <= ?'
+                params.append(end_date)
+
+            category_ids = self._category_filter_ids(cursor, None, major, minor, ledger_id)
+            base_query = self._append_category_filter(base_query, params, category_ids, a)
+
+            if ledger_id is not None:
+                base_query += f' AND {a}.ledger_id = ?'
+                params.append(ledger_id)
+
+            if include_in_budget is True:
+                base_query += f' AND ({a}.include_in_budget = 1 OR {a}.include_in_budget IS NULL)'
+            elif include_in_budget is False:
+                base_query += f' AND {a}.include_in_budget = 0'
+
+            if a == 'b':
+                base_query = self._append_keyword_filter(base_query, params, keyword)
+
+            cursor.execute(f'SELECT {src["amount"]}, {src["count"]}, COUNT(DISTINCT {a}.bill_date) {base_query}', params)
+            total_cents, bill_count, day_count = cursor.fetchone()
+            day_count = day_count or 0
+
+            # Get category breakdown
+            category_query = f'''
+                SELECT {src['category']} AS cat_name,
+                       {src['amount']}, {src['count']}
+                {base_query}
+                GROUP BY cat_name
+                ORDER BY {src['amount']} DESC
+            '''
 
-        total_amount = total_amount or 0.0
-        daily_avg = (total_amount / day_count) if day_count else 0.0
+            cursor.execute(category_query, params)
+            categories = {}
+            for row in cursor.fetchall():
+                categories[row[0]] = {'amount_cents': row[1] or 0, 'count': row[2]}
+
+            total_cents = total_cents or 0
+
+            return {
+                'total_amount_cents': total_cents,
+                'bill_count': bill_count or 0,
+                'categories': categories,
+                'period_start': start_date,
+                'period_end': end_date,
+                'day_count': day_count,
+                'daily_avg_cents': round(total_cents / day_count) if day_count else 0
+            }
+    
+    def get_dashboard_summary(self, ledger_id: int, start_date: str, end_date: str,
+                              top_n: int = 3) -> Dict[str, Any]:
+        """Dashboard figures for one ledger and period, read in a single snapshot.
+
+        One pass over bill_daily_rollup with conditional aggregation yields, per
+        category, the total and the budget-included amount; the period totals and
+        the top_n categories (by total) are derived from those rows, and the
+        ledger's monthly budget is read in the same read transaction.
+        """
+        with self._db.read(snapshot=True) as cursor:
+            cursor.execute('SELECT monthly_budget_cents FROM ledgers WHERE id = ?', (ledger_id,))
+            row = cursor.fetchone()
+            monthly_budget_cents = (row[0] or 0) if row else 0
 
+            cursor.execute('''
+                SELECT COALESCE(c.major || '/' || c.minor, r.category) AS cat_name,
+                       SUM(r.amount_cents),
+                       SUM(r.bill_count),
+                       SUM(CASE WHEN r.include_in_budget = 1 OR r.include_in_budget IS NULL
+                                THEN r.amount_cents ELSE 0 END),
+                       SUM(CASE WHEN r.include_in_budget = 1 OR r.include_in_budget IS NULL
+                                THEN r.bill_count ELSE 0 END)
+                FROM bill_daily_rollup r
+                LEFT JOIN categories c ON r.category_id = c.id
+                WHERE r.ledger_id = ? AND r.bill_date >= ? AND r.bill_date <= ?
+                GROUP BY cat_name
+            ''', (ledger_id, start_date, end_date))
+            rows = cursor.fetchall()
+
+        total_cents = sum(r[1] or 0 for r in rows)
+        rows.sort(key=lambda r: r[1] or 0, reverse=True)
         return {
-            'total_amount': total_amount,
-            'bill_count': bill_count or 0,
-            'categories': categories,
             'period_start': start_date,
             'period_end': end_date,
-            'day_count': day_count,
-            'daily_avg': daily_avg
+            'total_amount_cents': total_cents,
+            'bill_count': sum(r[2] or 0 for r in rows),
+            'budget_amount_cents': sum(r[3] or 0 for r in rows),
+            'budget_bill_count': sum(r[4] or 0 for r in rows),
+            'monthly_budget_cents': monthly_budget_cents,
+            'top_categories': [
+                {'category': r[0], 'amount_cents': r[1] or 0, 'count': r[2] or 0}
+                for r in rows[:top_n]
+            ],
         }
-    
+
     def get_daily_spending(self, start_date: str = None, end_date: str = None,
                            keyword: str = None, major: str = None,
                            minor: str = None, ledger_id: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Get daily spending data"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        query = '''
-            SELECT b.bill_date, SUM(b.amount), COUNT(*)
-            FROM bills b
-            LEFT JOIN categories c ON b.category_id = c.id
-            WHERE 1=1
-        '''
-        params = []
-        
-        if start_date:
-            query += ' AND b.bill_date >= ?'
-            params.append(start_date)
-        
-        if end_date:
-            query += ' AND b.bill_date <= ?'
-            params.append(end_date)
+        """Get daily spending data ({'date', 'amount_cents', 'count'} per day, newest first)"""
+        src = self._analytics_source(keyword)
+        a = src['alias']
+        with self._db.read() as cursor:
+            query = f'''
+                SELECT {a}.bill_date, {src['amount']}, {src['count']}
+                {src['from']}
+                WHERE 1=1
+            '''
+            params = []
 
-        categories_filter = self._fetch_category_names_by_major_minor(cursor, major, minor, ledger_id)
-        query = self._append_category_filter(query, params, categories_filter, "COALESCE(c.major || '/' || c.minor, b.category)")
+            if start_date:
+                query += f' AND {a}.bill_date >= ?'
+                params.append(start_date)
 
-        if ledger_id is not None:
-            query += ' AND b.ledger_id = ?'
-            params.append(ledger_id)
+            if end_date:
+                query += f' AND {a}.bill_date <= ?'
+                params.append(end_date)
 
-        if keyword:
-            keyword_like = f'%{keyword}%'
-            query += ' AND (b.merchant LIKE ? OR b.raw_text LIKE ?)'
-            params.extend([keyword_like, keyword_like])
-        
-        query += ' GROUP BY b.bill_date ORDER BY b.bill_date DESC'
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return [
-            {
-                'date': row[0],
-                'amount': row[1],
-                'count': row[2]
-            }
-            for row in rows
-        ]
+            category_ids = self._category_filter_ids(cursor, None, major, minor, ledger_id)
+            query = self._append_category_filter(query, params, category_ids, a)
+
+            if ledger_id is not None:
+                query += f' AND {a}.ledger_id = ?'
+                params.append(ledger_id)
+
+            if a == 'b':
+                query = self._append_keyword_filter(query, params, keyword)
+
+            query += f' GROUP BY {a}.bill_date ORDER BY {a}.bill_date DESC'
+
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+
+            return [
+                {
+                    'date': row[0],
+                    'amount_cents': row[1] or 0,
+                    'count': row[2]
+                }
+                for row in rows
+            ]
 
 
 # Backward compatibility - Enhanced versions of existing classes
@@ -1882,7 +3260,7 @@ class EnhancedExcelSaver:
                 bill.filename,
                 merchant_clean,
                 bill.category,
-                bill.amount,
+                from_cents(bill.amount_cents),
                 str(bill.raw_text)[:50] + "..." if bill.raw_text else ""
             ]
             ws.append(row)
@@ -1904,7 +3282,7 @@ class DatabaseSaver:
         bill = EnhancedBill(
             filename=image_name,
             merchant=data.get("merchant", ""),
-            amount=data.get("amount", 0.0),
+            amount_cents=to_cents(data.get("amount", 0)),
             category=data.get("category", ""),
             raw_text=data.get("raw_text", []),
             bill_date=bill_date or datetime.date.today().strftime("%Y-%m-%d"),
@@ -0,0 +1,198 @@
+# folder_ingest.py
+# 目录批量入账（run.py / 目录监听共用）：
+# - 扫描图片目录，按内容 sha1 去重；(大小, mtime) 未变的文件直接复用上次的哈希
+# - 检查点记录已入账的哈希，重复运行只处理新截图
+# - parse_batch 批量识别，每批一个事务写入 EnhancedDatabaseManager
+# - 每批提交后再落检查点；两者之间崩溃时靠 external_id ("image:<sha1>") 去重
+
+import os
+import json
+import time
+import hashlib
+import datetime
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import config
+from .enhanced_storage import EnhancedBill
+from .money import to_cents
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def file_sha1(path: str, chunk_size: int = 1024 * 1024) -> str:
+    hasher = hashlib.sha1()
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def scan_images(img_dir: str, extensions=IMAGE_EXTENSIONS) -> List[str]:
+    """列出目录下的图片（按文件名排序，保证每次处理顺序一致）"""
+    return sorted(
+        entry.path for entry in os.scandir(img_dir)
+        if entry.is_file() and entry.name.lower().endswith(extensions) and not entry.name.startswith('.')
+    )
+
+
+class IngestCheckpoint:
+    """
+    已入账图片的检查点（JSON，原子替换写入）
+    - hashes: sha1 -> {file, at}
+    - files:  文件名 -> [size, mtime_ns, sha1]，用来跳过未变文件的重复哈希
+    """
+
+    def __init__(self, path: str = config.INGEST_CHECKPOINT_PATH):
+        self.path = path
+        self.hashes: Dict[str, Dict[str, Any]] = {}
+        self.files: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 检查点文件损坏，将重新处理全部图片: {e}")
+            return
+        self.hashes = data.get('hashes') or {}
+        self.files = data.get('files') or {}
+
+    def save(self):
+        with self._lock:
+            data = {'hashes': self.hashes, 'files': self.files}
+            tmp = f"{self.path}.tmp"
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+
+    def cached_hash(self, path: str, st: os.stat_result) -> Optional[str]:
+        entry = self.files.get(os.path.basename(path))
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        return None
+
+    def remember_file(self, path: str, st: os.stat_result, sha1: str):
+        with self._lock:
+            self.files[os.path.basename(path)] = [st.st_size, st.st_mtime_ns, sha1]
+
+    def is_done(self, sha1: str) -> bool:
+        return sha1 in self.hashes
+
+    def mark_done(self, sha1: str, filename: str):
+        with self._lock:
+            self.hashes[sha1] = {'file': filename, 'at': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def _bill_date_from_mtime(st: os.stat_result) -> str:
+    return datetime.date.fromtimestamp(st.st_mtime).strftime('%Y-%m-%d')
+
+
+def plan_ingest(paths: List[str], checkpoint: IngestCheckpoint) -> Tuple[List[Tuple[str, str, os.stat_result]], int]:
+    """
+    计算待处理列表：[(path, sha1, stat)]，以及因检查点/同批重复而跳过的数量
+    """
+    todo: List[Tuple[str, str, os.stat_result]] = []
+    seen = set()
+    skipped = 0
+    for path in paths:
+        try:
+            st = os.stat(path)
+            sha1 = checkpoint.cached_hash(path, st) or file_sha1(path)
+        except OSError:
+            continue
+        checkpoint.remember_file(path, st, sha1)
+        if checkpoint.is_done(sha1) or sha1 in seen:
+            skipped += 1
+            continue
+        seen.add(sha1)
+        todo.append((path, sha1, st))
+    return todo, skipped
+
+
+def ingest_images(
+    parser,
+    db,
+    paths: List[str],
+    checkpoint: IngestCheckpoint,
+    ledger_id: Optional[int] = None,
+    bill_date: Optional[str] = None,
+    batch_size: int = config.UPLOAD_PARSE_BATCH,
+    progress: Optional[Callable[[int, int, Dict[str, Any]], None]] = None,
+    on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    needs_review: bool = False,
+) -> Dict[str, Any]:
+    """
+    识别并入账一组图片
+    - bill_date 为空时使用文件修改日期
+    - progress(done, total, stats)：每批完成后回调
+    - on_result(path, bill_data)：每张图识别完成后回调（用于打印明细）
+    - needs_review: 标记为待复核（目录监听自动入账时使用）
+    识别失败的图片不写检查点，下次运行会重试
+    """
+    if ledger_id is None:
+        ledger_id = db.get_default_ledger_id()
+    todo, skipped = plan_ingest(paths, checkpoint)
+    stats: Dict[str, Any] = {
+        'total': len(paths), 'pending': len(todo), 'skipped': skipped,
+        'inserted': 0, 'duplicates': 0, 'failed': 0,
+    }
+    if progress:
+        progress(0, len(todo), stats)
+
+    batch_size = max(1, int(batch_size))
+    done = 0
+    try:
+        for start in range(0, len(todo), batch_size):
+            batch = todo[start:start + batch_size]
+            try:
+                results = parser.parse_batch([p for p, _, _ in batch])
+            except Exception as e:
+                print(f"❌ 批量识别失败: {e}")
+                results = [{'error': str(e)} for _ in batch]
+
+            bills = []
+            ok: List[Tuple[str, str]] = []
+            for (path, sha1, st), bill_data in zip(batch, results):
+                if on_result:
+                    on_result(path, bill_data)
+                if not bill_data or bill_data.get('error'):
+                    stats['failed'] += 1
+                    continue
+                name = os.path.basename(path)
+                bills.append(EnhancedBill(
+                    ledger_id=ledger_id,
+                    filename=name,
+                    merchant=bill_data.get('merchant') or '未知商品',
+                    amount_cents=to_cents(bill_data.get('amount')),
+                    category=bill_data.get('category') or '未分类',
+                    bill_date=bill_date or _bill_date_from_mtime(st),
+                    raw_text=bill_data.get('raw_text') or [],
+                    ocr_lines=bill_data.get('ocr_lines'),
+                    is_manual=False,
+                    external_id=f"image:{sha1}",
+                    needs_review=needs_review,
+                ))
+                ok.append((sha1, name))
+
+            if bills:
+                # 一批一个事务
+                result = db.import_bills(bills, ledger_id=ledger_id, chunk_size=len(bills))
+                stats['inserted'] += result['inserted']
+                stats['duplicates'] += result['duplicates']
+            for sha1, name in ok:
+                checkpoint.mark_done(sha1, name)
+            checkpoint.save()
+
+            done += len(batch)
+            if progress:
+                progress(done, len(todo), stats)
+    finally:
+        # 中断时也保留已算好的哈希缓存
+        checkpoint.save()
+    return stats
@@ -0,0 +1,190 @@
+# folder_watch.py
+# 图片目录监听（python run.py --watch）：
+# - 有 watchdog 时用文件系统通知，空闲时线程完全阻塞；没有则退化为轮询
+# - 轮询只 stat 目录本身，目录 mtime 变化时才 scandir，不做全量扫描
+# - 去抖：文件 (大小, mtime) 连续 settle_seconds 不变才算写完（同步中的半截文件不会被识别）
+# - 写完的文件攒成一批交给回调（通常是 folder_ingest.ingest_images）
+
+import os
+import time
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .folder_ingest import IMAGE_EXTENSIONS
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:  # 可选依赖
+    Observer = None
+    FileSystemEventHandler = object
+    WATCHDOG_AVAILABLE = False
+
+
+def _is_image_name(name: str) -> bool:
+    return name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith('.')
+
+
+class _WatchdogHandler(FileSystemEventHandler):
+    def __init__(self, watcher: "FolderWatcher"):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.dest_path)
+
+
+class FolderWatcher:
+    """
+    监听 img_dir 下新增/变化的图片，写完后按批回调 on_batch(paths)
+    - use_watchdog: None=自动（装了就用），False=强制轮询
+    - 回调在监听线程里同步执行；执行期间到达的文件会攒到下一批
+    """
+
+    def __init__(
+        self,
+        img_dir: str,
+        on_batch: Callable[[List[str]], None],
+        settle_seconds: float = 2.0,
+        poll_interval: float = 2.0,
+        batch_size: int = 32,
+        use_watchdog: Optional[bool] = None,
+    ):
+        self.img_dir = img_dir
+        self.on_batch = on_batch
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.batch_size = max(1, int(batch_size))
+        self.use_watchdog = WATCHDOG_AVAILABLE if use_watchdog is None else (use_watchdog and WATCHDOG_AVAILABLE)
+
+        # 已交给回调的文件 -> (size, mtime_ns)；只随目录内文件数增长
+        self._known: Dict[str, Tuple[int, int]] = {}
+        # 待去抖的文件 -> (size, mtime_ns, 最近一次变化的时间)
+        self._pending: Dict[str, Tuple[int, int, float]] = {}
+        self._dirty: set = set()
+        self._dir_mtime_ns: Optional[int] = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._observer = None
+
+    # ---------------- 事件入口 ----------------
+    def notify(self, path: str):
+        """文件系统事件回调（watchdog 线程）：只记下路径并唤醒主循环"""
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.img_dir):
+            return
+        if not _is_image_name(os.path.basename(path)):
+            return
+        with self._lock:
+            self._dirty.add(path)
+        self._wakeup.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    # ---------------- 扫描与去抖 ----------------
+    def _scan_dir_if_changed(self, force: bool = False):
+        """轮询模式：目录 mtime 没变就不 scandir（新增/改名都会更新目录 mtime）"""
+        try:
+            st = os.stat(self.img_dir)
+        except OSError:
+            return
+        # mtime 精度可能只有 1 秒：刚变化过的目录多扫一次，避免同一秒内的第二个文件被漏掉
+        recently_changed = time.time() - st.st_mtime < max(self.settle_seconds, 1.0) + 1.0
+        if not force and st.st_mtime_ns == self._dir_mtime_ns and not recently_changed:
+            return
+        self._dir_mtime_ns = st.st_mtime_ns
+        try:
+            entries = list(os.scandir(self.img_dir))
+        except OSError:
+            return
+        with self._lock:
+            for entry in entries:
+                if _is_image_name(entry.name):
+                    self._dirty.add(entry.path)
+
+    def _refresh_pending(self, now: float):
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        for path in dirty:
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._pending.pop(path, None)
+                continue
+            sig = (st.st_size, st.st_mtime_ns)
+            if self._known.get(path) == sig:
+                continue
+            prev = self._pending.get(path)
+            if prev is None or (prev[0], prev[1]) != sig:
+                self._pending[path] = (sig[0], sig[1], now)
+
+        # 已登记的文件再 stat 一次，仍在变化的重新计时
+        for path, (size, mtime_ns, changed_at) in list(self._pending.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._pending.pop(path, None)
+                continue
+            if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                self._pending[path] = (st.st_size, st.st_mtime_ns, now)
+
+    def _take_ready(self, now: float) -> List[str]:
+        ready = []
+        for path, (size, mtime_ns, changed_at) in list(self._pending.items()):
+            if size > 0 and now - changed_at >= self.settle_seconds:
+                ready.append(path)
+                self._known[path] = (size, mtime_ns)
+                del self._pending[path]
+        return sorted(ready)
+
+    # ---------------- 主循环 ----------------
+    def run(self):
+        """阻塞运行直到 stop()；启动时先处理目录里已有的文件"""
+        if self.use_watchdog:
+            self._observer = Observer()
+            self._observer.schedule(_WatchdogHandler(self), self.img_dir, recursive=False)
+            self._observer.start()
+        try:
+            self._scan_dir_if_changed(force=True)
+            while not self._stop.is_set():
+                # 先清标志再处理：处理期间到达的事件会让下面的 wait 立即返回
+                self._wakeup.clear()
+                now = time.time()
+                if not self.use_watchdog:
+                    self._scan_dir_if_changed()
+                self._refresh_pending(now)
+
+                ready = self._take_ready(now)
+                for start in range(0, len(ready), self.batch_size):
+                    if self._stop.is_set():
+                        break
+                    try:
+                        self.on_batch(ready[start:start + self.batch_size])
+                    except Exception as e:
+                        print(f"❌ 处理批次失败: {e}")
+
+                # 有待去抖的文件时按 settle 间隔醒来；否则通知模式无限期阻塞，轮询模式按 poll_interval
+                if self._pending:
+                    timeout = min(self.settle_seconds, self.poll_interval) if not self.use_watchdog else self.settle_seconds
+                elif self.use_watchdog:
+                    timeout = None
+                else:
+                    timeout = self.poll_interval
+                self._wakeup.wait(timeout)
+        finally:
+            if self._observer is not None:
+                self._observer.stop()
+                self._observer.join()
+                self._observer = None
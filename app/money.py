@@ -0,0 +1,40 @@
+# money.py
+# 金额一律以“分”（整数）存储、求和、比较；只在 API / 导出边界和“元”互转
+# - to_cents: 元 -> 分，按十进制四舍五入（浮点输入先转成最短十进制串，0.1 + 0.2 不会变成 30.000000000000004 分）
+# - from_cents: 分 -> 元（JSON 数值）
+# - format_cents: 分 -> "12.34"（CSV / Excel / 命令行输出，不经过浮点）
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any, Optional
+
+_HUNDRED = Decimal(100)
+
+
+def to_cents(value: Any) -> int:
+    """元（数字或字符串）转成整数分；None / 空串为 0，无法解析时抛 ValueError"""
+    if value is None or value == "":
+        return 0
+    if isinstance(value, bool):
+        raise ValueError(f"无效金额: {value!r}")
+    if isinstance(value, int):
+        return value * 100
+    try:
+        amount = Decimal(str(value).strip().replace(",", ""))
+    except InvalidOperation:
+        raise ValueError(f"无效金额: {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"无效金额: {value!r}")
+    return int((amount * _HUNDRED).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents: Optional[int]) -> float:
+    """整数分转成元（int / 100 是最接近的浮点数，序列化后正好是两位小数）"""
+    return (cents or 0) / 100
+
+
+def format_cents(cents: Optional[int]) -> str:
+    """整数分格式化成 "-12.34" 形式的字符串"""
+    cents = int(cents or 0)
+    sign = "-" if cents < 0 else ""
+    yuan, fen = divmod(abs(cents), 100)
+    return f"{sign}{yuan}.{fen:02d}"
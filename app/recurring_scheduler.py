@@ -0,0 +1,163 @@
+# recurring_scheduler.py
+# 周期性账单调度：
+# - 不再在每个 GET 里生成账单：后台线程在跨天时为所有账本补齐到期账单，规则新建/修改后立即再跑一次
+# - 读接口只查内存里的 "账本 -> 已补齐到哪天" 标记，当天已补齐就直接返回（不碰数据库）
+# - 读到未补齐的账本时 ensure_fresh() 只唤醒后台线程（线程没启动就顺手启动），请求本身不等生成，先返回现有数据
+# - 也可以不启线程，用 recurring_tick.py 由 cron / 计划任务每天跑一次
+
+import datetime
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+import config
+
+
+class RecurringScheduler:
+    """按天为各账本生成到期的周期性账单，db 为 EnhancedDatabaseManager"""
+
+    def __init__(
+        self,
+        db,
+        rollover_delay_seconds: float = config.RECURRING_ROLLOVER_DELAY_SECONDS,
+        retry_seconds: float = config.RECURRING_RETRY_SECONDS,
+        autostart: bool = config.RECURRING_SCHEDULER_ENABLED,
+    ):
+        self.db = db
+        self.rollover_delay = max(0.0, rollover_delay_seconds)
+        self.retry_seconds = max(1.0, retry_seconds)
+        self.autostart = autostart
+        # 账本 -> 已补齐到的日期（YYYY-MM-DD）；跨天后自然失效
+        self._fresh: Dict[int, str] = {}
+        # mark_stale() 的次数；生成期间有变化时不记 "已补齐"，交给下一轮
+        self._stale_epoch = 0
+        self._state_lock = threading.Lock()    # 保护 _fresh / _stale_epoch 的读改写
+        self._lock = threading.Lock()          # 同一时刻只有一个线程在生成
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self.last_run_at: Optional[float] = None
+        self.last_created = 0
+        self.last_error: Optional[str] = None
+        self.next_run_at: Optional[float] = None
+
+    # ---------------- 读路径 ----------------
+    def is_fresh(self, ledger_id: int) -> bool:
+        return self._fresh.get(ledger_id) == datetime.date.today().strftime("%Y-%m-%d")
+
+    def is_running(self) -> bool:
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def ensure_fresh(self, ledger_id: Optional[int]):
+        """读接口调用：当天未补齐时唤醒后台线程去补，不在请求线程里生成（本次返回现有数据）"""
+        if ledger_id is None:
+            ledger_id = self.db.get_default_ledger_id()
+        if self.is_fresh(ledger_id):
+            return
+        if not self.is_running():
+            if not self.autostart or self._stop.is_set():
+                # 调度关闭（改由 recurring_tick.py 定时补齐）或已经 stop()
+                return
+            self.start()
+        elif self.last_error and self.last_run_at and time.time() - self.last_run_at < self.retry_seconds:
+            # 上次失败还在重试间隔内：别让每个读请求都把线程叫起来重跑
+            return
+        self._wakeup.set()
+
+    def mark_stale(self, ledger_id: Optional[int] = None):
+        """规则新建/修改、账本恢复后调用：清掉标记并唤醒后台线程（None 表示全部账本）"""
+        with self._state_lock:
+            self._stale_epoch += 1
+            if ledger_id is None:
+                self._fresh.clear()
+            else:
+                self._fresh.pop(ledger_id, None)
+        self._wakeup.set()
+
+    # ---------------- 生成 ----------------
+    def run_once(self, ledger_ids: Optional[Iterable[int]] = None) -> int:
+        """为指定账本（默认所有未补齐的账本）生成到期账单，返回新增条数"""
+        with self._lock:
+            today = datetime.date.today().strftime("%Y-%m-%d")
+            if ledger_ids is None:
+                ledger_ids = [ledger["id"] for ledger in self.db.list_ledgers()]
+            created = 0
+            error = None
+            for ledger_id in ledger_ids:
+                # 等锁期间别的线程可能已经补过
+                if self._fresh.get(ledger_id) == today:
+                    continue
+                with self._state_lock:
+                    epoch = self._stale_epoch
+                try:
+                    created += self.db.generate_recurring_bills(ledger_id, upto_date=today)
+                except Exception as e:
+                    error = f"账本 {ledger_id}: {e}"
+                    print(f"⚠️ [Recurring] 生成失败 {error}")
+                    continue
+                # 比对和写入在同一把锁里：其间到达的 mark_stale() 不会被这次覆盖掉
+                with self._state_lock:
+                    if epoch == self._stale_epoch:
+                        self._fresh[ledger_id] = today
+            self.last_run_at = time.time()
+            self.last_created = created
+            self.last_error = error
+            if created:
+                print(f"🔁 [Recurring] 生成周期性账单 {created} 条")
+            return created
+
+    # ---------------- 后台线程 ----------------
+    def _seconds_until_next_run(self) -> float:
+        if self.last_error:
+            return self.retry_seconds
+        now = datetime.datetime.now()
+        tomorrow = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+        return (tomorrow - now).total_seconds() + self.rollover_delay
+
+    def _loop(self):
+        while not self._stop.is_set():
+            # 先清再干活：干活期间的 mark_stale()/ensure_fresh() 会让下面的 wait 立即返回，不会丢
+            self._wakeup.clear()
+            try:
+                self.run_once()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"⚠️ [Recurring] 调度失败: {e}")
+            timeout = self._seconds_until_next_run()
+            self.next_run_at = time.time() + timeout
+            self._wakeup.wait(timeout)
+        self.next_run_at = None
+
+    def start(self):
+        with self._thread_lock:
+            if self.is_running():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="recurring_scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        with self._thread_lock:
+            thread, self._thread = self._thread, None
+            self._stop.set()
+            self._wakeup.set()
+        if thread is not None:
+            thread.join(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        def fmt(ts: Optional[float]) -> Optional[str]:
+            return datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S") if ts else None
+
+        today = datetime.date.today().strftime("%Y-%m-%d")
+        with self._state_lock:
+            fresh = sorted(lid for lid, day in self._fresh.items() if day == today)
+        return {
+            "running": self.is_running(),
+            "last_run_at": fmt(self.last_run_at),
+            "next_run_at": fmt(self.next_run_at),
+            "last_created": self.last_created,
+            "last_error": self.last_error,
+            "fresh_ledgers": fresh,
+        }
@@ -0,0 +1,81 @@
+# result_cache.py
+# 读接口的结果缓存：
+# - 键是 (接口, 规范化后的查询参数, 数据版本)，值是序列化好的 JSON 响应体
+# - 数据版本来自 EnhancedDatabaseManager.data_version()，每次写入提交后递增（别的进程写库时由库里的
+#   write_counter 发现，所有账本一起递增）；版本一变旧条目不会再命中，留在缓存里等 LRU 挤掉
+# - 每个键对应一个 ETag（带进程启动时生成的随机前缀，重启后旧 ETag 不会误判为未修改），
+#   客户端带 If-None-Match 回来且版本没变时直接 304，不跑查询；取版本也只是读内存，
+#   别的进程的写入每隔 DB_EXTERNAL_WRITE_CHECK_MS 才读一次 write_counter 来发现
+
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+import config
+
+
+class ResultCache:
+    """按条目数和字节数限制的 LRU 响应体缓存"""
+
+    def __init__(
+        self,
+        max_entries: int = config.RESULT_CACHE_MAX_ENTRIES,
+        max_bytes: int = config.RESULT_CACHE_MAX_MB * 1024 * 1024,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(0, max_bytes)
+        self._entries: "OrderedDict[Tuple[Any, ...], bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._epoch = uuid.uuid4().hex[:8]
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(endpoint: str, params, version: Any) -> Tuple[Any, ...]:
+        """params 为 (名, 值) 对；按名排序，同名多值保留顺序"""
+        normalized = tuple(sorted((str(k), str(v)) for k, v in params))
+        return (endpoint, normalized, version)
+
+    def etag(self, key: Tuple[Any, ...]) -> str:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:20]
+        return f'W/"{self._epoch}-{digest}"'
+
+    def get(self, key: Tuple[Any, ...]) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: Tuple[Any, ...], body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = body
+            self._bytes += len(body)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,81 @@
+# single_flight.py
+# 相同查询的并发合并（single-flight）：
+# - 同一个键同时只算一次：第一个调用者（leader）在自己的线程里执行，之后到达的调用者等它的结果
+# - leader 抛异常时，等待者收到同一个异常；等待超过 timeout 的调用者收到 SingleFlightTimeout
+#   （leader 不受影响，继续算完）
+# - 算完立即从表里移除，之后的调用者重新发起（结果复用交给 ResultCache 按数据版本去做）
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import config
+
+
+class SingleFlightTimeout(TimeoutError):
+    """等待同键的进行中查询超时"""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """按键合并并发调用；do() 返回 (结果, 是否复用了别人的结果)"""
+
+    def __init__(self, timeout: float = config.SINGLE_FLIGHT_TIMEOUT_SECONDS):
+        self.timeout = timeout
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+        self.timeouts = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                call.waiters += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    if self._calls.get(key) is call:
+                        del self._calls[key]
+                call.done.set()
+            return call.result, False
+
+        if not call.done.wait(self.timeout if timeout is None else timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise SingleFlightTimeout(f"等待进行中的查询超时: {key!r}")
+        if call.error is not None:
+            raise call.error
+        with self._lock:
+            self.shared += 1
+        return call.result, True
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executed": self.executed,
+                "shared": self.shared,
+                "timeouts": self.timeouts,
+            }
@@ -0,0 +1,214 @@
+# statement_import.py
+# 支付宝 / 微信 账单 CSV 批量导入：
+# - 自动识别编码（UTF-8 / UTF-8 BOM / GBK 系）和账单来源
+# - 跳过导出文件头部的说明行，按表头做列映射
+# - 逐行流式解析，只导入“支出”且未关闭/未全额退款的交易
+# - 复用分类规则，按交易号去重后分块批量写入 bills
+
+import re
+import csv
+import codecs
+import datetime
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from .bill_parser import _normalize_category_rules, _match_category
+from .enhanced_storage import EnhancedBill
+from .money import to_cents
+
+
+# 每种来源：用于识别表头的必备列 + 字段到候选列名的映射
+STATEMENT_FORMATS: Dict[str, Dict[str, Any]] = {
+    "wechat": {
+        "signature": ["交易时间", "交易类型", "交易对方", "当前状态"],
+        "columns": {
+            "txn_id": ["交易单号"],
+            "time": ["交易时间"],
+            "counterparty": ["交易对方"],
+            "item": ["商品"],
+            "direction": ["收/支"],
+            "amount": ["金额(元)", "金额（元）", "金额"],
+            "status": ["当前状态"],
+            "txn_type": ["交易类型"],
+        },
+    },
+    "alipay": {
+        "signature": ["交易对方", "收/支", "交易状态"],
+        "columns": {
+            "txn_id": ["交易订单号", "交易号"],
+            "time": ["交易时间", "交易创建时间", "付款时间"],
+            "counterparty": ["交易对方"],
+            "item": ["商品说明", "商品名称"],
+            "direction": ["收/支"],
+            "amount": ["金额", "金额（元）", "金额(元)"],
+            "status": ["交易状态"],
+            "txn_type": ["交易分类", "类型"],
+        },
+    },
+}
+
+_SKIP_STATUS = ("关闭", "失败", "全额退款", "已退款")
+_DATE_PARTS_RE = re.compile(r"(\d{4})[-/.年](\d{1,2})[-/.月](\d{1,2})")
+_HEADER_SCAN_LIMIT = 64  # 表头一定在前几十行内
+
+
+@dataclass
+class StatementRow:
+    source: str
+    txn_id: str
+    bill_date: str
+    merchant: str
+    counterparty: str
+    amount_cents: int
+    txn_type: str = ""
+
+
+def detect_encoding(path: str, sample_size: int = 64 * 1024) -> str:
+    """根据文件头部样本猜测编码：BOM -> utf-8-sig；能按 UTF-8 解码 -> utf-8；否则 gb18030"""
+    with open(path, "rb") as f:
+        head = f.read(sample_size)
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # final=False：样本截断在多字节字符中间时不算错误
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "gb18030"
+
+
+def _clean_cell(value: Any) -> str:
+    return str(value or "").replace("\t", "").strip()
+
+
+def _detect_source(header: List[str]) -> Optional[str]:
+    cells = set(header)
+    for source, fmt in STATEMENT_FORMATS.items():
+        if all(col in cells for col in fmt["signature"]):
+            return source
+    return None
+
+
+def _map_columns(header: List[str], source: str) -> Dict[str, int]:
+    mapping: Dict[str, int] = {}
+    for field, candidates in STATEMENT_FORMATS[source]["columns"].items():
+        for name in candidates:
+            if name in header:
+                mapping[field] = header.index(name)
+                break
+    missing = [f for f in ("txn_id", "time", "amount", "direction") if f not in mapping]
+    if missing:
+        raise ValueError(f"账单缺少必要列: {', '.join(missing)}")
+    return mapping
+
+
+def _parse_amount(text: str) -> Optional[int]:
+    """"¥1,234.50" -> 123450（分，直接按十进制解析，不经过浮点）"""
+    text = text.replace("¥", "").replace("￥", "").replace(",", "").strip()
+    try:
+        return abs(to_cents(text))
+    except ValueError:
+        return None
+
+
+def _parse_date(text: str) -> Optional[str]:
+    m = _DATE_PARTS_RE.search(text)
+    if not m:
+        return None
+    try:
+        return datetime.date(int(m.group(1)), int(m.group(2)), int(m.group(3))).strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def iter_statement_rows(path: str, source: str = "auto", encoding: Optional[str] = None,
+                        stats: Optional[Dict[str, int]] = None) -> Iterator[StatementRow]:
+    """
+    流式读取账单 CSV，逐条产出支出记录
+    - source: auto / alipay / wechat
+    - stats: 可选，累计 skipped（收入、关闭、无法解析的行）
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault("skipped", 0)
+    encoding = encoding or detect_encoding(path)
+
+    with open(path, "r", encoding=encoding, errors="replace", newline="") as f:
+        reader = csv.reader(f)
+
+        mapping = None
+        for line_no, row in enumerate(reader):
+            header = [_clean_cell(c) for c in row]
+            detected = _detect_source(header)
+            if detected and (source == "auto" or source == detected):
+                source = detected
+                mapping = _map_columns(header, source)
+                break
+            if line_no >= _HEADER_SCAN_LIMIT:
+                break
+        if mapping is None:
+            raise ValueError("无法识别账单格式（仅支持支付宝 / 微信导出的 CSV）")
+
+        def cell(cells: List[str], field: str) -> str:
+            idx = mapping.get(field)
+            return cells[idx] if idx is not None and idx < len(cells) else ""
+
+        for row in reader:
+            cells = [_clean_cell(c) for c in row]
+            if len(cells) <= mapping["amount"]:
+                continue  # 尾部说明行 / 空行
+            direction = cell(cells, "direction")
+            status = cell(cells, "status")
+            amount = _parse_amount(cell(cells, "amount"))
+            bill_date = _parse_date(cell(cells, "time"))
+            txn_id = cell(cells, "txn_id")
+            if (direction != "支出" or any(k in status for k in _SKIP_STATUS)
+                    or amount is None or not bill_date or not txn_id):
+                stats["skipped"] += 1
+                continue
+
+            counterparty = cell(cells, "counterparty")
+            item = cell(cells, "item")
+            merchant = item if item and item not in ("/", "-") else counterparty
+            yield StatementRow(
+                source=source,
+                txn_id=txn_id,
+                bill_date=bill_date,
+                merchant=merchant or "未知商品",
+                counterparty=counterparty,
+                amount_cents=amount,
+                txn_type=cell(cells, "txn_type"),
+            )
+
+
+def rows_to_bills(rows: Iterator[StatementRow], category_rules: List[Any], filename: str = "",
+                  ledger_id: Optional[int] = None) -> Iterator[EnhancedBill]:
+    """把账单行转换成 EnhancedBill，分类沿用 OCR 的关键词规则"""
+    rules = _normalize_category_rules(category_rules)
+    for row in rows:
+        category = _match_category(rules, [row.merchant, row.counterparty, row.txn_type])
+        yield EnhancedBill(
+            ledger_id=ledger_id,
+            filename=filename,
+            merchant=row.merchant,
+            amount_cents=row.amount_cents,
+            category=category,
+            bill_date=row.bill_date,
+            raw_text=[x for x in (row.counterparty, row.merchant, row.txn_type) if x],
+            is_manual=False,
+            external_id=f"{row.source}:{row.txn_id}",
+        )
+
+
+def import_statement(db, path: str, ledger_id: Optional[int] = None, source: str = "auto",
+                     filename: str = "", chunk_size: int = 1000) -> Dict[str, Any]:
+    """导入一个账单文件到 EnhancedDatabaseManager，返回统计信息"""
+    if ledger_id is None:
+        ledger_id = db.get_default_ledger_id()
+    stats: Dict[str, Any] = {"skipped": 0}
+    rows = iter_statement_rows(path, source=source, stats=stats)
+    bills = rows_to_bills(rows, db.get_category_rules(ledger_id), filename=filename, ledger_id=ledger_id)
+    result = db.import_bills(bills, ledger_id=ledger_id, chunk_size=chunk_size)
+    result["skipped"] = stats["skipped"]
+    result["ledger_id"] = ledger_id
+    return result
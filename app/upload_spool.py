@@ -0,0 +1,344 @@
+# upload_spool.py
+# 上传落盘（spool）：
+# - 按块流式写入 spool 目录，边写边算 sha1，不把整张图读进内存
+# - 单文件 / 单批次大小限制
+# - 可续传的分块上传会话：客户端按 offset 追加，断线后查询已收字节数继续传
+
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, List, Optional, Set, Tuple
+
+import config
+
+
+class UploadTooLarge(ValueError):
+    """超过单文件或单批次大小限制"""
+
+
+class UploadOffsetMismatch(ValueError):
+    """分块 offset 与服务端已收字节数不一致（客户端应按返回的 size 续传）"""
+
+    def __init__(self, expected: int):
+        super().__init__(f"offset 不匹配，服务端已接收 {expected} 字节")
+        self.expected = expected
+
+
+@dataclass
+class SpooledFile:
+    path: str
+    filename: str
+    size: int
+    sha1: str
+
+
+class _SessionState:
+    """分块会话的内存记账：已收字节数按写入累加，不再每块列一次目录"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.limits: Dict[str, int] = {}
+        self.received: Dict[str, int] = {}
+        self.total = 0
+        self.writing: Set[str] = set()
+        # file_id -> (已哈希字节数, hashlib 对象)；只是加速，丢失后 finalize 时重算
+        self.hashers: Dict[str, Tuple[int, "hashlib._Hash"]] = {}
+
+
+_SAFE_ID_CHARS = set("0123456789abcdefABCDEF-")
+
+
+def _check_id(value: str) -> str:
+    value = str(value or "")
+    if not value or len(value) > 64 or any(ch not in _SAFE_ID_CHARS for ch in value):
+        raise ValueError("无效的上传 ID")
+    return value
+
+
+class UploadSpool:
+    """上传 spool 目录管理（线程安全；分块会话的状态落盘，进程重启后仍可续传）"""
+
+    def __init__(
+        self,
+        spool_dir: str = config.UPLOAD_SPOOL_DIR,
+        max_file_size: int = config.UPLOAD_MAX_FILE_SIZE,
+        max_session_size: int = config.UPLOAD_MAX_SESSION_SIZE,
+        chunk_size: int = config.UPLOAD_CHUNK_SIZE,
+        session_ttl: int = 24 * 3600,
+    ):
+        self.spool_dir = spool_dir
+        self.max_file_size = max_file_size
+        self.max_session_size = max_session_size
+        self.chunk_size = chunk_size
+        self.session_ttl = session_ttl
+        # 只保护 _sessions 表本身；各会话的记账用各自的锁
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, _SessionState] = {}
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+    # ---------------- 一次性 multipart 上传 ----------------
+    def spool_stream(self, stream: BinaryIO, filename: str, batch_remaining: Optional[int] = None,
+                     max_size: Optional[int] = None) -> SpooledFile:
+        """把一个上传流按块写入 spool 目录；超过限制时删除半成品并抛 UploadTooLarge"""
+        limit = max_size or self.max_file_size
+        if batch_remaining is not None:
+            limit = min(limit, batch_remaining)
+
+        path = os.path.join(self.spool_dir, f"{uuid.uuid4().hex}_{filename}")
+        hasher = hashlib.sha1()
+        size = 0
+        try:
+            with open(path, "wb") as fp:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > limit:
+                        raise UploadTooLarge(self._limit_message(limit))
+                    hasher.update(chunk)
+                    fp.write(chunk)
+        except BaseException:
+            self.discard(path)
+            raise
+        return SpooledFile(path=path, filename=filename, size=size, sha1=hasher.hexdigest())
+
+    def discard(self, path: str):
+        try:
+            if path and os.path.exists(path):
+                os.remove(path)
+        except OSError:
+            pass
+
+    def _limit_message(self, limit: int) -> str:
+        return f"文件过大，最大允许 {limit // (1024 * 1024)}MB"
+
+    # ---------------- 可续传分块上传 ----------------
+    def _session_dir(self, session_id: str) -> str:
+        return os.path.join(self.spool_dir, f"session_{_check_id(session_id)}")
+
+    def _manifest_path(self, session_id: str) -> str:
+        return os.path.join(self._session_dir(session_id), "manifest.json")
+
+    def _load_manifest(self, session_id: str) -> Dict:
+        path = self._manifest_path(session_id)
+        if not os.path.exists(path):
+            raise KeyError(session_id)
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_manifest(self, session_id: str, manifest: Dict):
+        path = self._manifest_path(session_id)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _state(self, session_id: str) -> _SessionState:
+        """会话的内存状态；进程重启后第一次访问时按 manifest 和磁盘文件大小重建"""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                manifest = self._load_manifest(session_id)
+                state = _SessionState()
+                for file_id, info in manifest["files"].items():
+                    path = self._file_path(session_id, file_id)
+                    state.limits[file_id] = info.get("max_size") or self.max_file_size
+                    state.received[file_id] = os.path.getsize(path) if os.path.exists(path) else 0
+                state.total = sum(state.received.values())
+                self._sessions[session_id] = state
+            return state
+
+    def create_session(self, meta: Optional[Dict] = None) -> str:
+        self.expire_sessions()
+        session_id = uuid.uuid4().hex
+        os.makedirs(self._session_dir(session_id), exist_ok=True)
+        self._save_manifest(session_id, {
+            "created_at": time.time(),
+            "meta": meta or {},
+            "files": {},
+        })
+        return session_id
+
+    def add_file(self, session_id: str, filename: str, total_size: Optional[int] = None,
+                 max_size: Optional[int] = None) -> str:
+        """登记一个待上传文件；max_size 可覆盖单文件上限（如 ZIP 压缩包）"""
+        limit = max_size or self.max_file_size
+        if total_size is not None and total_size > limit:
+            raise UploadTooLarge(self._limit_message(limit))
+        state = self._state(session_id)
+        with state.lock:
+            manifest = self._load_manifest(session_id)
+            file_id = uuid.uuid4().hex
+            manifest["files"][file_id] = {
+                "filename": filename,
+                "total_size": total_size,
+                "max_size": limit,
+                "complete": False,
+            }
+            self._save_manifest(session_id, manifest)
+            open(self._file_path(session_id, file_id), "wb").close()
+            state.limits[file_id] = limit
+            state.received[file_id] = 0
+        return file_id
+
+    def _file_path(self, session_id: str, file_id: str) -> str:
+        return os.path.join(self._session_dir(session_id), _check_id(file_id))
+
+    def received_size(self, session_id: str, file_id: str) -> int:
+        state = self._state(session_id)
+        with state.lock:
+            if file_id not in state.received:
+                raise KeyError(file_id)
+            return state.received[file_id]
+
+    def session_size(self, session_id: str) -> int:
+        state = self._state(session_id)
+        with state.lock:
+            return state.total
+
+    def append_chunk(self, session_id: str, file_id: str, offset: int, stream: BinaryIO) -> int:
+        """在 offset 处追加一块数据，返回该文件已接收的总字节数
+
+        会话锁只保护 offset 校验和字节数记账，请求体的读取和写盘在锁外进行；
+        同一文件同时只允许一个写入者，其余请求按 offset 不匹配处理
+        """
+        state = self._state(session_id)
+        with state.lock:
+            if file_id not in state.limits:
+                raise KeyError(file_id)
+            current = state.received[file_id]
+            if offset != current or file_id in state.writing:
+                raise UploadOffsetMismatch(current)
+            state.writing.add(file_id)
+            file_limit = state.limits[file_id]
+            hashed, hasher = state.hashers.pop(file_id, (0, None))
+        if hasher is None or hashed != current:
+            # 从头开始的文件才能增量哈希；中途丢失状态的留到 finalize 时重算
+            hasher = hashlib.sha1() if current == 0 else None
+
+        path = self._file_path(session_id, file_id)
+        reserved = written = 0
+        completed = False
+        try:
+            with open(path, "ab") as fp:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    # 先在会话总量里预留，多个文件并发上传时也不会一起冲破会话上限
+                    with state.lock:
+                        state.total += len(chunk)
+                        reserved += len(chunk)
+                        over_session = state.total > self.max_session_size
+                    if current + reserved > file_limit or over_session:
+                        fp.truncate(current)
+                        written = 0
+                        limit = file_limit if current + reserved > file_limit else self.max_session_size
+                        raise UploadTooLarge(self._limit_message(limit))
+                    if hasher is not None:
+                        hasher.update(chunk)
+                    fp.write(chunk)
+                    written += len(chunk)
+            completed = True
+        finally:
+            # 中途断开时以磁盘上实际写入的长度为准，客户端按它续传
+            size = current + written if completed else os.path.getsize(path)
+            with state.lock:
+                state.total += (size - current) - reserved
+                state.received[file_id] = size
+                state.writing.discard(file_id)
+                if completed and hasher is not None:
+                    state.hashers[file_id] = (size, hasher)
+        return size
+
+    def finalize_session(self, session_id: str) -> List[SpooledFile]:
+        """返回会话内所有已上传文件（sha1 优先复用增量哈希，否则流式重算）"""
+        state = self._state(session_id)
+        with state.lock:
+            if state.writing:
+                raise ValueError("仍有文件正在上传")
+            manifest = self._load_manifest(session_id)
+            out: List[SpooledFile] = []
+            for file_id, info in manifest["files"].items():
+                path = self._file_path(session_id, file_id)
+                if not os.path.exists(path):
+                    continue
+                size = state.received.get(file_id, 0)
+                total = info.get("total_size")
+                if total is not None and size != total:
+                    raise ValueError(f"文件 {info.get('filename')} 未上传完成 ({size}/{total})")
+                hashed, hasher = state.hashers.pop(file_id, (0, None))
+                if hasher is None or hashed != size:
+                    hasher = hashlib.sha1()
+                    with open(path, "rb") as fp:
+                        for chunk in iter(lambda: fp.read(self.chunk_size), b""):
+                            hasher.update(chunk)
+                info["complete"] = True
+                out.append(SpooledFile(path=path, filename=info.get("filename") or file_id,
+                                       size=size, sha1=hasher.hexdigest()))
+            self._save_manifest(session_id, manifest)
+            return out
+
+    def session_status(self, session_id: str) -> Dict:
+        manifest = self._load_manifest(session_id)
+        state = self._state(session_id)
+        with state.lock:
+            received = dict(state.received)
+        files = []
+        for file_id, info in manifest["files"].items():
+            files.append({
+                "file_id": file_id,
+                "filename": info.get("filename"),
+                "total_size": info.get("total_size"),
+                "received": received.get(file_id, 0),
+            })
+        return {"upload_id": session_id, "meta": manifest.get("meta") or {}, "files": files}
+
+    def delete_session(self, session_id: str):
+        session_dir = self._session_dir(session_id)
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        shutil.rmtree(session_dir, ignore_errors=True)
+
+    @staticmethod
+    def _last_activity(session_dir: str) -> float:
+        """会话最后一次写入的时间：追加分块只改分块文件的 mtime，不改目录的，所以取其中最新的"""
+        latest = os.path.getmtime(session_dir)
+        with os.scandir(session_dir) as it:
+            for entry in it:
+                try:
+                    latest = max(latest, entry.stat().st_mtime)
+                except OSError:
+                    pass
+        return latest
+
+    def expire_sessions(self):
+        """清理超过 session_ttl 没有写入的会话目录，以及进程崩溃后遗留的一次性上传文件"""
+        now = time.time()
+        try:
+            entries = list(os.scandir(self.spool_dir))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.name.startswith("session_") and entry.is_dir():
+                    session_id = entry.name[len("session_"):]
+                    with self._lock:
+                        state = self._sessions.get(session_id)
+                    if state is not None and state.writing:
+                        continue
+                    if now - self._last_activity(entry.path) > self.session_ttl:
+                        with self._lock:
+                            self._sessions.pop(session_id, None)
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                elif entry.is_file() and now - entry.stat().st_mtime > self.session_ttl:
+                    # spool_stream / ZIP 导入的临时文件正常都会在请求或任务结束时删掉
+                    os.remove(entry.path)
+            except OSError:
+                pass
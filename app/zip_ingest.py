@@ -0,0 +1,176 @@
+# zip_ingest.py
+# ZIP 相册批量导入：
+# - 不整包解压：按成员逐个流式写入 spool，处理完一批立即删除
+# - 按扩展名过滤，并限制单成员解压后大小（防 zip bomb）
+# - 后台线程执行，按成员汇报进度与识别结果
+
+import os
+import time
+import uuid
+import zipfile
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from werkzeug.utils import secure_filename
+
+from .upload_spool import UploadSpool, SpooledFile, UploadTooLarge
+
+
+def iter_image_members(zf: zipfile.ZipFile, allowed_extensions: Iterable[str]) -> List[zipfile.ZipInfo]:
+    """列出压缩包内的图片成员（跳过目录、macOS 资源叉和不支持的扩展名）"""
+    allowed = {e.lower() for e in allowed_extensions}
+    members = []
+    for info in zf.infolist():
+        if info.is_dir():
+            continue
+        base = os.path.basename(info.filename)
+        if not base or base.startswith("._") or "__MACOSX/" in info.filename:
+            continue
+        if "." not in base or base.rsplit(".", 1)[1].lower() not in allowed:
+            continue
+        members.append(info)
+    return members
+
+
+class ZipIngestJob:
+    """一次 ZIP 导入任务的状态（线程安全地读写进度）"""
+
+    def __init__(self, archive_path: str, bill_date: str, ledger_id: Optional[int] = None):
+        self.id = uuid.uuid4().hex
+        self.archive_path = archive_path
+        self.bill_date = bill_date
+        self.ledger_id = ledger_id
+        self.status = "pending"  # pending | running | done | failed
+        self.error: Optional[str] = None
+        self.members: List[Dict[str, Any]] = []
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _set_member(self, index: int, **fields):
+        with self._lock:
+            self.members[index].update(fields)
+
+    def to_dict(self, include_results: bool = True) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for m in self.members:
+                counts[m["status"]] = counts.get(m["status"], 0) + 1
+            members = [
+                m if include_results else {k: v for k, v in m.items() if k != "result"}
+                for m in self.members
+            ]
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "error": self.error,
+                "bill_date": self.bill_date,
+                "ledger_id": self.ledger_id,
+                "total": len(self.members),
+                "processed": counts.get("done", 0) + counts.get("error", 0),
+                "counts": counts,
+                "members": [dict(m) for m in members],
+            }
+
+    def run(
+        self,
+        spool: UploadSpool,
+        allowed_extensions: Iterable[str],
+        process_batch: Callable[[List[SpooledFile]], List[Dict[str, Any]]],
+        batch_size: int = 32,
+    ):
+        """
+        逐批解出成员 -> process_batch(识别) -> 删除 spool 文件
+        同时在磁盘/内存里的成员数不超过 batch_size
+        """
+        self.status = "running"
+        try:
+            with zipfile.ZipFile(self.archive_path) as zf:
+                infos = iter_image_members(zf, allowed_extensions)
+                with self._lock:
+                    self.members = [
+                        {"index": i, "name": info.filename, "size": info.file_size, "status": "queued",
+                         "result": None, "error": None}
+                        for i, info in enumerate(infos)
+                    ]
+
+                batch_size = max(1, int(batch_size))
+                for start in range(0, len(infos), batch_size):
+                    window = list(range(start, min(start + batch_size, len(infos))))
+                    spooled: List[SpooledFile] = []
+                    spooled_idx: List[int] = []
+                    try:
+                        for i in window:
+                            info = infos[i]
+                            if info.file_size > spool.max_file_size:
+                                self._set_member(i, status="error", error=str(UploadTooLarge(
+                                    spool._limit_message(spool.max_file_size))))
+                                continue
+                            name = secure_filename(os.path.basename(info.filename)) or f"member_{i}.jpg"
+                            try:
+                                with zf.open(info) as member_stream:
+                                    sf = spool.spool_stream(member_stream, name)
+                            except Exception as e:
+                                self._set_member(i, status="error", error=str(e))
+                                continue
+                            if not sf.size:
+                                spool.discard(sf.path)
+                                self._set_member(i, status="error", error="空文件")
+                                continue
+                            spooled.append(sf)
+                            spooled_idx.append(i)
+                            self._set_member(i, status="processing")
+
+                        if not spooled:
+                            continue
+                        try:
+                            results = process_batch(spooled)
+                        except Exception as e:
+                            for i in spooled_idx:
+                                self._set_member(i, status="error", error=str(e))
+                            continue
+                        for i, result in zip(spooled_idx, results):
+                            err = result.get("error") if isinstance(result, dict) else None
+                            self._set_member(i, status="error" if err else "done", result=result, error=err)
+                    finally:
+                        for sf in spooled:
+                            spool.discard(sf.path)
+            self.status = "done"
+        except zipfile.BadZipFile:
+            self.status = "failed"
+            self.error = "压缩包格式无效"
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+        finally:
+            self.finished_at = time.time()
+            spool.discard(self.archive_path)
+
+
+class ZipIngestRegistry:
+    """进程内任务表；已结束的任务保留 keep_seconds 供前端拉取结果"""
+
+    def __init__(self, keep_seconds: int = 3600):
+        self.keep_seconds = keep_seconds
+        self._jobs: Dict[str, ZipIngestJob] = {}
+        self._lock = threading.Lock()
+
+    def start(self, job: ZipIngestJob, target: Callable[[], None]) -> ZipIngestJob:
+        self._prune()
+        with self._lock:
+            self._jobs[job.id] = job
+        threading.Thread(target=target, name=f"zip_ingest_{job.id[:8]}", daemon=True).start()
+        return job
+
+    def get(self, job_id: str) -> Optional[ZipIngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        now = time.time()
+        with self._lock:
+            for job_id in [
+                jid for jid, job in self._jobs.items()
+                if job.finished_at is not None and now - job.finished_at > self.keep_seconds
+            ]:
+                self._jobs.pop(job_id, None)
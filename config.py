@@ -19,6 +19,62 @@ if not os.path.exists(OUTPUT_DIR):
 DB_PATH = os.path.join(OUTPUT_DIR, "ledger.db")
 EXCEL_PATH = os.path.join(OUTPUT_DIR, "我的记账本.xlsx")
 
+# 上传预览图缓存目录（按内容哈希命名，可长期缓存）
+PREVIEW_DIR = os.path.join(OUTPUT_DIR, "previews")
+# 预览图格式: "webp" 体积更小；环境不支持 WebP 时改成 "jpg"
+PREVIEW_FORMAT = "webp"
+
+# 上传落盘目录与大小限制（上传按块写入 spool，不整块读进内存）
+UPLOAD_SPOOL_DIR = os.path.join(OUTPUT_DIR, "uploads")
+UPLOAD_CHUNK_SIZE = 1024 * 1024                  # 流式读写块大小: 1MB
+UPLOAD_MAX_FILE_SIZE = 20 * 1024 * 1024          # 单张截图上限: 20MB
+UPLOAD_MAX_BATCH_SIZE = 256 * 1024 * 1024        # 单次 multipart 请求上限: 256MB
+UPLOAD_MAX_SESSION_SIZE = 4 * 1024 * 1024 * 1024  # 分块上传会话上限: 4GB
+UPLOAD_PARSE_BATCH = 32                          # 每批送入 parse_batch 的图片数
+UPLOAD_MAX_ARCHIVE_SIZE = 2 * 1024 * 1024 * 1024  # ZIP 相册导入上限: 2GB（建议走分块上传）
+
+# 目录批量入账 (run.py) 的检查点：记录已入账图片的内容哈希，重复运行只处理新截图
+INGEST_CHECKPOINT_PATH = os.path.join(OUTPUT_DIR, "ingest_checkpoint.json")
+
+# SQLite 连接参数（EnhancedDatabaseManager 每个线程复用一条 WAL 连接）
+DB_BUSY_TIMEOUT_MS = 5000              # 写锁被占用时最多等待 5 秒，而不是立刻 "database is locked"
+DB_SYNCHRONOUS = "NORMAL"              # WAL 下 NORMAL 已保证崩溃一致性，只在 checkpoint 时 fsync
+DB_CACHE_SIZE_KIB = 16 * 1024          # 每条连接的页缓存: 16MB
+DB_MMAP_SIZE = 256 * 1024 * 1024       # 内存映射读取: 256MB
+DB_STATEMENT_CACHE = 256               # 每条连接缓存的预编译语句数
+DB_MAX_IDLE_CONNECTIONS = 8            # 请求结束归还的空闲连接最多保留几条，多出的直接关闭
+DB_WRITE_BATCH_DELAY_MS = 2            # 写线程组提交：收到第一个写操作后最多再等 2ms 合并后续操作
+DB_WRITE_MAX_BATCH = 256               # 单个组提交事务最多包含的写操作数
+DB_EXTERNAL_WRITE_CHECK_MS = 500       # 别的进程的写入最多隔这么久才发现：期间 data_version 不读库里的 write_counter
+
+# 周期性账单调度（web_app 启动后台线程；也可用 recurring_tick.py 由 cron 每天跑）
+RECURRING_SCHEDULER_ENABLED = True
+RECURRING_ROLLOVER_DELAY_SECONDS = 5   # 跨天后稍等几秒再生成，避开午夜前后的时钟抖动
+RECURRING_RETRY_SECONDS = 300          # 生成失败后隔 5 分钟重试
+
+# 账本备份（删除账本时自动生成）：zlib 压缩的 JSON 行流，分块存进 ledger_backup_chunks
+BACKUP_CHUNK_BYTES = 256 * 1024        # 每个压缩块约 256KB
+BACKUP_BATCH_ROWS = 500                # 备份读取 / 恢复写入每批行数
+BACKUP_COMPRESS_LEVEL = 6
+
+# 统计接口的列式内存缓存（需要 numpy；没装时自动走 SQL）
+ANALYTICS_CACHE_ENABLED = True
+ANALYTICS_CACHE_MAX_MB = 256           # 所有账本的列数组合计上限，超出按 LRU 淘汰冷账本
+ANALYTICS_CACHE_MAX_LEDGERS = 16       # 最多同时缓存的账本数
+
+# 读接口结果缓存（分类 / 账本列表 / 统计 / 仪表盘）：按数据版本失效，支持 ETag / 304
+RESULT_CACHE_MAX_ENTRIES = 512
+RESULT_CACHE_MAX_MB = 32
+SINGLE_FLIGHT_TIMEOUT_SECONDS = 30     # 相同查询并发时，跟随者最多等 leader 多久（超时返回 504）
+
+# 整库在线快照（snapshot_db.py / POST /api/db-snapshots）：SQLite 备份 API 分步复制，不停服
+SNAPSHOT_DIR = os.path.join(OUTPUT_DIR, "snapshots")
+SNAPSHOT_COMPRESS = True               # gzip 压缩快照
+SNAPSHOT_GZIP_LEVEL = 6
+SNAPSHOT_KEEP = 7                      # 保留最近 7 份（<=0 不清理）
+SNAPSHOT_PAGES_PER_STEP = 1024         # 每步复制的页数（默认 4KB 页 => 每步约 4MB）
+SNAPSHOT_STEP_SLEEP_MS = 5             # 每步之间让出 I/O 的时间
+
 
 # === 2. 业务规则配置 (保持不变) ===
 # 定义商品关键词与分类的映射
@@ -0,0 +1,49 @@
+# import_statements.py
+# 批量导入支付宝 / 微信导出的账单 CSV：
+#   python import_statements.py 支付宝交易明细.csv 微信支付账单.csv --ledger-id 1
+import os
+import argparse
+import time
+
+import config  # 导入配置
+from app.enhanced_storage import EnhancedDatabaseManager
+from app.statement_import import import_statement, STATEMENT_FORMATS
+
+
+def main():
+    ap = argparse.ArgumentParser(description="导入支付宝 / 微信账单 CSV")
+    ap.add_argument("paths", nargs="+", help="账单 CSV 文件路径")
+    ap.add_argument("--source", default="auto", choices=["auto"] + sorted(STATEMENT_FORMATS),
+                    help="账单来源（默认自动识别）")
+    ap.add_argument("--ledger-id", type=int, default=None, help="目标账本 ID（默认第一个账本）")
+    ap.add_argument("--db", default=config.DB_PATH, help="数据库路径")
+    ap.add_argument("--chunk-size", type=int, default=1000, help="每个事务写入的条数")
+    args = ap.parse_args()
+
+    db = EnhancedDatabaseManager(args.db)
+    for path in args.paths:
+        if not os.path.exists(path):
+            print(f"❌ 找不到文件: {path}")
+            continue
+        start = time.perf_counter()
+        try:
+            stats = import_statement(
+                db, path,
+                ledger_id=args.ledger_id,
+                source=args.source,
+                filename=os.path.basename(path),
+                chunk_size=args.chunk_size,
+            )
+        except ValueError as e:
+            print(f"❌ {os.path.basename(path)}: {e}")
+            continue
+        elapsed = time.perf_counter() - start
+        print(
+            f"✅ {os.path.basename(path)}: 新增 {stats['inserted']} 笔, "
+            f"重复 {stats['duplicates']} 笔, 跳过 {stats['skipped']} 行 "
+            f"(账本 {stats['ledger_id']}, 耗时 {elapsed:.2f}s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# recurring_tick.py
+# 周期性账单单次补齐（给 cron / 计划任务用，不启动 Web 服务）：
+#   python recurring_tick.py                 # 所有账本补齐到今天
+#   python recurring_tick.py --ledger-id 1 --date 2026-12-31
+import argparse
+import time
+
+import config  # 导入配置
+from app.enhanced_storage import EnhancedDatabaseManager
+
+
+def main():
+    ap = argparse.ArgumentParser(description="生成到期的周期性账单")
+    ap.add_argument("--ledger-id", type=int, action="append", default=None,
+                    help="只处理指定账本（可重复；默认所有账本）")
+    ap.add_argument("--date", default=None, help="补齐到哪一天 YYYY-MM-DD（默认今天）")
+    ap.add_argument("--db", default=config.DB_PATH, help="数据库路径")
+    args = ap.parse_args()
+
+    db = EnhancedDatabaseManager(args.db)
+    try:
+        ledger_ids = args.ledger_id or [ledger["id"] for ledger in db.list_ledgers()]
+        start = time.perf_counter()
+        total = 0
+        for ledger_id in ledger_ids:
+            created = db.generate_recurring_bills(ledger_id, upto_date=args.date)
+            total += created
+            print(f"🔁 账本 {ledger_id}: 新增 {created} 笔")
+        print(f"✅ 共新增 {total} 笔周期性账单 (耗时 {time.perf_counter() - start:.2f}s)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
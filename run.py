@@ -1,58 +1,178 @@
 # run.py
 import os
+import sys
+import time
+import argparse
 import config  # 导入配置
 from app.bill_parser import BillParser
-from app.storage import ExcelSaver, DatabaseSaver
+from app.enhanced_storage import EnhancedDatabaseManager
+from app.folder_ingest import IngestCheckpoint, ingest_images, plan_ingest, scan_images
+from app.folder_watch import FolderWatcher
 from app.analytics import LedgerAnalytics
 
+
+class ProgressBar:
+    """终端进度条（不依赖第三方库）"""
+
+    def __init__(self, width: int = 30, stream=sys.stdout):
+        self.width = width
+        self.stream = stream
+        self.start = time.perf_counter()
+
+    def __call__(self, done: int, total: int, stats: dict):
+        ratio = done / total if total else 1.0
+        filled = int(self.width * ratio)
+        elapsed = time.perf_counter() - self.start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        self.stream.write(
+            f"\r   [{'#' * filled}{'.' * (self.width - filled)}] {done}/{total} "
+            f"新增 {stats['inserted']} 失败 {stats['failed']} ({rate:.1f} 张/秒)"
+        )
+        self.stream.flush()
+        if done >= total:
+            self.stream.write("\n")
+
+
+def build_parser(db, ledger_id):
+    templates_path = os.path.join(config.BASE_DIR, "templates.json")
+    return BillParser(
+        category_rules_loader=lambda: db.get_category_rules(ledger_id),
+        templates_path=templates_path if os.path.exists(templates_path) else None,
+    )
+
+
+def watch(args):
+    """常驻监听：新截图写完后批量识别入账，标记为待复核"""
+    if not os.path.isdir(args.dir):
+        print(f"❌ 错误：找不到图片目录 {args.dir}")
+        return
+
+    db = EnhancedDatabaseManager(args.db)
+    ledger_id = args.ledger_id or db.get_default_ledger_id()
+    checkpoint = IngestCheckpoint(args.checkpoint)
+    state = {"parser": None}
+
+    def on_batch(paths):
+        todo, _ = plan_ingest(paths, checkpoint)
+        if not todo:
+            checkpoint.save()
+            return
+        # 第一次有新图时才加载 OCR 模型
+        if state["parser"] is None:
+            state["parser"] = build_parser(db, ledger_id)
+        stats = ingest_images(
+            state["parser"], db, paths, checkpoint,
+            ledger_id=ledger_id,
+            bill_date=args.date,
+            batch_size=args.batch_size,
+            needs_review=True,
+        )
+        print(
+            f"📥 {time.strftime('%H:%M:%S')} 新增 {stats['inserted']} 笔待复核, "
+            f"重复 {stats['duplicates']} 笔, 失败 {stats['failed']} 张"
+        )
+
+    watcher = FolderWatcher(
+        args.dir,
+        on_batch,
+        settle_seconds=args.settle,
+        poll_interval=args.poll_interval,
+        batch_size=args.batch_size,
+        use_watchdog=False if args.no_watchdog else None,
+    )
+    mode = "文件系统通知" if watcher.use_watchdog else f"轮询 ({args.poll_interval}s)"
+    print(f"👀 正在监听 {args.dir} [{mode}]，Ctrl+C 退出")
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        print("\n👋 已停止监听")
+    finally:
+        watcher.stop()
+        if state["parser"] is not None:
+            state["parser"].shutdown()
+
+
 def main():
-    print(f"🚀 启动智图记账 (数据目录: {config.IMG_DIR})")
-
-    # 1. 初始化模块
-    parser = BillParser()
-    excel = ExcelSaver()
-    db = DatabaseSaver()
-    analytics = LedgerAnalytics()
-
-    # 2. 遍历 data/bills 目录下的所有图片
-    # 这样你只需要把新截图丢进文件夹，运行脚本就会自动处理所有图
-    if not os.path.exists(config.IMG_DIR):
-        print(f"❌ 错误：找不到图片目录 {config.IMG_DIR}")
+    ap = argparse.ArgumentParser(description="批量识别图片目录并入账（已处理过的截图自动跳过）")
+    ap.add_argument("--dir", default=config.IMG_DIR, help="图片目录")
+    ap.add_argument("--ledger-id", type=int, default=None, help="目标账本 ID（默认第一个账本）")
+    ap.add_argument("--date", default=None, help="账单日期 YYYY-MM-DD（默认取图片修改日期）")
+    ap.add_argument("--batch-size", type=int, default=config.UPLOAD_PARSE_BATCH, help="每批识别的图片数")
+    ap.add_argument("--db", default=config.DB_PATH, help="数据库路径")
+    ap.add_argument("--checkpoint", default=config.INGEST_CHECKPOINT_PATH, help="检查点文件路径")
+    ap.add_argument("--verbose", action="store_true", help="逐张打印识别结果")
+    ap.add_argument("--watch", action="store_true", help="常驻监听目录，新截图自动入账（标记为待复核）")
+    ap.add_argument("--settle", type=float, default=2.0, help="监听模式：文件多少秒不变才算写完")
+    ap.add_argument("--poll-interval", type=float, default=2.0, help="监听模式：无 watchdog 时的轮询间隔（秒）")
+    ap.add_argument("--no-watchdog", action="store_true", help="监听模式：强制使用轮询")
+    args = ap.parse_args()
+
+    if args.watch:
+        watch(args)
         return
 
-    # 获取所有 .jpg, .png 文件
-    image_files = [f for f in os.listdir(config.IMG_DIR) if f.lower().endswith(('.jpg', '.png', '.jpeg'))]
+    print(f"🚀 启动智图记账 (数据目录: {args.dir})")
+
+    # 1. 遍历图片目录
+    # 这样你只需要把新截图丢进文件夹，运行脚本就只会处理新增的图
+    if not os.path.exists(args.dir):
+        print(f"❌ 错误：找不到图片目录 {args.dir}")
+        return
 
+    image_files = scan_images(args.dir)
     if not image_files:
         print("⚠️ 目录中没有找到图片文件。")
         return
 
-    print(f"📸 发现 {len(image_files)} 张待处理账单...")
-
-    for img_name in image_files:
-        # 拼接图片的完整路径
-        img_full_path = os.path.join(config.IMG_DIR, img_name)
-        
-        print(f"\n--- 处理: {img_name} ---")
-        
-        try:
-            # A. 识别
-            bill_data = parser.parse(img_full_path)
-            
-            # B. 打印
-            print(f"   ✅ 识别: {bill_data['merchant']} | ¥{bill_data['amount']}")
-            
-            # C. 存储
-            excel.save(bill_data, img_name)
-            db.save(bill_data, img_name)
-            
-        except Exception as e:
-            print(f"   ❌ 处理失败: {e}")
+    print(f"📸 发现 {len(image_files)} 张图片，正在比对检查点...")
+
+    # 2. 初始化模块
+    db = EnhancedDatabaseManager(args.db)
+    ledger_id = args.ledger_id or db.get_default_ledger_id()
+    checkpoint = IngestCheckpoint(args.checkpoint)
+
+    def on_result(path, bill_data):
+        if not args.verbose:
+            return
+        name = os.path.basename(path)
+        if bill_data.get('error'):
+            sys.stdout.write(f"\n   ❌ {name}: {bill_data['error']}\n")
+        else:
+            sys.stdout.write(f"\n   ✅ {name}: {bill_data.get('merchant')} | ¥{bill_data.get('amount')}\n")
+
+    # 先比对检查点（未变文件只 stat 不重算哈希），全部处理过就不必加载 OCR 模型
+    todo, _ = plan_ingest(image_files, checkpoint)
+    if not todo:
+        checkpoint.save()
+        print("✅ 没有新的截图需要处理")
+        return
+    print(f"🆕 {len(todo)} 张新截图待识别")
+
+    parser = build_parser(db, ledger_id)
+    try:
+        stats = ingest_images(
+            parser, db, image_files, checkpoint,
+            ledger_id=ledger_id,
+            bill_date=args.date,
+            batch_size=args.batch_size,
+            progress=ProgressBar(),
+            on_result=on_result,
+        )
+    except KeyboardInterrupt:
+        print("\n⏸️ 已中断，下次运行会从检查点继续")
+        return
+    finally:
+        parser.shutdown()
+
+    print(
+        f"✅ 新增 {stats['inserted']} 笔, 跳过已处理 {stats['skipped']} 张, "
+        f"重复 {stats['duplicates']} 笔, 失败 {stats['failed']} 张"
+    )
 
     # 3. 处理完毕，展示统计看板
     print("\n" + "="*30)
     print("🏁 所有账单处理完成，最新统计如下：")
-    analytics.show_dashboard()
+    LedgerAnalytics(args.db).show_dashboard()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
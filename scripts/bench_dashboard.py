@@ -0,0 +1,130 @@
+# bench_dashboard.py
+# 仪表盘汇总基准：旧路径（get_spending_summary 全部 + 仅预算各一次，再 list_ledgers 找预算）
+# 对比 get_dashboard_summary（一个读事务、一次条件聚合扫描）的耗时和执行的 SQL 条数
+# 用法：python scripts/bench_dashboard.py [--rows 200000] [--repeat 50] [--db output/bench_dashboard.db]
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db_connection import ConnectionManager
+from app.enhanced_storage import EnhancedDatabaseManager, EnhancedBill, CategoryGroup
+
+CATEGORIES = ['餐饮/外卖', '餐饮/咖啡', '交通/打车', '交通/地铁', '购物/日用', '购物/数码', '汽车/加油', '娱乐/电影']
+MONTH_START, MONTH_END = '2025-06-01', '2025-06-30'
+
+executed = [0]
+
+
+def count_statement(_sql):
+    executed[0] += 1
+
+
+def trace_connections():
+    """统计所有连接执行的 SQL 条数（只计数，不保存语句）"""
+    original_open = ConnectionManager._open
+
+    def traced_open(manager):
+        conn = original_open(manager)
+        conn.set_trace_callback(count_statement)
+        return conn
+
+    ConnectionManager._open = traced_open
+
+
+def build(db_path: str, rows: int):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    db = EnhancedDatabaseManager(db_path)
+    ledger_id = db.get_default_ledger_id()
+    for name in CATEGORIES[:5]:
+        major, minor = name.split('/')
+        db.save_category_group(CategoryGroup(major=major, minor=minor))
+    ledger = next(l for l in db.list_ledgers() if l['id'] == ledger_id)
+    ledger['monthly_budget_cents'] = 500_000
+    db.save_ledger(ledger)
+
+    rnd = random.Random(42)
+    bills = (
+        EnhancedBill(
+            ledger_id=ledger_id,
+            filename=f"bench_{i}.jpg",
+            merchant=f"商户{rnd.randint(1, 500)}",
+            amount_cents=rnd.randint(100, 30000),
+            category=rnd.choice(CATEGORIES),
+            bill_date=f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+            include_in_budget=rnd.random() < 0.8,
+        )
+        for i in range(rows)
+    )
+    start = time.perf_counter()
+    db.import_bills(bills, ledger_id=ledger_id, chunk_size=20000)
+    print(f"📦 生成 {rows} 行用时 {time.perf_counter() - start:.1f}s")
+    return db, ledger_id
+
+
+def old_path(db, ledger_id):
+    """get_dashboard_summary 接口改造前的取数方式"""
+    monthly = db.get_spending_summary(start_date=MONTH_START, end_date=MONTH_END, ledger_id=ledger_id)
+    budget = db.get_spending_summary(start_date=MONTH_START, end_date=MONTH_END, ledger_id=ledger_id,
+                                     include_in_budget=True)
+    ledger = next((l for l in db.list_ledgers() if l['id'] == ledger_id), None)
+    top = sorted(monthly['categories'].items(), key=lambda x: x[1]['amount_cents'], reverse=True)[:3]
+    return {
+        'total_amount_cents': monthly['total_amount_cents'],
+        'budget_amount_cents': budget['total_amount_cents'],
+        'monthly_budget_cents': ledger['monthly_budget_cents'] if ledger else 0,
+        'top_categories': [{'category': name, **data} for name, data in top],
+    }
+
+
+def new_path(db, ledger_id):
+    return db.get_dashboard_summary(ledger_id, MONTH_START, MONTH_END, top_n=3)
+
+
+def measure(fn, repeat: int):
+    start = executed[0]
+    fn()
+    count = executed[0] - start
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best, count
+
+
+def main():
+    ap = argparse.ArgumentParser(description="仪表盘汇总：旧路径 vs 单事务条件聚合")
+    ap.add_argument('--rows', type=int, default=200_000)
+    ap.add_argument('--repeat', type=int, default=50)
+    ap.add_argument('--db', default=os.path.join('output', 'bench_dashboard.db'))
+    ap.add_argument('--keep', action='store_true', help="保留生成的数据库")
+    args = ap.parse_args()
+
+    trace_connections()
+    db, ledger_id = build(args.db, args.rows)
+    try:
+        old, new = old_path(db, ledger_id), new_path(db, ledger_id)
+        for key in ('total_amount_cents', 'budget_amount_cents', 'monthly_budget_cents', 'top_categories'):
+            assert old[key] == new[key], (key, old[key], new[key])
+
+        old_t, old_n = measure(lambda: old_path(db, ledger_id), args.repeat)
+        new_t, new_n = measure(lambda: new_path(db, ledger_id), args.repeat)
+        print(f"📊 旧路径 {old_t * 1000:8.2f}ms  {old_n} 条 SQL")
+        print(f"📊 新路径 {new_t * 1000:8.2f}ms  {new_n} 条 SQL（一个读事务）")
+    finally:
+        db.close()
+        if not args.keep:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(args.db + suffix):
+                    os.remove(args.db + suffix)
+
+
+if __name__ == '__main__':
+    main()
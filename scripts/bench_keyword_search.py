@@ -0,0 +1,85 @@
+# bench_keyword_search.py
+# 关键词搜索基准：生成一个百万行账本，对比 LIKE 全表扫描与 bills_fts 三元组索引
+# 用法：python scripts/bench_keyword_search.py [--rows 1000000] [--db output/bench_keyword.db]
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.enhanced_storage import EnhancedDatabaseManager, EnhancedBill
+
+MERCHANTS = ['美团外卖', '滴滴出行', '星巴克咖啡', '瑞幸咖啡', '盒马鲜生', '京东商城', '拼多多', '地铁', '中国石化', '麦当劳']
+WORDS = ['订单', '支付成功', '交易单号', '商户全称', '优惠券', '实付金额', '配送费', '账单详情', '付款方式', '零钱']
+
+
+def build(db_path: str, rows: int):
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    db = EnhancedDatabaseManager(db_path)
+    ledger_id = db.get_default_ledger_id()
+    rnd = random.Random(42)
+
+    def gen():
+        for i in range(rows):
+            merchant = rnd.choice(MERCHANTS) + f"{rnd.randint(1, 500)}号店"
+            yield EnhancedBill(
+                ledger_id=ledger_id,
+                filename=f"bench_{i}.jpg",
+                merchant=merchant,
+                amount_cents=rnd.randint(100, 30000),
+                category='餐饮/外卖',
+                bill_date=f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+                raw_text=[merchant] + rnd.sample(WORDS, 6) + [f"单号{rnd.getrandbits(48):012x}"],
+            )
+
+    start = time.perf_counter()
+    db.import_bills(gen(), ledger_id=ledger_id, chunk_size=20000)
+    print(f"📦 生成 {rows} 行用时 {time.perf_counter() - start:.1f}s")
+    return db, ledger_id
+
+
+def timeit(fn, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description="关键词搜索基准（LIKE vs FTS5 trigram）")
+    ap.add_argument('--rows', type=int, default=1_000_000)
+    ap.add_argument('--db', default=os.path.join('output', 'bench_keyword.db'))
+    ap.add_argument('--keep', action='store_true', help="保留生成的数据库")
+    args = ap.parse_args()
+
+    db, ledger_id = build(args.db, args.rows)
+    try:
+        for keyword in ['星巴克咖啡', '盒马鲜生12', '配送费', 'deadbeef']:
+            fts = db._fts_enabled
+            t_fts = timeit(lambda: db.get_bills_count(keyword=keyword, ledger_id=ledger_id))
+            page_fts = timeit(lambda: db.get_bills(limit=50, keyword=keyword, ledger_id=ledger_id))
+            db._fts_enabled = False
+            t_like = timeit(lambda: db.get_bills_count(keyword=keyword, ledger_id=ledger_id))
+            page_like = timeit(lambda: db.get_bills(limit=50, keyword=keyword, ledger_id=ledger_id))
+            db._fts_enabled = fts
+            count = db.get_bills_count(keyword=keyword, ledger_id=ledger_id)
+            print(f"🔍 {json.dumps(keyword, ensure_ascii=False):<14} 命中 {count:>7}  "
+                  f"count: LIKE {t_like * 1000:8.1f}ms  FTS {t_fts * 1000:8.1f}ms  |  "
+                  f"第一页: LIKE {page_like * 1000:8.1f}ms  FTS {page_fts * 1000:8.1f}ms")
+    finally:
+        db.close()
+        if not args.keep:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(args.db + suffix):
+                    os.remove(args.db + suffix)
+
+
+if __name__ == '__main__':
+    main()
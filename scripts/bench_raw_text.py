@@ -0,0 +1,137 @@
+# bench_raw_text.py
+# 原始识别文本拆表基准：同一批账单，对比 raw_text 内联在 bills 里（旧布局）与压缩存到 bill_raw_text（新布局）
+# 的表大小和汇总查询耗时
+# 用法：python scripts/bench_raw_text.py [--rows 200000] [--lines 30] [--db output/bench_raw_text.db]
+
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.enhanced_storage import EnhancedDatabaseManager, EnhancedBill
+
+MERCHANTS = ['美团外卖', '滴滴出行', '星巴克咖啡', '瑞幸咖啡', '盒马鲜生', '京东商城', '拼多多', '地铁', '中国石化', '麦当劳']
+CATEGORIES = ['餐饮/外卖', '餐饮/咖啡', '交通/打车', '交通/地铁', '购物/日用', '购物/数码', '汽车/加油']
+WORDS = ['订单', '支付成功', '交易单号', '商户全称', '优惠券', '实付金额', '配送费', '账单详情', '付款方式', '零钱',
+         '收款方', '交易时间', '商品说明', '当前状态', '支付方式', '商户单号', '服务费', '合计']
+
+# 汇总页的典型查询：按账本 + 日期范围扫描账单行，按分类求和
+SUMMARY_SQL = '''
+    SELECT category, SUM(amount_cents), COUNT(*)
+    FROM {table}
+    WHERE ledger_id = ? AND bill_date BETWEEN ? AND ? AND include_in_budget = 1
+    GROUP BY category
+'''
+
+
+def build(db_path: str, rows: int, lines: int):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    db = EnhancedDatabaseManager(db_path)
+    ledger_id = db.get_default_ledger_id()
+    rnd = random.Random(42)
+
+    def gen():
+        for i in range(rows):
+            merchant = rnd.choice(MERCHANTS) + f"{rnd.randint(1, 500)}号店"
+            raw = [merchant] + [
+                f"{rnd.choice(WORDS)}：{rnd.choice(WORDS)}{rnd.getrandbits(32):08x}" for _ in range(lines - 1)
+            ]
+            yield EnhancedBill(
+                ledger_id=ledger_id,
+                filename=f"bench_{i}.jpg",
+                merchant=merchant,
+                amount_cents=rnd.randint(100, 30000),
+                category=rnd.choice(CATEGORIES),
+                bill_date=f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+                raw_text=raw,
+            )
+
+    start = time.perf_counter()
+    db.import_bills(gen(), ledger_id=ledger_id, chunk_size=20000)
+    print(f"📦 生成 {rows} 行用时 {time.perf_counter() - start:.1f}s")
+    return db, ledger_id
+
+
+def build_inline_copy(db_path: str):
+    """bills_inline：旧布局，raw_text 以 JSON 文本内联在账单行里，索引与 bills 相同"""
+    conn = sqlite3.connect(db_path)
+    conn.create_function(
+        'raw_json', 1,
+        lambda data: json.dumps(json.loads(zlib.decompress(data))['lines'], ensure_ascii=False) if data else None,
+    )
+    cols = [r[1] for r in conn.execute('PRAGMA table_info(bills)')]
+    select_cols = ', '.join(f'b.{c}' for c in cols)
+    with conn:
+        conn.execute('DROP TABLE IF EXISTS bills_inline')
+        conn.execute(f'CREATE TABLE bills_inline AS SELECT {select_cols}, raw_json(r.data) AS raw_text '
+                     f'FROM bills b LEFT JOIN bill_raw_text r ON r.bill_id = b.id ORDER BY b.id')
+        for name, sql in conn.execute("SELECT name, sql FROM sqlite_master WHERE type='index' "
+                                      "AND tbl_name='bills' AND sql IS NOT NULL").fetchall():
+            conn.execute(sql.replace(name, name.replace('idx_bills', 'idx_bills_inline'), 1)
+                            .replace(' ON bills(', ' ON bills_inline(', 1)
+                            .replace(' ON bills (', ' ON bills_inline (', 1))
+    conn.execute('ANALYZE')
+    return conn
+
+
+def table_bytes(conn, table: str) -> int:
+    return conn.execute('SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name = ?', (table,)).fetchone()[0]
+
+
+def timeit(fn, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description="raw_text 内联 vs 压缩拆表 基准")
+    ap.add_argument('--rows', type=int, default=200_000)
+    ap.add_argument('--lines', type=int, default=30, help="每张账单的识别行数")
+    ap.add_argument('--db', default=os.path.join('output', 'bench_raw_text.db'))
+    ap.add_argument('--keep', action='store_true', help="保留生成的数据库")
+    args = ap.parse_args()
+
+    db, ledger_id = build(args.db, args.rows, args.lines)
+    db.close()
+    conn = build_inline_copy(args.db)
+    try:
+        mb = 1024 * 1024
+        inline = table_bytes(conn, 'bills_inline')
+        hot = table_bytes(conn, 'bills')
+        side = table_bytes(conn, 'bill_raw_text')
+        print(f"💾 bills（内联 raw_text） {inline / mb:8.1f}MB")
+        print(f"💾 bills（拆表后）        {hot / mb:8.1f}MB  + bill_raw_text {side / mb:.1f}MB（压缩）")
+
+        for start, end in [('2025-01-01', '2025-12-31'), ('2025-06-01', '2025-06-30')]:
+            params = (ledger_id, start, end)
+            results = {}
+            for table in ('bills_inline', 'bills'):
+                sql = SUMMARY_SQL.format(table=table)
+                results[table] = sorted(conn.execute(sql, params).fetchall())
+                conn.execute('PRAGMA shrink_memory')
+                results[table + '_t'] = timeit(lambda: conn.execute(sql, params).fetchall())
+            assert results['bills_inline'] == results['bills']
+            print(f"📊 汇总 {start}~{end}: 内联 {results['bills_inline_t'] * 1000:8.1f}ms  "
+                  f"拆表 {results['bills_t'] * 1000:8.1f}ms")
+    finally:
+        conn.close()
+        if not args.keep:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(args.db + suffix):
+                    os.remove(args.db + suffix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# snapshot_db.py
+# 整库在线快照（Web 服务运行中也可以执行，不停服）：
+#   python snapshot_db.py                          # 快照到 output/snapshots，gzip 压缩，保留最近 7 份
+#   python snapshot_db.py --no-compress --keep 30
+#   python snapshot_db.py --verify output/snapshots/ledger-20260101-030000.db.gz
+# 每晚备份（crontab）：0 3 * * * cd /path/to/bill && python snapshot_db.py
+import sys
+import argparse
+
+import config  # 导入配置
+from app.db_snapshot import create_snapshot, list_snapshots, verify_snapshot
+
+
+class StepProgress:
+    """按 10% 打印一次备份进度"""
+
+    def __init__(self):
+        self.last = -1
+
+    def __call__(self, remaining: int, total: int):
+        pct = int((total - remaining) * 100 / total) if total else 100
+        if pct // 10 != self.last // 10:
+            self.last = pct
+            print(f"   复制中 {pct}% ({total - remaining}/{total} 页)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="SQLite 在线快照 / 校验")
+    ap.add_argument("--db", default=config.DB_PATH, help="数据库路径")
+    ap.add_argument("--dest", default=config.SNAPSHOT_DIR, help="快照目录")
+    ap.add_argument("--no-compress", action="store_true", help="不做 gzip 压缩")
+    ap.add_argument("--keep", type=int, default=config.SNAPSHOT_KEEP, help="保留最近几份（<=0 不清理）")
+    ap.add_argument("--pages", type=int, default=config.SNAPSHOT_PAGES_PER_STEP, help="每步复制的页数")
+    ap.add_argument("--sleep-ms", type=float, default=config.SNAPSHOT_STEP_SLEEP_MS, help="每步之间暂停的毫秒数")
+    ap.add_argument("--quick-check", action="store_true", help="用 quick_check 代替 integrity_check（大库更快）")
+    ap.add_argument("--verify", nargs="*", metavar="PATH", help="只校验已有快照（不给路径则校验目录下全部）")
+    args = ap.parse_args()
+
+    if args.verify is not None:
+        paths = args.verify or [item["path"] for item in list_snapshots(args.dest)]
+        failed = 0
+        for path in paths:
+            result = verify_snapshot(path, quick=args.quick_check)
+            print(f"{'✅' if result['ok'] else '❌'} {path}: {result['result']}")
+            failed += 0 if result["ok"] else 1
+        sys.exit(1 if failed else 0)
+
+    print(f"📸 正在快照 {args.db} ...")
+    try:
+        info = create_snapshot(
+            args.db,
+            args.dest,
+            compress=not args.no_compress,
+            keep=args.keep,
+            pages_per_step=args.pages,
+            step_sleep_ms=args.sleep_ms,
+            quick_check=args.quick_check,
+            progress=StepProgress(),
+        )
+    except Exception as e:
+        print(f"❌ 快照失败: {e}")
+        sys.exit(1)
+    print(
+        f"✅ {info['path']} ({info['size_bytes'] / 1024 / 1024:.1f}MB, "
+        f"原始 {info['db_size_bytes'] / 1024 / 1024:.1f}MB, 耗时 {info['elapsed_seconds']:.1f}s)"
+    )
+    for name in info["pruned"]:
+        print(f"🗑️ 已清理旧快照 {name}")
+
+
+if __name__ == "__main__":
+    main()
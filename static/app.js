@@ -785,11 +785,13 @@ class BillProcessorApp {
             selectCell.appendChild(selectInput);
             
             const previewCell = document.createElement('td');
-            if (result.image_data) {
+            const imageSrc = result.image_url
+                || (result.image_data ? `data:image/jpeg;base64,${result.image_data}` : null);
+            if (imageSrc) {
                 const img = document.createElement('img');
-                img.src = `data:image/jpeg;base64,${result.image_data}`;
+                img.src = imageSrc;
                 img.className = 'preview-thumb';
-                img.onclick = () => this.showImageModal(result.image_data);
+                img.onclick = () => this.showImageModal(imageSrc);
                 previewCell.appendChild(img);
             }
             
@@ -1265,7 +1267,7 @@ class BillProcessorApp {
         });
     }
 
-    showImageModal(imageData) {
+    showImageModal(imageSrc) {
         const modal = document.createElement('div');
         modal.style.cssText = `
             position: fixed;
@@ -1282,7 +1284,7 @@ class BillProcessorApp {
         `;
         
         const img = document.createElement('img');
-        img.src = `data:image/jpeg;base64,${imageData}`;
+        img.src = imageSrc;
         img.style.cssText = `
             max-width: 90%;
             max-height: 90%;
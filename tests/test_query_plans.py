@@ -0,0 +1,193 @@
+# test_query_plans.py
+# 查询计划回归：对 EnhancedDatabaseManager 的每种查询形状跑 EXPLAIN QUERY PLAN，
+# 账单表 / 日汇总表一旦退化成全表扫描（SCAN bills）就失败；
+# 默认排序的列表 / 游标翻页还要求直接按索引顺序读取（不允许 USE TEMP B-TREE FOR ORDER BY）
+# 运行：python -m unittest discover tests
+
+import os
+import re
+import sys
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db_connection import ConnectionManager
+from app.enhanced_storage import EnhancedDatabaseManager, EnhancedBill, CategoryGroup
+
+# 这些表（及查询里的别名）不允许出现 "SCAN"；bills_fts 是虚表，走 FTS 自己的索引
+GUARDED_TABLES = ('bills', 'b', 'bill_daily_rollup', 'r')
+SCAN_RE = re.compile(r'^SCAN (\w+)')
+TEMP_SORT_RE = re.compile(r'USE TEMP B-TREE FOR (?:.* )?ORDER BY')
+# 游标翻页的第 2 页：在 (bill_date, created_at, id) 索引上按行值定位，而不是从头读
+KEYSET_SEEK_RE = re.compile(r'INDEX idx_bills_ledger_date_id \(ledger_id=\? AND \(bill_date,created_at(?:,id)?\)[<>]')
+
+
+class QueryPlanTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.db_path = os.path.join(cls.tmpdir, 'plans.db')
+        cls.statements = []
+
+        # 记录所有连接（含写线程）执行的 SQL，绑定参数已展开
+        original_open = ConnectionManager._open
+
+        def traced_open(manager):
+            conn = original_open(manager)
+            conn.set_trace_callback(cls.statements.append)
+            return conn
+
+        ConnectionManager._open = traced_open
+        cls.addClassCleanup(setattr, ConnectionManager, '_open', original_open)
+
+        cls.db = EnhancedDatabaseManager(cls.db_path)
+        cls.ledger_id = cls.db.get_default_ledger_id()
+        cls.major, cls.minor = '餐饮', '咖啡'
+        cls.category = f'{cls.major}/{cls.minor}'
+        cls.db.save_category_group(CategoryGroup(major=cls.major, minor=cls.minor))
+        cls.db.save_bills([
+            EnhancedBill(
+                ledger_id=cls.ledger_id, filename=f'{i}.jpg', merchant=f'星巴克咖啡{i % 7}',
+                amount_cents=1000 + i * 100, category=cls.category, bill_date=f'2026-01-{i % 28 + 1:02d}',
+                raw_text=['支付成功', f'单号{i}'], include_in_budget=bool(i % 5), needs_review=not i % 9,
+            )
+            for i in range(60)
+        ])
+        cls.plan_conn = sqlite3.connect(cls.db_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.plan_conn.close()
+        cls.db.close()
+        shutil.rmtree(cls.tmpdir, ignore_errors=True)
+
+    def capture(self, fn, *args, **kwargs):
+        """运行 fn，返回期间执行过的 SELECT/UPDATE/DELETE"""
+        start = len(self.statements)
+        fn(*args, **kwargs)
+        return [
+            sql for sql in self.statements[start:]
+            if re.match(r'\s*(SELECT|UPDATE|DELETE|WITH)\b', sql, re.I)
+        ]
+
+    def plan(self, sql):
+        return [row[3] for row in self.plan_conn.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall()]
+
+    def assert_no_scan(self, statements, ordered=False):
+        """ordered=True 时额外要求 ORDER BY 由索引满足（不建临时 B 树排序）"""
+        self.assertTrue(statements, "没有捕获到任何查询")
+        for sql in statements:
+            plan = self.plan(sql)
+            for detail in plan:
+                m = SCAN_RE.match(detail)
+                if m and m.group(1) in GUARDED_TABLES:
+                    details = '\n'.join(plan)
+                    self.fail(f"全表扫描: {detail}\nSQL: {sql}\n计划:\n{details}")
+                if ordered and TEMP_SORT_RE.search(detail):
+                    details = '\n'.join(plan)
+                    self.fail(f"排序没有走索引: {detail}\nSQL: {sql}\n计划:\n{details}")
+
+    def check(self, fn, *args, **kwargs):
+        self.assert_no_scan(self.capture(fn, *args, **kwargs))
+
+    def check_ordered(self, fn, *args, **kwargs):
+        self.assert_no_scan(self.capture(fn, *args, **kwargs), ordered=True)
+
+    # ---------------- 列表 / 计数 ----------------
+    def test_bill_lists(self):
+        lid = self.ledger_id
+        filters = [
+            {},
+            {'start_date': '2026-01-05', 'end_date': '2026-01-20'},
+            {'category': self.category},
+            {'major': self.major},
+            {'major': self.major, 'minor': self.minor},
+            {'keyword': '星巴克咖啡3'},
+            {'keyword': '星巴'},
+            {'needs_review': True},
+            {'needs_review': False},
+        ]
+        for f in filters:
+            with self.subTest(filters=f):
+                self.check_ordered(self.db.get_bills, ledger_id=lid, **f)
+                self.check(self.db.get_bills_count, ledger_id=lid, **f)
+                self.check_ordered(self.db.list_bills, ledger_id=lid, **f)
+                _, cursor = self.db.list_bills(limit=5, ledger_id=lid, **f)
+                if cursor:
+                    self.check_ordered(self.db.list_bills, limit=5, cursor=cursor, ledger_id=lid, **f)
+        for sort_by in ('bill_date', 'merchant', 'category', 'amount'):
+            for sort_order in ('asc', 'desc'):
+                with self.subTest(sort_by=sort_by, sort_order=sort_order):
+                    self.check(self.db.get_bills, ledger_id=lid, sort_by=sort_by, sort_order=sort_order, offset=20)
+                    _, cursor = self.db.list_bills(limit=5, ledger_id=lid, sort_by=sort_by, sort_order=sort_order)
+                    self.check(self.db.list_bills, limit=5, cursor=cursor, ledger_id=lid,
+                               sort_by=sort_by, sort_order=sort_order)
+
+    def test_keyset_seek(self):
+        """默认排序翻到第 2 页时直接在索引上定位到游标之后"""
+        for sort_order in ('desc', 'asc'):
+            with self.subTest(sort_order=sort_order):
+                _, cursor = self.db.list_bills(limit=5, ledger_id=self.ledger_id, sort_order=sort_order)
+                statements = [
+                    sql for sql in self.capture(self.db.list_bills, limit=5, cursor=cursor,
+                                                ledger_id=self.ledger_id, sort_order=sort_order)
+                    if 'LIMIT' in sql
+                ]
+                self.assertTrue(statements, "没有捕获到翻页查询")
+                plan = self.plan(statements[0])
+                self.assertTrue(any(KEYSET_SEEK_RE.search(detail) for detail in plan),
+                                "游标翻页没有按索引定位:\n" + '\n'.join(plan))
+                self.assert_no_scan(statements, ordered=True)
+
+    def test_single_bill(self):
+        bill_id = self.db.list_bills(limit=1, ledger_id=self.ledger_id)[0][0].id
+        self.check(self.db.get_bill, bill_id)
+
+    # ---------------- 统计 ----------------
+    def test_analytics(self):
+        lid = self.ledger_id
+        filters = [
+            {},
+            {'start_date': '2026-01-01', 'end_date': '2026-01-31'},
+            {'major': self.major},
+            {'major': self.major, 'minor': self.minor, 'start_date': '2026-01-10'},
+            {'keyword': '星巴克咖啡'},
+        ]
+        for f in filters:
+            with self.subTest(filters=f):
+                self.check(self.db.get_daily_spending, ledger_id=lid, **f)
+                for include_in_budget in (None, True, False):
+                    self.check(self.db.get_spending_summary, ledger_id=lid,
+                               include_in_budget=include_in_budget, **f)
+        self.check(self.db.get_dashboard_summary, lid, '2026-01-01', '2026-01-31')
+
+    # ---------------- 写入 ----------------
+    def test_bulk_writes(self):
+        items, _ = self.db.list_bills(limit=4, ledger_id=self.ledger_id)
+        ids = [item.id for item in items]
+        self.check(self.db.set_budget_flag, ids, False, ledger_id=self.ledger_id)
+        self.check(self.db.set_budget_flag, ids, True, ledger_id=self.ledger_id)
+        bill = self.db.get_bill(ids[0])
+        bill.amount_cents += 100
+        self.check(self.db.save_bills, [bill])
+
+    def test_ledger_backup(self):
+        self.check(self.db.create_ledger_backup, self.ledger_id)
+
+    def test_rollup_trigger_lookups(self):
+        """触发器内的汇总行定位（IS 比较）必须走索引"""
+        key = "ledger_id IS 1 AND bill_date IS '2026-01-01' AND category_id IS 1 " \
+              "AND category IS 'x' AND include_in_budget IS 1"
+        self.assert_no_scan([
+            f'SELECT 1 FROM bill_daily_rollup WHERE {key}',
+            f'UPDATE bill_daily_rollup SET bill_count = bill_count + 1 WHERE {key}',
+            f'DELETE FROM bill_daily_rollup WHERE {key} AND bill_count <= 0',
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
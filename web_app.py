@@ -2,7 +2,9 @@
 import os
 import uuid
 import base64
+import hashlib
 import time
+import functools
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
@@ -10,6 +12,15 @@ import config
 from app.bill_parser import BillParser, _load_templates_from_file, _compile_template
 from app.storage import ExcelSaver, DatabaseSaver
 from app.enhanced_storage import EnhancedDatabaseManager, EnhancedBill, CategoryRule, CategoryGroup, RecurringRule
+from app.upload_spool import UploadSpool, UploadTooLarge, UploadOffsetMismatch
+from app.recurring_scheduler import RecurringScheduler
+from app.db_snapshot import create_snapshot, list_snapshots
+from app.zip_ingest import ZipIngestJob, ZipIngestRegistry
+from app.statement_import import import_statement, STATEMENT_FORMATS
+from app.money import to_cents, from_cents, format_cents
+from app.analytics_cache import AnalyticsCache, NUMPY_AVAILABLE
+from app.result_cache import ResultCache
+from app.single_flight import SingleFlight, SingleFlightTimeout
 from datetime import date
 try:
     from PIL import Image
@@ -45,13 +56,28 @@ def _make_preview_base64(image_bytes: bytes, max_side: int = 900, jpeg_quality:
         # 出错就兜底返回原图
         return base64.b64encode(image_bytes).decode("utf-8")
 
+def _preview_ext() -> str:
+    """预览图扩展名：优先 config.PREVIEW_FORMAT，当前 PIL 不支持 WebP 时回退 jpg"""
+    fmt = str(getattr(config, "PREVIEW_FORMAT", "jpg") or "jpg").lower()
+    if fmt == "webp":
+        try:
+            from PIL import features
+            if not features.check("webp"):
+                return "jpg"
+        except Exception:
+            return "jpg"
+        return "webp"
+    return "jpg"
+
+
 # Initialize Flask app
 app = Flask(__name__, static_folder='static')
 CORS(app)  # Enable CORS for API endpoints
 
 # Configuration
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['MAX_CONTENT_LENGTH'] = config.UPLOAD_MAX_BATCH_SIZE  # 单次请求上限；单文件上限见 UPLOAD_MAX_FILE_SIZE
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+ARCHIVE_EXTENSIONS = {'zip'}
 
 
 import os
@@ -65,6 +91,8 @@ excel_saver = None
 db_saver = None
 enhanced_db = None
 _default_ledger_id = None
+recurring_scheduler = None
+analytics_cache = None
 
 
 def allowed_file(filename):
@@ -72,13 +100,23 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+
+def allowed_archive(filename):
+    """Check if file is a supported archive for bulk ingestion"""
+    return '.' in filename and \
+           filename.rsplit('.', 1)[1].lower() in ARCHIVE_EXTENSIONS
+
 import threading
 import os
 
 _init_lock = threading.Lock()
+upload_spool = UploadSpool()
+zip_jobs = ZipIngestRegistry()
+result_cache = ResultCache()
+query_flights = SingleFlight()
 
 def init_processors(*, need_parser=False, need_savers=False, need_db=False):
-    global bill_parser, excel_saver, db_saver, enhanced_db, _default_ledger_id
+    global bill_parser, excel_saver, db_saver, enhanced_db, _default_ledger_id, recurring_scheduler, analytics_cache
 
     # ✅ 快速路径：本次需要的都准备好才 return
     if ((not need_parser or bill_parser is not None) and
@@ -109,12 +147,22 @@ def init_processors(*, need_parser=False, need_savers=False, need_db=False):
         if need_db and enhanced_db is None:
             enhanced_db = EnhancedDatabaseManager()
             _default_ledger_id = enhanced_db.get_default_ledger_id()
+            recurring_scheduler = RecurringScheduler(enhanced_db)
+            if config.ANALYTICS_CACHE_ENABLED and NUMPY_AVAILABLE:
+                analytics_cache = AnalyticsCache(enhanced_db)
 
         if bill_parser is not None and enhanced_db is not None:
             # 让模板解析使用数据库中的最新分类规则
             bill_parser.category_rules_loader = lambda: enhanced_db.get_category_rules(_default_ledger_id)
 
 
+@app.teardown_appcontext
+def release_db_connection(exc=None):
+    """请求结束：把本线程的读连接还回空闲池（threaded 模式每个请求一个新线程，不归还就每请求泄漏一条连接）"""
+    if enhanced_db is not None:
+        enhanced_db.release_connection()
+
+
 _ocr_ready = threading.Event()
 _ocr_error = None
 
@@ -129,12 +177,74 @@ def get_ledger_id_from_request():
         return _default_ledger_id
 
 def ensure_recurring_bills(ledger_id):
+    """读接口用：当天已补齐周期性账单则直接返回（由后台调度器负责跨天生成）"""
     try:
-        if enhanced_db is not None:
-            enhanced_db.generate_recurring_bills(ledger_id)
+        if recurring_scheduler is not None:
+            recurring_scheduler.ensure_fresh(ledger_id)
     except Exception as e:
         print(f"[Recurring] generate failed: {e}")
 
+def cached_analytics(method, *args, **kwargs):
+    """统计查询：有列式缓存且缓存能回答时走内存，否则（关键词搜索等）走 SQL"""
+    if analytics_cache is not None:
+        result = getattr(analytics_cache, method)(*args, **kwargs)
+        if result is not None:
+            return result
+    return getattr(enhanced_db, method)(*args, **kwargs)
+
+def versioned_get(per_ledger=True):
+    """GET 读接口：响应体按 (路径, 参数, 数据版本) 缓存，带 ETag，If-None-Match 命中时 304（不跑查询，版本号在内存里）
+
+    per_ledger=False 的接口（跨账本的列表）跟随整库版本；键里带上当天日期，
+    仪表盘这类按“今天”取数的接口跨天自然失效。
+    缓存未命中时同一个键的并发请求合并成一次计算（query_flights），其余请求共享结果或错误。
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            init_processors(need_db=True)
+            ledger_id = None
+            if per_ledger:
+                ledger_id = get_ledger_id_from_request()
+                # 未补齐时只唤醒后台调度线程，本次按现有数据（当前版本）返回
+                ensure_recurring_bills(ledger_id)
+            version = (ledger_id, enhanced_db.data_version(ledger_id), date.today().isoformat())
+            key = ResultCache.make_key(request.path, request.args.items(multi=True), version)
+            etag = result_cache.etag(key)
+
+            def compute():
+                computed = app.make_response(view(*args, **kwargs))
+                body = computed.get_data()
+                if computed.status_code == 200:
+                    result_cache.put(key, body)
+                return computed.status_code, body, computed.mimetype
+
+            if etag in request.headers.get('If-None-Match', ''):
+                response = app.response_class(status=304)
+            else:
+                body = result_cache.get(key)
+                if body is not None:
+                    response = app.response_class(body, mimetype='application/json')
+                else:
+                    try:
+                        (status, body, mimetype), _ = query_flights.do(key, compute)
+                    except SingleFlightTimeout:
+                        return jsonify({'success': False, 'error': '查询繁忙，请稍后重试'}), 504
+                    # 每个请求各自构造响应对象，不共享 leader 的
+                    response = app.response_class(body, status=status, mimetype=mimetype)
+                    if status != 200:
+                        return response
+            response.headers['ETag'] = etag
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+def notify_recurring_changed(ledger_id=None):
+    """规则新建/修改、账本恢复后：让调度器立即为该账本补一次"""
+    if recurring_scheduler is not None:
+        recurring_scheduler.mark_stale(ledger_id)
+
 def warmup_ocr_async():
     global _ocr_error
     try:
@@ -187,13 +297,27 @@ def static_files(filename):
         return send_from_directory(react_root, 'index.html')
     return send_from_directory(app.static_folder, 'index.html')
 
+def _cents_to_yuan(value):
+    """存储层金额都是整数分（字段名以 _cents 结尾）；返回给前端前统一换成“元”，字段名去掉后缀"""
+    if isinstance(value, dict):
+        return {
+            (key[:-len('_cents')] if isinstance(key, str) and key.endswith('_cents') else key):
+                (from_cents(item) if isinstance(key, str) and key.endswith('_cents') else _cents_to_yuan(item))
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_cents_to_yuan(item) for item in value]
+    return value
+
+
 # === Ledger API ===
 
 @app.route('/api/ledgers', methods=['GET'])
+@versioned_get(per_ledger=False)
 def list_ledgers():
     init_processors(need_db=True)
     ledgers = enhanced_db.list_ledgers()
-    return jsonify({'success': True, 'ledgers': ledgers})
+    return jsonify({'success': True, 'ledgers': _cents_to_yuan(ledgers)})
 
 
 @app.route('/api/ledgers', methods=['POST'])
@@ -201,10 +325,10 @@ def create_ledger():
     init_processors(need_db=True)
     data = request.get_json() or {}
     name = (data.get('name') or '').strip()
-    budget = float(data.get('monthly_budget') or 0)
+    budget = to_cents(data.get('monthly_budget'))
     if not name:
         return jsonify({'success': False, 'error': '账本名称不能为空'}), 400
-    ledger_id = enhanced_db.save_ledger({'name': name, 'monthly_budget': budget})
+    ledger_id = enhanced_db.save_ledger({'name': name, 'monthly_budget_cents': budget})
     return jsonify({'success': True, 'ledger_id': ledger_id})
 
 
@@ -213,10 +337,10 @@ def update_ledger(ledger_id):
     init_processors(need_db=True)
     data = request.get_json() or {}
     name = (data.get('name') or '').strip()
-    budget = float(data.get('monthly_budget') or 0)
+    budget = to_cents(data.get('monthly_budget'))
     if not name:
         return jsonify({'success': False, 'error': '账本名称不能为空'}), 400
-    enhanced_db.save_ledger({'id': ledger_id, 'name': name, 'monthly_budget': budget})
+    enhanced_db.save_ledger({'id': ledger_id, 'name': name, 'monthly_budget_cents': budget})
     return jsonify({'success': True})
 
 
@@ -240,7 +364,7 @@ def delete_ledger(ledger_id):
 def list_ledger_backups():
     init_processors(need_db=True)
     backups = enhanced_db.list_ledger_backups()
-    return jsonify({'success': True, 'backups': backups})
+    return jsonify({'success': True, 'backups': _cents_to_yuan(backups)})
 
 
 @app.route('/api/ledger-backups/<int:backup_id>/restore', methods=['POST'])
@@ -257,6 +381,7 @@ def restore_ledger_backup(backup_id):
             'restore_failed': '恢复失败',
         }
         return jsonify({'success': False, 'error': msg_map.get(code, '恢复失败'), 'code': code}), 400
+    notify_recurring_changed(result.get('ledger_id'))
     _default_ledger_id = enhanced_db.get_default_ledger_id()
     return jsonify({'success': True, 'ledger_id': result.get('ledger_id'), 'ledger_name': result.get('ledger_name')})
 
@@ -269,12 +394,51 @@ def delete_ledger_backup(backup_id):
         return jsonify({'success': True})
     return jsonify({'success': False, 'error': '备份不存在'}), 404
 
+
+# 整库快照在后台线程里做（大库要几分钟），同一时刻只跑一个
+_snapshot_lock = threading.Lock()
+_snapshot_job = {'status': 'idle'}
+
+
+def _run_snapshot(db_path, compress):
+    global _snapshot_job
+    try:
+        info = create_snapshot(db_path, compress=compress,
+                               progress=lambda remaining, total: _snapshot_job.update(remaining=remaining, total=total))
+        _snapshot_job = {'status': 'done', 'snapshot': info, 'finished_at': time.time()}
+    except Exception as e:
+        print(f"❌ [Snapshot] 快照失败: {e}")
+        _snapshot_job = {'status': 'failed', 'error': str(e), 'finished_at': time.time()}
+    finally:
+        _snapshot_lock.release()
+
+
+@app.route('/api/db-snapshots', methods=['GET'])
+def get_db_snapshots():
+    """List whole-database snapshots and the state of the last snapshot job"""
+    return jsonify({'success': True, 'snapshots': list_snapshots(), 'job': _snapshot_job})
+
+
+@app.route('/api/db-snapshots', methods=['POST'])
+def create_db_snapshot():
+    """Start an online snapshot of the whole database (SQLite backup API)"""
+    global _snapshot_job
+    init_processors(need_db=True)
+    data = request.get_json(silent=True) or {}
+    if not _snapshot_lock.acquire(blocking=False):
+        return jsonify({'success': False, 'error': '已有快照任务在进行', 'job': _snapshot_job}), 409
+    _snapshot_job = {'status': 'running', 'started_at': time.time()}
+    compress = bool(data.get('compress', config.SNAPSHOT_COMPRESS))
+    threading.Thread(target=_run_snapshot, args=(enhanced_db.db_name, compress),
+                     name="db_snapshot", daemon=True).start()
+    return jsonify({'success': True, 'job': _snapshot_job}), 202
+
 @app.route('/api/save', methods=['POST'])
 def save_bills():
     """Save processed and edited bill data"""
     try:
         # Initialize processors if not already done
-        init_processors()
+        init_processors(need_db=True)
         
         # Get JSON data from request
         data = request.get_json()
@@ -291,8 +455,10 @@ def save_bills():
                 'error': '没有可保存的账单'
             }), 400
         
-        saved_count = 0
         errors = []
+        valid_bills = []
+        valid_names = []
+        from app.enhanced_storage import EnhancedBill
         
         for bill_data in bills:
             try:
@@ -305,32 +471,45 @@ def save_bills():
                     raise ValueError("缺少必填字段: category")
                 
                 # Create enhanced bill object
-                from app.enhanced_storage import EnhancedBill
                 bill = EnhancedBill(
                     filename=bill_data['filename'],
                     merchant=str(bill_data['merchant']).strip(),
-                    amount=float(bill_data['amount']),
+                    amount_cents=to_cents(bill_data['amount']),
                     category=str(bill_data.get('category') or '').strip(),
                     category_id=bill_data.get('category_id'),
                     bill_date=bill_data.get('bill_date', ''),
-                    raw_text=[],  # We don't have raw_text in the save request
+                    raw_text=bill_data.get('raw_text') or [],
+                    ocr_lines=bill_data.get('ocr_lines'),
                     is_manual=bill_data.get('is_manual', False),
                     ledger_id=bill_data.get('ledger_id') or data.get('ledger_id') or get_ledger_id_from_request(),
                     include_in_budget=bool(bill_data.get('include_in_budget', True))
                 )
                 
                 # Validate amount
-                if bill.amount < 0:
+                if bill.amount_cents < 0:
                     raise ValueError("金额不能为负数")
                 
-                # Save to enhanced database
-                enhanced_db.save_bill(bill)
-                saved_count += 1
+                valid_bills.append(bill)
+                valid_names.append(bill_data.get('filename', 'unknown'))
                 
             except Exception as save_error:
                 error_msg = f"保存账单失败 {bill_data.get('filename', 'unknown')}: {str(save_error)}"
                 errors.append(error_msg)
         
+        # 一个事务批量写入
+        saved_ids = []
+        if valid_bills:
+            try:
+                results = enhanced_db.save_bills(valid_bills)
+            except Exception as save_error:
+                results = [{'index': i, 'success': False, 'error': str(save_error)} for i in range(len(valid_bills))]
+            for result in results:
+                if result['success']:
+                    saved_ids.append(result['id'])
+                else:
+                    errors.append(f"保存账单失败 {valid_names[result['index']]}: {result['error']}")
+        saved_count = len(saved_ids)
+        
         # Determine response
         if saved_count > 0:
             message = f"成功保存了 {saved_count} 笔账单"
@@ -340,6 +519,7 @@ def save_bills():
             return jsonify({
                 'success': True,
                 'saved_count': saved_count,
+                'bill_ids': saved_ids,
                 'message': message,
                 'errors': errors
             })
@@ -357,17 +537,78 @@ def save_bills():
             'error': str(e)
         }), 500
 
+def _spooled_to_item(spooled, preview_ext):
+    """Build an upload work item from a spooled file (preview cached by content hash)"""
+    preview_name = f"{spooled.sha1}.{preview_ext}"
+    preview_path = os.path.join(config.PREVIEW_DIR, preview_name)
+    return {
+        "id": str(uuid.uuid4()),
+        "filename": spooled.filename,
+        "temp_path": spooled.path,
+        "preview_name": preview_name,
+        "preview_path": None if os.path.exists(preview_path) else preview_path,
+    }
+
+
+def _process_upload_items(items, bill_date, errors, cleanup=True, ledger_id=None):
+    """Run OCR over spooled upload items in bounded batches and build API results
+
+    Category rules are loaded for ``ledger_id`` per call instead of being set on the
+    shared parser, so concurrent requests / background jobs for other ledgers don't race.
+    """
+    rules_loader = None
+    if ledger_id is not None:
+        rules_loader = lambda: enhanced_db.get_category_rules(ledger_id)
+    results = []
+    batch_size = max(1, int(getattr(config, 'UPLOAD_PARSE_BATCH', 32)))
+    ocr_start = time.perf_counter()
+    print(f"🧾 [OCR] 开始识别 {len(items)} 张账单...")
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        try:
+            paths = [it["temp_path"] for it in batch]
+            preview_paths = [it["preview_path"] for it in batch]
+            bill_datas = bill_parser.parse_batch(
+                paths, preview_paths=preview_paths, category_rules_loader=rules_loader
+            )
+
+            for it, bill_data in zip(batch, bill_datas):
+                err = bill_data.get("error")
+                # 没装 PIL / 解码或预处理失败时不会生成预览图，这时不返回地址（否则前端拿到 404）
+                has_preview = os.path.exists(os.path.join(config.PREVIEW_DIR, it['preview_name']))
+                results.append({
+                    'id': it["id"],
+                    'filename': it["filename"],
+                    'merchant': bill_data.get('merchant', ''),
+                    'amount': bill_data.get('amount', 0.0),
+                    'category': bill_data.get('category', ''),
+                    'raw_text': bill_data.get('raw_text', []),
+                    'ocr_lines': bill_data.get('ocr_lines'),
+                    # ✅ 返回缓存预览图地址，不再内联 base64
+                    'image_url': f"/api/previews/{it['preview_name']}" if has_preview else None,
+                    'bill_date': bill_date,
+                    'error': err
+                })
+                if err:
+                    errors.append(f"File {it['filename']}: {err}")
+        finally:
+            # ✅ 每批处理完就清理 spool 文件，磁盘占用与批大小成正比
+            if cleanup:
+                for it in batch:
+                    upload_spool.discard(it["temp_path"])
+
+    ocr_elapsed = time.perf_counter() - ocr_start
+    print(f"✅ [OCR] 完成识别 {len(items)} 张账单，耗时 {ocr_elapsed:.2f}s")
+    return results
+
+
 @app.route('/api/upload', methods=['POST'])
 def upload_files():
     """Handle multiple file uploads and process bills"""
-    # try:
     # ✅ 确保 init_processors() 内部是“只初始化一次”
     init_processors(need_parser=True, need_savers=True, need_db=True)
 
-
     ledger_id = request.form.get('ledger_id') or get_ledger_id_from_request()
-    if bill_parser:
-        bill_parser.category_rules_loader = lambda: enhanced_db.get_category_rules(ledger_id)
 
     if 'files' not in request.files:
         return jsonify({'success': False, 'error': '未提供文件'}), 400
@@ -378,11 +619,14 @@ def upload_files():
 
     bill_date = request.form.get('bill_date') or date.today().strftime('%Y-%m-%d')
 
-    results = []
     errors = []
 
-    # 先把有效文件收集起来：保存临时文件 + 生成缩略预览
-    items = []  # 每个元素：{id, filename, temp_path, preview_b64}
+    os.makedirs(config.PREVIEW_DIR, exist_ok=True)
+    preview_ext = _preview_ext()
+
+    # 先把有效文件按块写入 spool 目录（边写边算哈希）；预览图交给 parse_batch 在预处理阶段并行生成
+    items = []  # 每个元素：{id, filename, temp_path, preview_name, preview_path}
+    batch_remaining = config.UPLOAD_MAX_BATCH_SIZE
     for f in files:
         if not f or f.filename == '':
             continue
@@ -393,85 +637,256 @@ def upload_files():
             errors.append(f"文件 {filename}: 不支持的文件类型")
             continue
 
-        file_id = str(uuid.uuid4())
-
-        # ✅ 只读一次：拿到 bytes，用于写盘 + 预览
-        image_bytes = f.read()
-        if not image_bytes:
-            errors.append(f"文件 {filename}: 空文件")
-            continue
-
-        temp_path = os.path.join(config.OUTPUT_DIR, f"temp_{file_id}_{filename}")
         try:
-            with open(temp_path, "wb") as fp:
-                fp.write(image_bytes)
+            spooled = upload_spool.spool_stream(f.stream, filename, batch_remaining=batch_remaining)
+        except UploadTooLarge as e:
+            errors.append(f"文件 {filename}: {str(e)}")
+            continue
         except Exception as e:
             errors.append(f"文件 {filename}: 保存失败 - {str(e)}")
             continue
 
-        preview_b64 = _make_preview_base64(image_bytes, max_side=900, jpeg_quality=75)
+        if not spooled.size:
+            upload_spool.discard(spooled.path)
+            errors.append(f"文件 {filename}: 空文件")
+            continue
 
-        items.append({
-            "id": file_id,
-            "filename": filename,
-            "temp_path": temp_path,
-            "preview_b64": preview_b64,
-        })
+        batch_remaining -= spooled.size
+        items.append(_spooled_to_item(spooled, preview_ext))
 
     if not items:
         return jsonify({'success': True, 'results': [], 'errors': errors})
 
-    # ✅ 并行 OCR：一次性批处理（你前面优化的 parse_batch 在这里才吃满收益）
-    ocr_start = time.perf_counter()
-    print(f"🧾 [OCR] 开始识别 {len(items)} 张账单...")
-    paths = [it["temp_path"] for it in items]
-    bill_datas = bill_parser.parse_batch(paths)  # 内部会自动计算 max_workers（你已加第3步联动）
-    
-    # debug
-    for i, d in enumerate(bill_datas):
-        dbg = d.get("_debug", {})
-        print(f"[{i}] tpl={d.get('_template')} merchant={d.get('merchant')}")
-        print("item", dbg.get("item"))
-        print("indexed_scoped_lines head", dbg.get("indexed_scoped_lines", [])[:8])
+    results = _process_upload_items(items, bill_date, errors, ledger_id=ledger_id)
+    return jsonify({'success': True, 'results': results, 'errors': errors})
 
 
-    ocr_elapsed = time.perf_counter() - ocr_start
-    print(f"✅ [OCR] 完成识别 {len(items)} 张账单，耗时 {ocr_elapsed:.2f}s")
+# === Resumable chunked upload API ===
+# 1. POST /api/uploads                        -> {upload_id}
+# 2. POST /api/uploads/<id>/files             {filename, size} -> {file_id}
+# 3. PUT  /api/uploads/<id>/files/<file_id>?offset=N  (raw bytes) -> {received}
+#    GET  /api/uploads/<id>                   -> 每个文件已接收字节数，用于断点续传
+# 4. POST /api/uploads/<id>/complete          -> 与 /api/upload 相同的识别结果
 
-    # 组装结果 + 清理临时文件
-    for it, bill_data in zip(items, bill_datas):
-        err = bill_data.get("error")
-        result = {
-            'id': it["id"],
-            'filename': it["filename"],
-            'merchant': bill_data.get('merchant', ''),
-            'amount': bill_data.get('amount', 0.0),
-            'category': bill_data.get('category', ''),
-            'raw_text': bill_data.get('raw_text', []),
-
-            # ✅ 返回缩略预览（不建议返回原图，会很慢）
-            'image_data': it["preview_b64"],
-            'bill_date': bill_date,
-            'error': err
-        }
-        results.append(result)
-        if err:
-            errors.append(f"File {it['filename']}: {err}")
+@app.route('/api/uploads', methods=['POST'])
+def create_upload_session():
+    data = request.get_json(silent=True) or {}
+    upload_id = upload_spool.create_session({
+        'ledger_id': data.get('ledger_id'),
+        'bill_date': data.get('bill_date'),
+    })
+    return jsonify({'success': True, 'upload_id': upload_id, 'chunk_size': config.UPLOAD_CHUNK_SIZE})
 
-    # ✅ 统一清理临时文件
-    for it in items:
-        try:
-            if os.path.exists(it["temp_path"]):
-                os.remove(it["temp_path"])
-        except OSError:
-            pass
 
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_upload_session(upload_id):
+    try:
+        return jsonify({'success': True, **upload_spool.session_status(upload_id)})
+    except (KeyError, ValueError):
+        return jsonify({'success': False, 'error': '上传会话不存在'}), 404
+
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def delete_upload_session(upload_id):
+    try:
+        upload_spool.delete_session(upload_id)
+    except ValueError:
+        return jsonify({'success': False, 'error': '上传会话不存在'}), 404
+    return jsonify({'success': True})
+
+
+@app.route('/api/uploads/<upload_id>/files', methods=['POST'])
+def add_upload_file(upload_id):
+    data = request.get_json(silent=True) or {}
+    # 会话内文件按 file_id 落盘，这里只记原始文件名（不经 secure_filename，避免中文名丢掉扩展名）
+    filename = os.path.basename(str(data.get('filename') or '').replace('\\', '/'))
+    if not filename or not (allowed_file(filename) or allowed_archive(filename)):
+        return jsonify({'success': False, 'error': f"文件 {filename}: 不支持的文件类型"}), 400
+    size = data.get('size')
+    max_size = config.UPLOAD_MAX_ARCHIVE_SIZE if allowed_archive(filename) else None
+    try:
+        file_id = upload_spool.add_file(
+            upload_id, filename, int(size) if size is not None else None, max_size=max_size
+        )
+    except UploadTooLarge as e:
+        return jsonify({'success': False, 'error': str(e)}), 413
+    except (KeyError, ValueError):
+        return jsonify({'success': False, 'error': '上传会话不存在'}), 404
+    return jsonify({'success': True, 'file_id': file_id})
+
+
+@app.route('/api/uploads/<upload_id>/files/<file_id>', methods=['PUT'])
+def upload_file_chunk(upload_id, file_id):
+    try:
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'success': False, 'error': '无效的 offset'}), 400
+    try:
+        received = upload_spool.append_chunk(upload_id, file_id, offset, request.stream)
+    except UploadOffsetMismatch as e:
+        return jsonify({'success': False, 'error': str(e), 'received': e.expected}), 409
+    except UploadTooLarge as e:
+        return jsonify({'success': False, 'error': str(e)}), 413
+    except (KeyError, ValueError):
+        return jsonify({'success': False, 'error': '上传文件不存在'}), 404
+    return jsonify({'success': True, 'received': received})
+
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def complete_upload_session(upload_id):
+    init_processors(need_parser=True, need_db=True)
+    data = request.get_json(silent=True) or {}
+    try:
+        meta = upload_spool.session_status(upload_id).get('meta') or {}
+        spooled_files = upload_spool.finalize_session(upload_id)
+    except KeyError:
+        return jsonify({'success': False, 'error': '上传会话不存在'}), 404
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    ledger_id = data.get('ledger_id') or meta.get('ledger_id') or _default_ledger_id
+    bill_date = data.get('bill_date') or meta.get('bill_date') or date.today().strftime('%Y-%m-%d')
+
+    os.makedirs(config.PREVIEW_DIR, exist_ok=True)
+    preview_ext = _preview_ext()
+    errors = []
+    items = []
+    for spooled in spooled_files:
+        if not allowed_file(spooled.filename):
+            errors.append(f"文件 {spooled.filename}: 不支持的文件类型")
+            continue
+        if not spooled.size:
+            errors.append(f"文件 {spooled.filename}: 空文件")
+            continue
+        items.append(_spooled_to_item(spooled, preview_ext))
+
+    try:
+        results = _process_upload_items(items, bill_date, errors, cleanup=True, ledger_id=ledger_id)
+    finally:
+        upload_spool.delete_session(upload_id)
     return jsonify({'success': True, 'results': results, 'errors': errors})
 
-    # except Exception as e:
-    #     return jsonify({'success': False, 'error': str(e)}), 500
+# === Statement CSV import ===
+
+@app.route('/api/import/statement', methods=['POST'])
+def import_statement_csv():
+    """Import an Alipay / WeChat CSV statement (multipart `file`)"""
+    init_processors(need_db=True)
+    if 'file' not in request.files:
+        return jsonify({'success': False, 'error': '未提供文件'}), 400
+    f = request.files['file']
+    # 扩展名按原始文件名判断：secure_filename 会去掉中文（"支付宝交易明细.csv" -> "csv"）
+    original_name = os.path.basename((f.filename or '').replace('\\', '/'))
+    if os.path.splitext(original_name)[1].lower() != '.csv':
+        return jsonify({'success': False, 'error': '仅支持 CSV 账单文件'}), 400
+    filename = secure_filename(original_name) or 'statement.csv'
+
+    source = (request.form.get('source') or 'auto').strip()
+    if source != 'auto' and source not in STATEMENT_FORMATS:
+        return jsonify({'success': False, 'error': '无效的账单来源'}), 400
+    ledger_id = get_ledger_id_from_request()
+
+    try:
+        spooled = upload_spool.spool_stream(f.stream, filename, max_size=config.UPLOAD_MAX_BATCH_SIZE)
+    except UploadTooLarge as e:
+        return jsonify({'success': False, 'error': str(e)}), 413
+    try:
+        stats = import_statement(enhanced_db, spooled.path, ledger_id=ledger_id, source=source, filename=original_name)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    finally:
+        upload_spool.discard(spooled.path)
+    return jsonify({'success': True, **stats})
+
+
+# === ZIP archive ingestion ===
+
+@app.route('/api/ingest/zip', methods=['POST'])
+def ingest_zip():
+    """Start a background ZIP ingestion job (multipart `archive` or a chunked `upload_id`)"""
+    init_processors(need_parser=True, need_db=True)
+
+    data = request.get_json(silent=True) or {}
+    ledger_id = data.get('ledger_id') or request.form.get('ledger_id') or get_ledger_id_from_request()
+    bill_date = data.get('bill_date') or request.form.get('bill_date') or date.today().strftime('%Y-%m-%d')
+
+    archive_path = None
+    if 'archive' in request.files:
+        f = request.files['archive']
+        # 扩展名按原始文件名判断：secure_filename 会去掉非 ASCII 字符（"相册.zip" -> "zip"）
+        if not allowed_archive(f.filename or ''):
+            return jsonify({'success': False, 'error': '仅支持 ZIP 压缩包'}), 400
+        filename = secure_filename(f.filename) or 'archive.zip'
+        try:
+            spooled = upload_spool.spool_stream(f.stream, filename, max_size=config.UPLOAD_MAX_ARCHIVE_SIZE)
+        except UploadTooLarge as e:
+            return jsonify({'success': False, 'error': str(e)}), 413
+        archive_path = spooled.path
+    elif data.get('upload_id'):
+        upload_id = str(data['upload_id'])
+        try:
+            spooled_files = upload_spool.finalize_session(upload_id)
+        except KeyError:
+            return jsonify({'success': False, 'error': '上传会话不存在'}), 404
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        archives = [sf for sf in spooled_files if allowed_archive(sf.filename)]
+        if len(archives) != 1:
+            return jsonify({'success': False, 'error': '上传会话中需要恰好一个 ZIP 压缩包'}), 400
+        # 移出会话目录后即可删除会话
+        archive_name = secure_filename(archives[0].filename) or 'archive.zip'
+        archive_path = os.path.join(config.UPLOAD_SPOOL_DIR, f"{uuid.uuid4().hex}_{archive_name}")
+        os.replace(archives[0].path, archive_path)
+        upload_spool.delete_session(upload_id)
+    else:
+        return jsonify({'success': False, 'error': '未提供压缩包'}), 400
+
+    os.makedirs(config.PREVIEW_DIR, exist_ok=True)
+    preview_ext = _preview_ext()
+    job = ZipIngestJob(archive_path, bill_date, ledger_id=ledger_id)
+
+    def process(spooled_batch):
+        items = [_spooled_to_item(sf, preview_ext) for sf in spooled_batch]
+        return _process_upload_items(items, bill_date, [], cleanup=False, ledger_id=ledger_id)
+
+    zip_jobs.start(job, lambda: job.run(
+        upload_spool, ALLOWED_EXTENSIONS, process, batch_size=config.UPLOAD_PARSE_BATCH
+    ))
+    return jsonify({'success': True, 'job_id': job.id}), 202
+
+
+@app.route('/api/ingest/zip/<job_id>', methods=['GET'])
+def get_zip_ingest(job_id):
+    """Report per-member progress; pass results=0 to poll without OCR payloads"""
+    job = zip_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': '导入任务不存在'}), 404
+    include_results = str(request.args.get('results', '1')).lower() not in ('0', 'false', 'no')
+    return jsonify({'success': True, 'job': job.to_dict(include_results=include_results)})
+
+@app.route('/api/previews/<name>', methods=['GET'])
+def get_preview(name):
+    """Serve a cached upload preview (content-addressed, safe to cache forever)"""
+    name = secure_filename(name)
+    stem, _, ext = name.partition('.')
+    if not stem or ext not in ('jpg', 'webp'):
+        return jsonify({'success': False, 'error': '预览图不存在'}), 404
+    if not os.path.exists(os.path.join(config.PREVIEW_DIR, name)):
+        return jsonify({'success': False, 'error': '预览图不存在'}), 404
+
+    etag = f'"{stem}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = app.response_class(status=304)
+    else:
+        response = send_from_directory(config.PREVIEW_DIR, name, conditional=False)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 @app.route('/api/categories', methods=['GET'])
+@versioned_get(per_ledger=False)
 def get_categories():
     """Get available categories for dropdown"""
     try:
@@ -516,25 +931,39 @@ def get_bills():
                 include_in_budget = False
         sort_by = request.args.get('sort_by')
         sort_order = request.args.get('sort_order')
+        needs_review_raw = request.args.get('needs_review')
+        needs_review = None
+        if needs_review_raw is not None:
+            needs_review = str(needs_review_raw).lower() in ('1', 'true', 'yes')
         ledger_id = get_ledger_id_from_request()
         
         # Validate limit
         if limit > 1000:
             limit = 1000
         
-        bills = enhanced_db.get_bills(
-            limit=limit,
-            offset=offset,
-            start_date=start_date,
-            end_date=end_date,
-            category=category,
-            keyword=keyword,
-            major=major,
-            minor=minor,
-            ledger_id=ledger_id,
-            sort_by=sort_by,
-            sort_order=sort_order
-        )
+        # cursor: 上一页返回的 next_cursor（键集分页）；不传则按 offset 分页
+        page_cursor = request.args.get('cursor') or None
+        try:
+            bills, next_cursor = enhanced_db.list_bills(
+                limit=limit,
+                offset=offset,
+                cursor=page_cursor,
+                start_date=start_date,
+                end_date=end_date,
+                category=category,
+                keyword=keyword,
+                major=major,
+                minor=minor,
+                ledger_id=ledger_id,
+                sort_by=sort_by,
+                sort_order=sort_order,
+                needs_review=needs_review
+            )
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
         total_count = enhanced_db.get_bills_count(
             start_date=start_date,
             end_date=end_date,
@@ -542,7 +971,8 @@ def get_bills():
             keyword=keyword,
             major=major,
             minor=minor,
-            ledger_id=ledger_id
+            ledger_id=ledger_id,
+            needs_review=needs_review
         )
         
         # Convert to JSON format
@@ -552,7 +982,7 @@ def get_bills():
                 'id': bill.id,
                 'filename': bill.filename,
                 'merchant': bill.merchant,
-                'amount': bill.amount,
+                'amount': from_cents(bill.amount_cents),
                 'category_id': bill.category_id,
                 'category': bill.category,
                 'bill_date': bill.bill_date,
@@ -560,6 +990,7 @@ def get_bills():
                 'updated_at': bill.updated_at,
                 'is_manual': bill.is_manual,
                 'include_in_budget': bill.include_in_budget,
+                'needs_review': bill.needs_review,
                 'ledger_id': bill.ledger_id
             })
         
@@ -567,7 +998,8 @@ def get_bills():
             'success': True,
             'bills': bills_data,
             'count': len(bills_data),
-            'total_count': total_count
+            'total_count': total_count,
+            'next_cursor': next_cursor
         })
         
     except Exception as e:
@@ -607,18 +1039,19 @@ def create_bill():
         bill = EnhancedBill(
             filename=data.get('filename', '手动录入'),
             merchant=str(data['merchant']).strip(),
-            amount=float(data['amount']),
+            amount_cents=to_cents(data['amount']),
             category=str(data.get('category') or '').strip(),
             category_id=data.get('category_id'),
             bill_date=data.get('bill_date', ''),
             raw_text=data.get('raw_text', []),
+            ocr_lines=data.get('ocr_lines'),
             is_manual=True,
             ledger_id=data.get('ledger_id') or get_ledger_id_from_request(),
             include_in_budget=bool(data.get('include_in_budget', True))
         )
         
         # Validate amount
-        if bill.amount < 0:
+        if bill.amount_cents < 0:
             return jsonify({
                 'success': False,
                 'error': '金额不能为负数'
@@ -634,14 +1067,15 @@ def create_bill():
                 'id': bill.id,
                 'filename': bill.filename,
                 'merchant': bill.merchant,
-                'amount': bill.amount,
+                'amount': from_cents(bill.amount_cents),
                 'category_id': bill.category_id,
                 'category': bill.category,
                 'bill_date': bill.bill_date,
                 'created_at': bill.created_at,
                 'updated_at': bill.updated_at,
                 'is_manual': bill.is_manual,
-                'include_in_budget': bill.include_in_budget
+                'include_in_budget': bill.include_in_budget,
+                'needs_review': bill.needs_review
             }
         })
         
@@ -681,8 +1115,8 @@ def update_bill(bill_id):
         if 'merchant' in data:
             bill.merchant = str(data['merchant']).strip()
         if 'amount' in data:
-            bill.amount = float(data['amount'])
-            if bill.amount < 0:
+            bill.amount_cents = to_cents(data['amount'])
+            if bill.amount_cents < 0:
                 return jsonify({
                     'success': False,
                     'error': '金额不能为负数'
@@ -697,6 +1131,12 @@ def update_bill(bill_id):
             bill.filename = data['filename']
         if 'include_in_budget' in data:
             bill.include_in_budget = bool(data['include_in_budget'])
+        if 'raw_text' in data:
+            bill.raw_text = data['raw_text'] or []
+        if 'ocr_lines' in data:
+            bill.ocr_lines = data['ocr_lines']
+        # 手动编辑即视为已复核（目录监听自动入账的账单）
+        bill.needs_review = bool(data.get('needs_review', False))
         
         # Save updated bill
         enhanced_db.save_bill(bill)
@@ -707,14 +1147,15 @@ def update_bill(bill_id):
                 'id': bill.id,
                 'filename': bill.filename,
                 'merchant': bill.merchant,
-                'amount': bill.amount,
+                'amount': from_cents(bill.amount_cents),
                 'category_id': bill.category_id,
                 'category': bill.category,
                 'bill_date': bill.bill_date,
                 'created_at': bill.created_at,
                 'updated_at': bill.updated_at,
                 'is_manual': bill.is_manual,
-                'include_in_budget': bill.include_in_budget
+                'include_in_budget': bill.include_in_budget,
+                'needs_review': bill.needs_review
             }
         })
         
@@ -763,6 +1204,7 @@ def batch_delete_bills():
         data = request.get_json()
         bill_ids = data.get('bill_ids', [])
         ledger_id = data.get('ledger_id')
+        ledger_id = int(ledger_id) if ledger_id not in (None, '', 'null') else None
         
         if not bill_ids:
             return jsonify({
@@ -770,15 +1212,14 @@ def batch_delete_bills():
                 'error': '未提供账单ID'
             }), 400
             
-        deleted_count = 0
-        for bill_id in bill_ids:
-            if enhanced_db.delete_bill(bill_id):
-                deleted_count += 1
+        results = enhanced_db.delete_bills(bill_ids, ledger_id=ledger_id)
+        deleted_count = sum(1 for r in results if r['success'])
         
         return jsonify({
             'success': True,
             'message': f'成功删除 {deleted_count} 笔账单',
-            'deleted_count': deleted_count
+            'deleted_count': deleted_count,
+            'results': results
         })
         
     except Exception as e:
@@ -797,6 +1238,7 @@ def batch_update_budget():
         bill_ids = data.get('bill_ids', [])
         include_in_budget = data.get('include_in_budget', True)
         ledger_id = data.get('ledger_id')
+        ledger_id = int(ledger_id) if ledger_id not in (None, '', 'null') else None
         
         if not bill_ids:
             return jsonify({
@@ -804,15 +1246,14 @@ def batch_update_budget():
                 'error': '未提供账单ID'
             }), 400
             
-        updated_count = 0
-        for bill_id in bill_ids:
-            if enhanced_db.update_bill_budget_status(bill_id, include_in_budget):
-                updated_count += 1
+        results = enhanced_db.set_budget_flag(bill_ids, include_in_budget, ledger_id=ledger_id)
+        updated_count = sum(1 for r in results if r['success'])
         
         return jsonify({
             'success': True,
             'message': f'成功更新 {updated_count} 笔账单',
-            'updated_count': updated_count
+            'updated_count': updated_count,
+            'results': results
         })
         
     except Exception as e:
@@ -824,6 +1265,7 @@ def batch_update_budget():
 # === Analytics API Endpoints ===
 
 @app.route('/api/analytics/summary', methods=['GET'])
+@versioned_get()
 def get_analytics_summary():
     """Get overall spending summary"""
     try:
@@ -843,14 +1285,13 @@ def get_analytics_summary():
                 include_in_budget = False
         
         ledger_id = get_ledger_id_from_request()
-        ensure_recurring_bills(ledger_id)
-        summary = enhanced_db.get_spending_summary(
+        summary = cached_analytics('get_spending_summary',
             start_date, end_date, keyword, major, minor, ledger_id, include_in_budget=include_in_budget
         )
         
         return jsonify({
             'success': True,
-            'summary': summary
+            'summary': _cents_to_yuan(summary)
         })
         
     except Exception as e:
@@ -860,6 +1301,7 @@ def get_analytics_summary():
         }), 500
 
 @app.route('/api/analytics/daily', methods=['GET'])
+@versioned_get()
 def get_daily_analytics():
     """Get daily spending data"""
     try:
@@ -872,12 +1314,11 @@ def get_daily_analytics():
         minor = request.args.get('minor')
         
         ledger_id = get_ledger_id_from_request()
-        ensure_recurring_bills(ledger_id)
-        daily_data = enhanced_db.get_daily_spending(start_date, end_date, keyword, major, minor, ledger_id)
+        daily_data = cached_analytics('get_daily_spending', start_date, end_date, keyword, major, minor, ledger_id)
         
         return jsonify({
             'success': True,
-            'daily_data': daily_data
+            'daily_data': _cents_to_yuan(daily_data)
         })
         
     except Exception as e:
@@ -887,6 +1328,7 @@ def get_daily_analytics():
         }), 500
 
 @app.route('/api/analytics/weekly', methods=['GET'])
+@versioned_get()
 def get_weekly_analytics():
     """Get weekly spending data"""
     try:
@@ -898,37 +1340,41 @@ def get_weekly_analytics():
         major = request.args.get('major')
         minor = request.args.get('minor')
         
-        # Get daily data and aggregate by week
         ledger_id = get_ledger_id_from_request()
-        ensure_recurring_bills(ledger_id)
-        daily_data = enhanced_db.get_daily_spending(start_date, end_date, keyword, major, minor, ledger_id)
-        
-        # Group by week
-        weekly_data = {}
-        for day in daily_data:
-            # Get week start date (Monday)
-            from datetime import datetime, timedelta
-            date_obj = datetime.strptime(day['date'], '%Y-%m-%d')
-            week_start = date_obj - timedelta(days=date_obj.weekday())
-            week_key = week_start.strftime('%Y-%m-%d')
-            
-            if week_key not in weekly_data:
-                weekly_data[week_key] = {
-                    'week_start': week_key,
-                    'amount': 0,
-                    'count': 0
-                }
-            
-            weekly_data[week_key]['amount'] += day['amount']
-            weekly_data[week_key]['count'] += day['count']
-        
-        # Convert to list and sort
-        weekly_list = list(weekly_data.values())
-        weekly_list.sort(key=lambda x: x['week_start'], reverse=True)
+        weekly_list = None
+        if analytics_cache is not None:
+            weekly_list = analytics_cache.get_weekly_spending(start_date, end_date, keyword, major, minor, ledger_id)
+
+        if weekly_list is None:
+            # Get daily data and aggregate by week
+            daily_data = enhanced_db.get_daily_spending(start_date, end_date, keyword, major, minor, ledger_id)
+
+            # Group by week
+            weekly_data = {}
+            for day in daily_data:
+                # Get week start date (Monday)
+                from datetime import datetime, timedelta
+                date_obj = datetime.strptime(day['date'], '%Y-%m-%d')
+                week_start = date_obj - timedelta(days=date_obj.weekday())
+                week_key = week_start.strftime('%Y-%m-%d')
+
+                if week_key not in weekly_data:
+                    weekly_data[week_key] = {
+                        'week_start': week_key,
+                        'amount_cents': 0,
+                        'count': 0
+                    }
+
+                weekly_data[week_key]['amount_cents'] += day['amount_cents']
+                weekly_data[week_key]['count'] += day['count']
+
+            # Convert to list and sort
+            weekly_list = list(weekly_data.values())
+            weekly_list.sort(key=lambda x: x['week_start'], reverse=True)
         
         return jsonify({
             'success': True,
-            'weekly_data': weekly_list
+            'weekly_data': _cents_to_yuan(weekly_list)
         })
         
     except Exception as e:
@@ -938,6 +1384,7 @@ def get_weekly_analytics():
         }), 500
 
 @app.route('/api/analytics/yearly', methods=['GET'])
+@versioned_get()
 def get_yearly_analytics():
     """Get yearly spending data"""
     try:
@@ -949,33 +1396,37 @@ def get_yearly_analytics():
         major = request.args.get('major')
         minor = request.args.get('minor')
 
-        # Get all daily data and aggregate by year
         ledger_id = get_ledger_id_from_request()
-        ensure_recurring_bills(ledger_id)
-        daily_data = enhanced_db.get_daily_spending(start_date, end_date, keyword, major, minor, ledger_id)
-        
-        # Group by year
-        yearly_data = {}
-        for day in daily_data:
-            year = day['date'][:4]  # Extract year from YYYY-MM-DD
-            
-            if year not in yearly_data:
-                yearly_data[year] = {
-                    'year': year,
-                    'amount': 0,
-                    'count': 0
-                }
-            
-            yearly_data[year]['amount'] += day['amount']
-            yearly_data[year]['count'] += day['count']
-        
-        # Convert to list and sort
-        yearly_list = list(yearly_data.values())
-        yearly_list.sort(key=lambda x: x['year'], reverse=True)
+        yearly_list = None
+        if analytics_cache is not None:
+            yearly_list = analytics_cache.get_yearly_spending(start_date, end_date, keyword, major, minor, ledger_id)
+
+        if yearly_list is None:
+            # Get all daily data and aggregate by year
+            daily_data = enhanced_db.get_daily_spending(start_date, end_date, keyword, major, minor, ledger_id)
+
+            # Group by year
+            yearly_data = {}
+            for day in daily_data:
+                year = day['date'][:4]  # Extract year from YYYY-MM-DD
+
+                if year not in yearly_data:
+                    yearly_data[year] = {
+                        'year': year,
+                        'amount_cents': 0,
+                        'count': 0
+                    }
+
+                yearly_data[year]['amount_cents'] += day['amount_cents']
+                yearly_data[year]['count'] += day['count']
+
+            # Convert to list and sort
+            yearly_list = list(yearly_data.values())
+            yearly_list.sort(key=lambda x: x['year'], reverse=True)
         
         return jsonify({
             'success': True,
-            'yearly_data': yearly_list
+            'yearly_data': _cents_to_yuan(yearly_list)
         })
         
     except Exception as e:
@@ -985,6 +1436,7 @@ def get_yearly_analytics():
         }), 500
 
 @app.route('/api/analytics/categories', methods=['GET'])
+@versioned_get()
 def get_category_analytics():
     """Get category breakdown"""
     try:
@@ -997,26 +1449,26 @@ def get_category_analytics():
         minor = request.args.get('minor')
         
         ledger_id = get_ledger_id_from_request()
-        ensure_recurring_bills(ledger_id)
-        summary = enhanced_db.get_spending_summary(start_date, end_date, keyword, major, minor, ledger_id)
+        summary = cached_analytics('get_spending_summary', start_date, end_date, keyword, major, minor, ledger_id)
         
         # Format category data for frontend
+        total_cents = summary['total_amount_cents']
         category_data = []
         for category, data in summary['categories'].items():
             category_data.append({
                 'category': category,
-                'amount': data['amount'],
+                'amount_cents': data['amount_cents'],
                 'count': data['count'],
-                'percentage': (data['amount'] / summary['total_amount'] * 100) if summary['total_amount'] > 0 else 0
+                'percentage': (data['amount_cents'] / total_cents * 100) if total_cents > 0 else 0
             })
         
         # Sort by amount descending
-        category_data.sort(key=lambda x: x['amount'], reverse=True)
+        category_data.sort(key=lambda x: x['amount_cents'], reverse=True)
         
         return jsonify({
             'success': True,
-            'category_data': category_data,
-            'total_amount': summary['total_amount']
+            'category_data': _cents_to_yuan(category_data),
+            'total_amount': from_cents(total_cents)
         })
         
     except Exception as e:
@@ -1028,13 +1480,13 @@ def get_category_analytics():
 # === Dashboard API Endpoints ===
 
 @app.route('/api/dashboard/summary', methods=['GET'])
+@versioned_get()
 def get_dashboard_summary():
     """Get dashboard summary data including monthly spending, budget status, and top categories"""
     try:
         init_processors(need_db=True)
         
         ledger_id = get_ledger_id_from_request()
-        ensure_recurring_bills(ledger_id)
         
         # Get current month date range
         from datetime import datetime, date
@@ -1045,38 +1497,22 @@ def get_dashboard_summary():
         last_day = calendar.monthrange(today.year, today.month)[1]
         month_end = today.replace(day=last_day).strftime('%Y-%m-%d')
         
-        # Get monthly spending summary
-        monthly_summary = enhanced_db.get_spending_summary(
-            start_date=month_start,
-            end_date=month_end,
-            ledger_id=ledger_id
-        )
-        monthly_budget_summary = enhanced_db.get_spending_summary(
-            start_date=month_start,
-            end_date=month_end,
-            ledger_id=ledger_id,
-            include_in_budget=True
-        )
-        
-        # Get budget information from ledger
-        ledgers = enhanced_db.list_ledgers()
-        current_ledger = next((l for l in ledgers if l['id'] == ledger_id), None)
-        total_budget = current_ledger['monthly_budget'] if current_ledger else 0.0
+        # Monthly totals, budget-included total, top categories and the ledger budget (one snapshot)
+        monthly_summary = enhanced_db.get_dashboard_summary(ledger_id, month_start, month_end, top_n=3)
+        total_budget = monthly_summary['monthly_budget_cents']
         
-        # Calculate budget status
-        used_amount = monthly_budget_summary['total_amount']
+        # Calculate budget status (integer cents until the response)
+        used_amount = monthly_summary['budget_amount_cents']
         used_percentage = (used_amount / total_budget * 100) if total_budget > 0 else 0
-        non_budget_spending = max(0.0, monthly_summary['total_amount'] - used_amount)
+        non_budget_spending = max(0, monthly_summary['total_amount_cents'] - used_amount)
         
         # Calculate time progress (how much of the month has passed)
         days_in_month = last_day
         current_day = today.day
         time_progress = (current_day / days_in_month * 100)
         
-        # Get top 3 categories
+        # Top 3 categories (already ordered by amount)
         top_categories = []
-        category_items = list(monthly_summary['categories'].items())
-        category_items.sort(key=lambda x: x[1]['amount'], reverse=True)
         
         # Category icon mapping
         category_icons = {
@@ -1090,14 +1526,15 @@ def get_dashboard_summary():
             '其他': {'icon': '📦', 'color': '#95de64'}
         }
         
-        for category_name, category_data in category_items[:3]:
+        for category_data in monthly_summary['top_categories']:
+            category_name = category_data['category']
             # Extract major category for icon mapping
             major_category = category_name.split('/')[0] if '/' in category_name else category_name
             icon_info = category_icons.get(major_category, category_icons['其他'])
             
             top_categories.append({
                 'category': category_name,
-                'amount': category_data['amount'],
+                'amount': from_cents(category_data['amount_cents']),
                 'count': category_data['count'],
                 'icon': icon_info['icon'],
                 'color': icon_info['color']
@@ -1106,14 +1543,14 @@ def get_dashboard_summary():
         return jsonify({
             'success': True,
             'data': {
-                'monthly_spending': monthly_summary['total_amount'],
-                'non_budget_spending': non_budget_spending,
+                'monthly_spending': from_cents(monthly_summary['total_amount_cents']),
+                'non_budget_spending': from_cents(non_budget_spending),
                 'budget_info': {
-                    'total_budget': total_budget,
-                    'used_amount': used_amount,
+                    'total_budget': from_cents(total_budget),
+                    'used_amount': from_cents(used_amount),
                     'used_percentage': round(used_percentage, 1),
                     'time_progress': round(time_progress, 1),
-                    'remaining_budget': total_budget - used_amount
+                    'remaining_budget': from_cents(total_budget - used_amount)
                 },
                 'top_categories': top_categories,
                 'metadata': {
@@ -1162,7 +1599,7 @@ def export_bills():
             writer.writerow([
                 bill.merchant,
                 bill.category,
-                bill.amount,
+                format_cents(bill.amount_cents),
                 bill.bill_date
             ])
 
@@ -1183,6 +1620,7 @@ def export_bills():
 # === Category Group Management API Endpoints ===
 
 @app.route('/api/config/category-groups', methods=['GET'])
+@versioned_get()
 def get_category_groups():
     """Get all category groups"""
     try:
@@ -1359,6 +1797,7 @@ def delete_category_group(category_id):
 # === Configuration Management API Endpoints ===
 
 @app.route('/api/config/categories', methods=['GET'])
+@versioned_get()
 def get_category_rules():
     """Get all category rules"""
     try:
@@ -1617,7 +2056,7 @@ def get_recurring_rules():
             rules_data.append({
                 'id': rule.id,
                 'ledger_id': rule.ledger_id,
-                'amount': rule.amount,
+                'amount': from_cents(rule.amount_cents),
                 'keyword': rule.keyword,
                 'category_id': rule.category_id,
                 'category': rule.category,
@@ -1667,7 +2106,7 @@ def create_recurring_rule():
 
         rule = RecurringRule(
             ledger_id=ledger_id,
-            amount=float(data.get('amount') or 0),
+            amount_cents=to_cents(data.get('amount')),
             keyword=str(data.get('keyword') or '').strip(),
             category_id=data.get('category_id'),
             category=str(data.get('category') or '').strip(),
@@ -1682,12 +2121,13 @@ def create_recurring_rule():
 
         rule_id = enhanced_db.save_recurring_rule(rule)
         rule.id = rule_id
+        notify_recurring_changed(rule.ledger_id)
         return jsonify({
             'success': True,
             'rule': {
                 'id': rule.id,
                 'ledger_id': rule.ledger_id,
-                'amount': rule.amount,
+                'amount': from_cents(rule.amount_cents),
                 'keyword': rule.keyword,
                 'category_id': rule.category_id,
                 'category': rule.category,
@@ -1722,7 +2162,7 @@ def update_recurring_rule(rule_id):
             return jsonify({'success': False, 'error': '规则不存在'}), 404
 
         if 'amount' in data:
-            rule.amount = float(data.get('amount') or 0)
+            rule.amount_cents = to_cents(data.get('amount'))
         if 'keyword' in data:
             rule.keyword = str(data.get('keyword') or '').strip()
         if 'category' in data:
@@ -1756,12 +2196,13 @@ def update_recurring_rule(rule_id):
             return jsonify({'success': False, 'error': '缺少必填字段: category'}), 400
 
         enhanced_db.save_recurring_rule(rule)
+        notify_recurring_changed(rule.ledger_id)
         return jsonify({
             'success': True,
             'rule': {
                 'id': rule.id,
                 'ledger_id': rule.ledger_id,
-                'amount': rule.amount,
+                'amount': from_cents(rule.amount_cents),
                 'keyword': rule.keyword,
                 'category_id': rule.category_id,
                 'category': rule.category,
@@ -1795,6 +2236,16 @@ def delete_recurring_rule(rule_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/recurring-rules/scheduler', methods=['GET'])
+def get_recurring_scheduler_status():
+    """Recurring bill scheduler status (last/next run)"""
+    try:
+        init_processors(need_db=True)
+        return jsonify({'success': True, 'scheduler': recurring_scheduler.status()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 # === Template Management API Endpoints ===
 
 @app.route('/api/templates/ocr', methods=['POST'])
@@ -1991,7 +2442,7 @@ def too_large(e):
     """Handle file too large error"""
     return jsonify({
         'success': False,
-        'error': '文件过大。最大允许 16MB。'
+        'error': f'文件过大。单次上传最大允许 {config.UPLOAD_MAX_BATCH_SIZE // (1024 * 1024)}MB，更大批量请使用分块上传。'
     }), 413
 
 @app.errorhandler(404)
@@ -2015,6 +2466,10 @@ if __name__ == '__main__':
     if not os.path.exists('static'):
         os.makedirs('static')
     
+    if config.RECURRING_SCHEDULER_ENABLED:
+        init_processors(need_db=True)
+        recurring_scheduler.start()
+
     print("🚀 启动 账单助手 Web 应用...")
     print("📱 访问地址: http://localhost:5000")
     app.run(debug=False, host='127.0.0.1', port=5000, use_reloader=False)